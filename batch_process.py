@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+#Program that runs iq_to_power or pdp_analysis over a whole directory (or glob) of
+#captures, fanning files, and byte ranges of large files, out over a process pool.
+#Results are merged back in file order and written next to the captures or to -O.
+
+import numpy as np
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import capture_reader
+import output_writer
+import window_avg
+import iq_to_power
+import pdp_analysis
+import capture_meta
+import result_cache
+import online_stats
+
+#Files in a capture directory that are analysis outputs or metadata rather than captures
+SKIP_EXTENSIONS = set(output_writer.EXTENSIONS.values()) | {'.png', '.json', capture_meta.SUFFIX}
+
+#Used for captures without a sidecar when -d/-s are not given
+DEFAULT_DEGREE = 8
+DEFAULT_SAMP_RATE = 24e6
+
+#Default size of the byte ranges a large capture is split into (256 MB of fc32)
+SPLIT_SAMPLES = 2**25
+
+#Takes in a directory or glob and returns the sorted list of capture files it names
+def findCaptures(path, pattern='*'):
+    if os.path.isdir(path):
+        path = os.path.join(path, pattern)
+    files = [f for f in sorted(glob.glob(path)) if os.path.isfile(f)]
+    return [f for f in files if os.path.splitext(f)[1] not in SKIP_EXTENSIONS]
+
+#Returns the result of compute(), through the result cache if there is one
+def cached(cache, file_path, stage, compute, **params):
+    if cache is None:
+        return compute()
+    return cache.cached(file_path, stage, compute, **params)
+
+#Worker: dB power of every window of size N in samples [start, stop) of a capture read as
+#settings.sample_format, and with stats their online_stats.OnlineStats, which the parent
+#merges across ranges
+def powerRange(file_path, start, stop, N, settings, cache=None, stats=False):
+    t0 = time.time()
+    def compute():
+        data = capture_reader.openSamples(file_path, settings.sample_format, settings.full_scale,
+                                          offset=start, length=stop-start)
+        power = (iq_to_power.binToLinearPower(c) for c in capture_reader.iterChunks(data))
+        return iq_to_power.linearPowerToDecibel(window_avg.windowedAvg(power, N))
+    full_scale = settings.full_scale if settings.sample_format == 'sc16' else None
+    db_power = cached(cache, file_path, 'power_range', compute, start=start, stop=stop, window=N,
+                      fmt=settings.sample_format, full_scale=full_scale)
+    range_stats = None
+    if stats:
+        range_stats = online_stats.OnlineStats()
+        range_stats.update(db_power)
+    return db_power, time.time() - t0, range_stats
+
+#Worker: PN-period peaks of a CIR capture that lie in samples [start, stop)
+def peakRange(file_path, start, stop, settings, cache=None):
+    t0 = time.time()
+    data, read_params = openCIR(file_path, settings)
+    degree = settings.degree
+    peaks = cached(cache, file_path, 'pn_peaks_range', lambda: pdp_analysis.find_pn_peaks_range(data, degree, start, stop),
+                   start=start, stop=stop, degree=degree, **read_params)
+    return peaks, time.time() - t0
+
+#Worker: averaged PDP of a CIR capture from its merged peaks (None for captures windowed
+#by the receiver, which need none), written to name
+def pdpFile(file_path, peaks, window, settings, name, fmt, cache=None):
+    t0 = time.time()
+    data, read_params = openCIR(file_path, settings)
+    if cache is not None:
+        #same key as pdp_analysis.py uses for the capture
+        cache = result_cache.CaptureCache(cache, file_path, **read_params)
+    indices = None if peaks is None else pdp_analysis.merge_pn_peaks(data, peaks, settings.degree)
+    analysis = pdp_analysis.PDPAnalysis(data, settings.degree, settings.samp_rate, indices, taps=settings.taps,
+                                        cache=cache)
+    pdp = pdp_analysis.linearPowerToDecibel(analysis.average(window).ravel())
+    output_writer.writeArray(pdp, fmt, name, 1, settings.samp_rate)
+    return time.time() - t0
+
+#Opens a CIR capture as pdp_analysis.py does with the resolved settings
+def openCIR(file_path, settings):
+    return pdp_analysis.openCIR(file_path, settings.degree, settings.sample_format, settings.full_scale,
+                                settings.accumulated)
+
+#Takes in a capture and the options and returns its settings (degree, samp_rate,
+#sample_format, full_scale, taps, accumulated, window_size) as a namespace: as given on
+#the command line, else from its sidecar, else the defaults
+def captureSettings(file_path, args):
+    settings = argparse.Namespace(**vars(args))
+    #a CIR's sc16 full scale defaults to 2**degree-1 (pdp_analysis.openCIR), RAW's to 1.0
+    full_scale = 1.0 if args.mode == 'power' else None
+    defaults = {'degree': DEFAULT_DEGREE, 'samp_rate': DEFAULT_SAMP_RATE, 'sample_format': 'fc32',
+                'full_scale': full_scale, 'taps': None, 'accumulated': False}
+    if args.mode == 'pdp':
+        #as in pdp_analysis: 1 for rows offline_correlator has already averaged
+        defaults['window_size'] = 100
+    capture_meta.resolveArgs(settings, file_path, defaults)
+    if settings.window_size is None:
+        settings.window_size = 20000
+    return settings
+
+#Takes in the capture list and runs the chosen analysis over the pool. Returns per-file
+#(path, samples, worker seconds, wall seconds) and the total wall time
+def run(files, args):
+    stats = []
+    cache = result_cache.fromArgs(args)
+    t_start = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        jobs = []
+        for file_path in files:
+            settings = captureSettings(file_path, args)
+            if cache is not None:
+                #identify the capture once here; workers get the cache with it filled in
+                cache.fingerprint(file_path)
+            if args.mode == 'power':
+                n_samples = len(capture_reader.openSamples(file_path, settings.sample_format, settings.full_scale))
+                ranges = capture_reader.splitRanges(n_samples, args.split, settings.window_size)
+                futures = [pool.submit(powerRange, file_path, start, stop, settings.window_size, settings, cache, args.stats)
+                           for start, stop in ranges]
+            else:
+                n_samples = len(openCIR(file_path, settings)[0])
+                #captures windowed by the receiver hold one row per period and need no peaks
+                ranges = [] if settings.taps else capture_reader.splitRanges(n_samples, args.split)
+                futures = [pool.submit(peakRange, file_path, start, stop, settings, cache) for start, stop in ranges]
+            jobs.append((file_path, n_samples, settings, futures))
+        #merge in file order; pdp files go back to the pool once all their ranges are in
+        finishing = []
+        for file_path, n_samples, settings, futures in jobs:
+            samp_rate = settings.samp_rate
+            results = [f.result() for f in futures]
+            seconds = sum(r[1] for r in results)
+            name = outputName(file_path, args)
+            if args.mode == 'power':
+                output_writer.writeArray(np.concatenate([r[0] for r in results]), args.format, name,
+                                         settings.window_size, samp_rate)
+                if args.stats:
+                    online_stats.mergeAll([r[2] for r in results]).save(name + online_stats.SUFFIX)
+                stats.append((file_path, n_samples, seconds, time.time() - t_start))
+            else:
+                peaks = None if settings.taps else [r[0] for r in results]
+                future = pool.submit(pdpFile, file_path, peaks, settings.window_size, settings, name, args.format, cache)
+                finishing.append((file_path, n_samples, seconds, future))
+        for file_path, n_samples, seconds, future in finishing:
+            seconds += future.result()
+            stats.append((file_path, n_samples, seconds, time.time() - t_start))
+    return stats, time.time() - t_start
+
+#Output file name (without extension) for a capture
+def outputName(file_path, args):
+    base = os.path.basename(file_path) + '_' + args.mode
+    return os.path.join(args.out_dir or os.path.dirname(file_path), base)
+
+def main():
+    #get user input
+    parser = argparse.ArgumentParser(description='Run iq_to_power or pdp_analysis over a directory of captures in parallel')
+    parser.add_argument('-p', '--path', type=str, required = True,
+                        help='Capture directory or glob')
+    parser.add_argument('-g', '--glob', type=str, default = '*',
+                        help='Pattern of capture files inside a directory, default: *')
+    parser.add_argument('-m', '--mode', type=str, default = 'power', choices = ['power', 'pdp'],
+                        help='Analysis to run: iq_to_power (power) or pdp_analysis (pdp), default: power')
+    parser.add_argument('-j', '--workers', type=int, default = os.cpu_count(),
+                        help='Worker processes, default: number of cores')
+    parser.add_argument('-S', '--split', type=int, default = SPLIT_SAMPLES,
+                        help='Split captures into ranges of this many samples, default: %d' % SPLIT_SAMPLES)
+    parser.add_argument('-w', '--window_size', type=int, default = None,
+                        help='Averaging window, default: 20000 (power) or per capture from its sidecar, else 100 (pdp)')
+    parser.add_argument('-d', '--degree', type=int, default = None,
+                        help='Degree of PN sequence (pdp), default: per capture from its sidecar, else %d' % DEFAULT_DEGREE)
+    parser.add_argument('-s', '--samp_rate', type=float, default = None,
+                        help='Sample rate used for output timestamps, default: per capture from its sidecar, else 24e6')
+    parser.add_argument('-F', '--sample_format', type=str, default = None, choices = capture_reader.SAMPLE_FORMATS,
+                        help='Sample format of the captures, default: per capture from its sidecar, else fc32')
+    parser.add_argument('--full_scale', type=float, default = None,
+                        help='Value an sc16 sample of 32767 stands for, default: per capture from its sidecar, else 1.0 (power) or 2**degree-1 (pdp)')
+    parser.add_argument('-o', '--format', type=str, default = 'csv', choices = output_writer.FORMATS,
+                        help='Output format, default: csv')
+    parser.add_argument('-O', '--out_dir', type=str, default = None,
+                        help='Directory for the outputs, default: next to each capture')
+    parser.add_argument('--stats', action='store_true',
+                        help='Also write statistics of the window powers of every capture (power) to <output>%s' % online_stats.SUFFIX)
+    result_cache.addArguments(parser)
+    args = parser.parse_args()
+
+    files = findCaptures(args.path, args.glob)
+    if not files:
+        sys.stderr.write('No captures found in {}\n'.format(args.path))
+        exit(1)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    #do work
+    stats, wall = run(files, args)
+    total = 0
+    for file_path, n_samples, seconds, done in stats:
+        total += n_samples
+        print('%-40s %12d samples %8.2f s worker %8.2f s done %8.2f Msamples/s per worker' % (
+            os.path.basename(file_path), n_samples, seconds, done, n_samples/max(seconds, 1e-9)/1e6))
+    print('%d files, %d samples in %.2f s: %.2f Msamples/s aggregate' % (len(stats), total, wall, total/wall/1e6))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/python3
+#Benchmarks for the analysis scripts. Each benchmark builds a synthetic capture,
+#runs the current implementation on it and, where there is one, the implementation
+#it replaced, and prints the throughput of both.
+
+import numpy as np
+import os
+import time
+import tempfile
+import argparse
+from decimal import Decimal, getcontext
+
+#Times a single call of func(*args) and returns (seconds, result)
+def timeit(func, *args):
+	start = time.perf_counter()
+	result = func(*args)
+	return time.perf_counter() - start, result
+
+#Prints a throughput line in Msamples/s
+def report(name, n_samples, seconds):
+	print('%-32s %10d samples %8.3f s %10.2f Msamples/s' % (name, n_samples, seconds, n_samples/seconds/1e6))
+
+#Writes n_samples of complex gaussian noise to an fc32 file and returns its path
+def syntheticCapture(directory, n_samples, chunk_size=2**22):
+	path = os.path.join(directory, 'capture.fc32')
+	rng = np.random.RandomState(0)
+	with open(path, 'wb') as f:
+		for start in range(0, n_samples, chunk_size):
+			n = min(chunk_size, n_samples - start)
+			chunk = (rng.standard_normal(n) + 1j*rng.standard_normal(n)).astype(np.complex64)
+			chunk.tofile(f)
+	return path
+
+#Writes n_samples of a synthetic CIR capture to an fc32 file and returns its path: noise
+#plus, every PN period, a direct path and two weaker echoes with random phase
+def syntheticCIR(directory, n_samples, degree=8, chunk_size=2**22):
+	path = os.path.join(directory, 'CIR')
+	pn_len = 2**degree-1
+	rng = np.random.RandomState(0)
+	chunk_size = chunk_size//pn_len*pn_len
+	with open(path, 'wb') as f:
+		for start in range(0, n_samples, chunk_size):
+			n = min(chunk_size, n_samples - start)
+			chunk = (rng.standard_normal(n) + 1j*rng.standard_normal(n))*0.01
+			periods = np.arange(0, n - 60, pn_len)
+			for delay, gain in ((37, 50.0), (42, 15.0), (54, 5.0)):
+				chunk[periods + delay] += gain*np.exp(2j*np.pi*rng.rand(len(periods)))
+			chunk.astype(np.complex64).tofile(f)
+	return path
+
+#Writes n_samples of a synthetic RAW capture (what cir_rxd.py records) to an fc32 file and
+#returns its path: the +-1 PN sequence through a three-path channel, plus noise
+def syntheticRaw(directory, n_samples, degree=8, chunk_size=2**22):
+	import pn_taps
+	path = os.path.join(directory, 'RAW')
+	pn = pn_taps.glfsr_sequence(degree).astype(np.float32)
+	rng = np.random.RandomState(0)
+	chunk_size = chunk_size//len(pn)*len(pn)
+	with open(path, 'wb') as f:
+		for start in range(0, n_samples, chunk_size):
+			n = min(chunk_size, n_samples - start)
+			tx = np.tile(pn, n//len(pn) + 1)[:n]
+			chunk = 0.3*tx + 0.1*np.roll(tx, 5)*1j + 0.03*np.roll(tx, 17)
+			chunk = chunk + 0.05*(rng.standard_normal(n) + 1j*rng.standard_normal(n))
+			chunk.astype(np.complex64).tofile(f)
+	return path
+
+#Writes the fc32 capture at path as sc16 (1.0 as 32767) next to it and returns its path
+def toSC16(path, full_scale=1.0):
+	import capture_reader
+	out = path + '.sc16'
+	with open(out, 'wb') as f:
+		for chunk in capture_reader.iterChunks(path):
+			scaled = chunk*(capture_reader.SC16_MAX/full_scale)
+			np.stack((scaled.real, scaled.imag), axis=1).round().astype(np.int16).tofile(f)
+	return out
+
+#Per-sample windowed average and Decimal dB conversion that iq_to_power.py used before
+#the block-reduction engine, kept as the baseline
+def legacyWindowedAvg(power_data, N):
+	truncate = len(power_data) % N
+	mv_avg_power = []
+	count = 0
+	power = 0
+	for i in range(len(power_data) - truncate):
+		if count < N:
+			power += power_data[i]
+			count += 1
+		else:
+			mv_avg_power.append(power/float(N))
+			count = 0
+			power = 0
+	return mv_avg_power
+
+def legacyLinearPowerToDecibel(lin_power):
+	getcontext().prec = 10
+	db_power = []
+	for i in range(0,len(lin_power)):
+		db_power.append(Decimal("10")*Decimal(float(lin_power[i])).log10() if lin_power[i] != 0 else Decimal('NaN'))
+	return db_power
+
+def legacyIqToPower(file_path, N):
+	data = np.fromfile(file_path, dtype=np.complex64)
+	return legacyLinearPowerToDecibel(legacyWindowedAvg(np.abs(data)**2, N))
+
+#Per-peak averaging loop that pdp_analysis.avg_pdp used before it was vectorized
+def legacyAvgPdp(data, window, degree, indices):
+	pn_len = 2**degree-1
+	indices = indices[indices > 20000]
+	indices = indices[indices < len(data) - 20000]
+	avg_pdp = np.zeros((len(indices)//(window+1)+1)*pn_len)
+	count = 0
+	temp = np.zeros(pn_len)
+	avg_pdp_index = 0
+	for i in indices:
+		if count < window:
+			temp = temp + np.abs(data[i:i+pn_len])**2
+			count = count + 1
+		else:
+			temp = temp/window
+			avg_pdp[avg_pdp_index:avg_pdp_index+pn_len] = temp
+			temp = np.zeros(pn_len)
+			count = 0
+			avg_pdp_index = avg_pdp_index + pn_len
+	return avg_pdp[avg_pdp != 0]
+
+#Per-period delay spread that pdp_analysis.delaySpread computed before the matrix version,
+#on a flattened dB pdp: two find_multi_peaks passes per period
+def legacyFindMultiPeaks(pdp, samp_rate):
+	from scipy.signal import find_peaks
+	indices = find_peaks(pdp)[0]
+	noise = np.average(pdp)
+	for i in range(len(indices)):
+		if pdp[indices[i]] < noise:
+			indices[i] = 0
+	indices = [i for i in indices if i !=0]
+	time_delays = [float(i)/float(samp_rate)-float(indices[0])/float(samp_rate) for i in indices]
+	magnitudes = [pdp[i] for i in indices]
+	time_delays.pop(0)
+	magnitudes.pop(0)
+	indices.pop(0)
+	return time_delays, magnitudes, indices
+
+def legacyDelaySpread(pdp, degree, samp_rate):
+	from scipy.signal import find_peaks
+	indices = find_peaks(pdp,distance=2**degree-3)[0]
+	pdp = pdp[indices[0]:indices[-1]]
+	mean_delay = 0
+	rms_delay = 0
+	for i in indices[0:-2]:
+		time_delays, magnitudes, index = legacyFindMultiPeaks(pdp[i:i+2**degree-60], samp_rate)
+		mean_delay = mean_delay + np.dot(magnitudes,time_delays)/sum(magnitudes)
+	mean_delay = mean_delay/len(indices[0:-2])
+	for i in indices[0:-2]:
+		time_delays, magnitudes, index = legacyFindMultiPeaks(pdp[i:i+2**degree-60], samp_rate)
+		delays = [(i - mean_delay)**2 for i in time_delays]
+		rms_delay = rms_delay + np.sqrt(np.dot(magnitudes,delays)/sum(magnitudes))
+	return mean_delay, rms_delay/len(indices[0:-2])
+
+#iq_to_power.py: chunked block-reduction engine against the per-sample loop
+def benchWindowedAvg(args, directory):
+	import iq_to_power
+	path = syntheticCapture(directory, args.samples)
+
+	def current():
+		power = (iq_to_power.binToLinearPower(c) for c in iq_to_power.readBinChunks(path))
+		avg = np.concatenate([np.zeros(0)] + list(iq_to_power.chunkedWindowedAvg(power, args.window)))
+		return iq_to_power.linearPowerToDecibel(avg)
+
+	seconds, _ = timeit(current)
+	report('iq_to_power (chunked)', args.samples, seconds)
+	if args.legacy_samples:
+		legacy_path = syntheticCapture(directory, args.legacy_samples)
+		seconds, _ = timeit(legacyIqToPower, legacy_path, args.window)
+		report('iq_to_power (legacy loop)', args.legacy_samples, seconds)
+
+#output_writer.py: write throughput of every output format against np.savetxt
+def benchWriters(args, directory):
+	import output_writer
+	values = 10*np.log10(np.random.RandomState(0).rand(args.values))
+	name = os.path.join(directory, 'out')
+	seconds, _ = timeit(np.savetxt, name + '.txt', [values], '%.18e', ',')
+	report('np.savetxt row (legacy toCSV)', len(values), seconds)
+	for fmt in output_writer.FORMATS:
+		def write(values):
+			with output_writer.openWriter(fmt, name, args.window, 24e6) as writer:
+				for start in range(0, len(values), 2**16):
+					writer.write(values[start:start+2**16])
+		try:
+			#warm up so that optional imports are not counted
+			write(values[:1])
+			seconds, _ = timeit(write, values)
+		except ImportError as e:
+			print('%-32s skipped (%s)' % ('output_writer ' + fmt, e))
+			continue
+		report('output_writer ' + fmt, len(values), seconds)
+
+#pdp_analysis.avg_pdp: one gathered reduction per batch of groups against the per-peak loop,
+#both given the same peaks, on a synthetic CIR capture of --cir_seconds
+def benchAvgPdp(args, directory):
+	import pdp_analysis
+	n_samples = int(args.cir_seconds*args.samp_rate)
+	data = pdp_analysis.readBin(syntheticCIR(directory, n_samples, args.degree))
+	seconds, indices = timeit(pdp_analysis.find_pn_peaks, data, args.degree)
+	report('find_pn_peaks', n_samples, seconds)
+	seconds, _ = timeit(pdp_analysis.avg_pdp, data, args.pdp_window, args.degree, indices)
+	report('avg_pdp (vectorized)', n_samples, seconds)
+	seconds, _ = timeit(pdp_analysis.avg_pdp_coherent, data, args.pdp_window, args.degree, indices)
+	report('avg_pdp_coherent', n_samples, seconds)
+	seconds, _ = timeit(legacyAvgPdp, data, args.pdp_window, args.degree, indices)
+	report('avg_pdp (legacy loop)', n_samples, seconds)
+
+#pdp_analysis.delay_spread: one pass over the (periods, pn_len) matrix against the two
+#find_multi_peaks loops per period, on every PN period of a synthetic CIR capture
+def benchDelaySpread(args, directory):
+	import pdp_analysis
+	n_samples = int(args.cir_seconds*args.samp_rate)
+	data = pdp_analysis.readBin(syntheticCIR(directory, n_samples, args.degree))
+	pdps = pdp_analysis.avg_pdp(data, 1, args.degree)
+	seconds, _ = timeit(pdp_analysis.delay_spread, pdps, args.samp_rate, 2**args.degree-60)
+	report('delay_spread (matrix)', pdps.size, seconds)
+	legacy = pdps[:max(args.legacy_samples//pdps.shape[1], 3)]
+	seconds, _ = timeit(legacyDelaySpread, pdp_analysis.linearPowerToDecibel(legacy.ravel()), args.degree, args.samp_rate)
+	report('delaySpread (legacy loops)', legacy.size, seconds)
+
+#correlator.py: sustained throughput of each correlator backend per PN degree, in a
+#flowgraph of null (or --source file) source -> head -> correlator -> null sink
+def benchCorrelator(args, directory):
+	from gnuradio import gr, blocks
+	import correlator
+	import pn_taps
+	for degree in [int(d) for d in args.degrees.split(',')]:
+		taps = pn_taps.correlator_taps(degree)
+		for backend in correlator.BACKENDS:
+			tb = gr.top_block()
+			if args.source:
+				source = blocks.file_source(gr.sizeof_gr_complex, args.source, True)
+			else:
+				source = blocks.null_source(gr.sizeof_gr_complex)
+			head = blocks.head(gr.sizeof_gr_complex, args.samples)
+			sink = blocks.null_sink(gr.sizeof_gr_complex)
+			tb.connect(source, head, correlator.make_correlator(taps, backend, args.fft_threads), sink)
+			seconds, _ = timeit(tb.run)
+			report('correlator %s degree %d' % (backend, degree), args.samples, seconds)
+
+#capture_archive.py: compression ratio, pack speed, sequential decode speed and the time
+#to read 1000 samples at random offsets, per codec, with and without byte shuffling, on
+#synthetic RAW and CIR captures in fc32 and sc16
+def benchArchive(args, directory):
+	import capture_archive
+	import capture_reader
+	n_samples = min(args.samples, int(args.cir_seconds*args.samp_rate))
+	raw = syntheticRaw(directory, n_samples, args.degree)
+	cir = syntheticCIR(directory, n_samples, args.degree)
+	captures = [('RAW fc32', raw, np.complex64), ('RAW sc16', toSC16(raw), capture_reader.SC16),
+	            ('CIR fc32', cir, np.complex64), ('CIR sc16', toSC16(cir, 100.0), capture_reader.SC16)]
+	archive = os.path.join(directory, 'capture' + capture_archive.EXTENSION)
+	rng = np.random.RandomState(0)
+	print('%-10s %-5s %-8s %7s %12s %12s %14s' % ('capture', 'codec', 'shuffle', 'ratio', 'pack Msps', 'decode Msps', 'random read ms'))
+	for name, path, dtype in captures:
+		for codec_name in capture_archive.CODECS:
+			for shuffled in (True, False):
+				try:
+					seconds, (size, packed) = timeit(capture_archive.pack, path, archive, dtype, codec_name, None, shuffled)
+				except ImportError as e:
+					print('%-10s %-5s skipped (%s)' % (name, codec_name, e))
+					break
+				def decode():
+					for chunk in capture_reader.iterChunks(capture_reader.openCapture(archive, dtype)):
+						pass
+				decode_seconds, _ = timeit(decode)
+				def randomReads():
+					data = capture_reader.openCapture(archive, dtype)
+					for start in rng.randint(0, n_samples - 1000, 20):
+						data[start:start+1000]
+				random_seconds, _ = timeit(randomReads)
+				print('%-10s %-5s %-8s %7.2f %12.1f %12.1f %14.2f' % (name, codec_name, shuffled, size/float(packed),
+				      n_samples/seconds/1e6, n_samples/decode_seconds/1e6, random_seconds/20*1e3))
+
+BENCHMARKS = {
+	'archive': benchArchive,
+	'avg_pdp': benchAvgPdp,
+	'correlator': benchCorrelator,
+	'delay_spread': benchDelaySpread,
+	'windowed_avg': benchWindowedAvg,
+	'writers': benchWriters,
+}
+
+def main():
+	parser = argparse.ArgumentParser(description='Throughput benchmarks for the analysis scripts')
+	parser.add_argument('-b', '--bench', type=str, default = 'all', choices = ['all'] + sorted(BENCHMARKS),
+	                   help='Benchmark to run, default: all')
+	parser.add_argument('-N', '--samples', type=int, default = 24*10**6,
+	                   help='Samples in the synthetic capture, default: 24M (1 s at 24 Msps)')
+	parser.add_argument('-l', '--legacy_samples', type=int, default = 2*10**6,
+	                   help='Samples given to the legacy implementations (0 to skip), default: 2M')
+	parser.add_argument('-w', '--window', type=int, default = 20000,
+	                   help='Averaging window size, default: 20000')
+	parser.add_argument('-t', '--cir_seconds', type=float, default = 10,
+	                   help='Length of the synthetic CIR capture in seconds, default: 10')
+	parser.add_argument('-s', '--samp_rate', type=float, default = 24e6,
+	                   help='Sample rate of the synthetic CIR capture, default: 24e6')
+	parser.add_argument('-d', '--degree', type=int, default = 8,
+	                   help='Degree of the PN sequence, default: 8')
+	parser.add_argument('-W', '--pdp_window', type=int, default = 100,
+	                   help='PN periods averaged per PDP, default: 100')
+	parser.add_argument('-D', '--degrees', type=str, default = '8,9,10',
+	                   help='Comma separated PN degrees for the correlator benchmark, default: 8,9,10')
+	parser.add_argument('-S', '--source', type=str, default = None,
+	                   help='fc32 file to loop through the correlator benchmark, default: null source')
+	parser.add_argument('-T', '--fft_threads', type=int, default = 1,
+	                   help='Threads of the fft correlator, default: 1')
+	parser.add_argument('-v', '--values', type=int, default = 2*10**6,
+	                   help='Result values written by the output benchmarks, default: 2M')
+	args = parser.parse_args()
+
+	names = sorted(BENCHMARKS) if args.bench == 'all' else [args.bench]
+	for name in names:
+		with tempfile.TemporaryDirectory() as directory:
+			try:
+				BENCHMARKS[name](args, directory)
+			except ImportError as e:
+				print('%-32s skipped (%s)' % (name, e))
+
+if __name__ == "__main__":
+	main()
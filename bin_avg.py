@@ -1,7 +1,7 @@
 #!/usr/bin/python3
-#Program that takes in a complex binary file (fc32)
-#and calculates the received power and outputs a plot
-#of average received power
+#Program that takes in a binary file of float32 dB power values
+#(as written by uhd_rx_powerfile) and computes the average
+#received power in non-overlapping windows
 #comment
 
 import numpy as np
@@ -9,32 +9,40 @@ import scipy
 import os
 import matplotlib.pyplot as plt
 import math
-from decimal import *
 import argparse
+import capture_reader
+import output_writer
+import window_avg
+import capture_meta
+import result_cache
+import online_stats
+from capture_reader import CHUNK_SIZE
 
+#Default number of leading samples discarded while the receiver settles
+SKIP = 50
+#Default clip threshold in dB. Samples at or below it (log of zero power) are dropped
+CLIP = -200.0
 
-
-#Takes in binary file and returns binary data array
+#Takes in binary file of float32 dB power and returns a memory-mapped array
 def readBin(file_path):
-	return np.fromfile(file_path, dtype=np.complex64).real
+	return capture_reader.openCapture(file_path, np.float32)
+
+#Takes in dB power measurements and yields, chunk by chunk, the samples left after the
+#warm-up skip and clipping, converted to linear power if linear is set
+def clippedChunks(power_data, skip=SKIP, clip=CLIP, linear=False, chunk_size=CHUNK_SIZE):
+	for chunk in capture_reader.iterChunks(power_data, chunk_size, start=skip):
+		kept = chunk[chunk > clip]
+		if linear:
+			kept = np.power(10.0, kept/np.float64(10))
+		yield kept
 
 #Takes in power measurements and computes averages in non-overlapping windows of size N.
-def windowedAvg(power_data, N):
-	power_data = power_data[50:]
-	clipped = power_data[(-200 < power_data)]
-	truncate = len(clipped) % N
-	mv_avg_power = []
-	count = 0
-	power = 0
-	for i in range(len(clipped) - truncate):
-		if count < N:
-			power += clipped[i]
-			count += 1
-		else:
-			mv_avg_power.append(power/float(N))
-			count = 0
-			power = 0
-	return mv_avg_power
+#With linear set, windows are averaged in the linear domain and converted back to dB
+def windowedAvg(power_data, N, skip=SKIP, clip=CLIP, linear=False, chunk_size=CHUNK_SIZE):
+	avg_power = window_avg.windowedAvg(clippedChunks(power_data, skip, clip, linear, chunk_size), N)
+	if linear:
+		avg_power = 10*np.log10(avg_power)
+	return avg_power
 
 
 def toCSV(array,filename):
@@ -43,14 +51,28 @@ def toCSV(array,filename):
 
 def main():
 	#get user input
-	parser = argparse.ArgumentParser(description='Binary I/Q data file to csv of decibel powers')
+	parser = argparse.ArgumentParser(description='Binary dB power file to csv of window averaged powers')
 	parser.add_argument('-p', '--path', type=str,
-	                   help='Directory path to i/q data file')
+	                   help='Directory path to dB power file')
 	parser.add_argument('-w', '--window_size', type=int, default = 20000, required = False,
 	                   help='Size of averaging window, default: 20000')
 	parser.add_argument('-n', '--name', type=str,  default = 'db_power',
-	                   help='Name your CSV file, default: db_power')
+	                   help='Name your output file (without extension), default: db_power')
+	parser.add_argument('-o', '--format', type=str, default = 'csv', choices = output_writer.FORMATS,
+	                   help='Output format, default: csv')
+	parser.add_argument('-s', '--samp_rate', type=float, default = None, required = False,
+	                   help='Sample rate used for output timestamps, default: from the capture\'s sidecar, else 24e6')
+	parser.add_argument('-k', '--skip', type=int, default = SKIP, required = False,
+	                   help='Warm-up samples to discard, default: %d' % SKIP)
+	parser.add_argument('-c', '--clip', type=float, default = CLIP, required = False,
+	                   help='Drop samples at or below this dB value, default: %g' % CLIP)
+	parser.add_argument('-l', '--linear', action='store_true',
+	                   help='Average in the linear power domain instead of in dB')
+	parser.add_argument('--stats', action='store_true',
+	                   help='Also write statistics of the window powers (mean, std, min/max, quantiles, histogram) to <name>%s' % online_stats.SUFFIX)
+	result_cache.addArguments(parser)
 	args = parser.parse_args()
+	capture_meta.resolveArgs(args, args.path, {'samp_rate': 24e6})
 
 	#initialize variables
 	file_path = args.path
@@ -59,9 +81,18 @@ def main():
 
 	#do work
 	bin_file = readBin(file_path)
-	avg_power = windowedAvg(bin_file,N)
-	#save to CSV
-	toCSV(avg_power,file_name+".csv")
+	compute = lambda: windowedAvg(bin_file,N,args.skip,args.clip,args.linear)
+	cache = result_cache.fromArgs(args)
+	if cache is None:
+		avg_power = compute()
+	else:
+		avg_power = cache.cached(file_path, 'bin_avg', compute, window=N, skip=args.skip, clip=args.clip, linear=args.linear)
+	#save in the requested format
+	output_writer.writeArray(avg_power, args.format, file_name, N, args.samp_rate, args.skip/args.samp_rate)
+	if args.stats:
+		stats = online_stats.OnlineStats()
+		stats.update(avg_power)
+		stats.save(file_name + online_stats.SUFFIX)
 
 if __name__ == "__main__":
 	main()
@@ -0,0 +1,287 @@
+#!/usr/bin/python3
+#Compressed, chunked container for archived captures. Samples are stored in blocks of
+#BLOCK_SAMPLES, each byte-shuffled (the i-th byte of every value grouped together, as
+#blosc does) and compressed on its own, followed by an index of block offsets. Any sample
+#range can then be read by decompressing only the blocks it touches. zlib is always
+#available; zstd (zstandard) and lz4 are used when installed.
+#
+#capture_reader opens these files transparently, so iq_to_power.py, bin_avg.py and
+#pdp_analysis.py take an archive wherever they take a raw capture.
+
+import numpy as np
+import os
+import zlib
+import struct
+import argparse
+import capture_meta
+
+MAGIC = b'CAPZ'
+VERSION = 1
+EXTENSION = '.capz'
+
+#Header: magic, version, codec, shuffle, dtype string, block samples, total samples,
+#offset of the block index. Rewritten on close, once the last two are known
+HEADER = struct.Struct('<4sH8s?16sIQQ')
+
+#Index: (file offset, compressed size) of every block
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('size', '<u8')])
+
+#Samples per block (512 kB of fc32). Random reads decode at most two blocks
+BLOCK_SAMPLES = 2**16
+
+CODECS = ['zlib', 'zstd', 'lz4']
+
+#Takes in a codec name and compression level and returns (compress, decompress)
+def codec(name, level=None):
+    if name == 'zlib':
+        level = 1 if level is None else level
+        return (lambda b: zlib.compress(b, level)), zlib.decompress
+    if name == 'zstd':
+        import zstandard
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        decompressor = zstandard.ZstdDecompressor()
+        return compressor.compress, decompressor.decompress
+    if name == 'lz4':
+        import lz4.frame
+        level = 0 if level is None else level
+        return (lambda b: lz4.frame.compress(b, compression_level=level)), lz4.frame.decompress
+    raise ValueError('Unknown codec: {}'.format(name))
+
+#Size in bytes of the scalars a sample is made of (the float32 parts of a complex64, the
+#int16 parts of an sc16 pair), which is the unit bytes are shuffled by
+def typesize(dtype):
+    dtype = np.dtype(dtype)
+    base = dtype.subdtype[0] if dtype.subdtype else dtype
+    return base.itemsize // 2 if base.kind == 'c' else base.itemsize
+
+#dtype as stored in the header, e.g. '<c8', or '<i2,2' for sc16 pairs, and back
+def dtypeString(dtype):
+    if dtype.subdtype:
+        return '%s,%d' % (dtype.subdtype[0].str, dtype.subdtype[1][0])
+    return dtype.str
+
+def parseDtype(text):
+    if ',' in text:
+        base, count = text.split(',')
+        return np.dtype((np.dtype(base), int(count)))
+    return np.dtype(text)
+
+#numpy turns a subarray dtype like sc16 into extra axes, so arrays are handled as their
+#scalar base type plus item shape
+def baseType(dtype):
+    if dtype.subdtype:
+        return dtype.subdtype
+    return dtype, ()
+
+def shuffle(block, size):
+    return np.ascontiguousarray(np.frombuffer(block, dtype=np.uint8).reshape(-1, size).T).tobytes()
+
+def unshuffle(data, size):
+    return np.ascontiguousarray(np.frombuffer(data, dtype=np.uint8).reshape(size, -1).T).tobytes()
+
+#Takes in a path and returns whether it is a capture archive
+def isArchive(file_path):
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except IOError:
+        return False
+
+class ArchiveWriter:
+    """
+    Writes samples of dtype (np.complex64, capture_reader.SC16, np.float32, ...) to an
+    archive, in as many pieces as the caller likes. Use as a context manager or call close().
+    """
+    def __init__(self, file_path, dtype=np.complex64, codec_name='zlib', level=None, shuffled=True,
+                 block_samples=BLOCK_SAMPLES):
+        self.dtype = np.dtype(dtype)
+        self.codec_name = codec_name
+        self.compress = codec(codec_name, level)[0]
+        self.shuffled = shuffled
+        self.block_samples = block_samples
+        self.typesize = typesize(self.dtype)
+        self.base, self.item_shape = baseType(self.dtype)
+        self.f = open(file_path, 'wb')
+        self.f.write(b'\0'*HEADER.size)
+        self.pending = []
+        self.pending_samples = 0
+        self.n_samples = 0
+        self.index = []
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=self.base).reshape((-1,) + self.item_shape)
+        self.pending.append(samples)
+        self.pending_samples += len(samples)
+        if self.pending_samples >= self.block_samples:
+            data = np.concatenate(self.pending)
+            n_full = len(data)//self.block_samples*self.block_samples
+            for start in range(0, n_full, self.block_samples):
+                self.writeBlock(data[start:start+self.block_samples])
+            self.pending = [data[n_full:]]
+            self.pending_samples = len(data) - n_full
+
+    def writeBlock(self, samples):
+        block = np.ascontiguousarray(samples).tobytes()
+        if self.shuffled:
+            block = shuffle(block, self.typesize)
+        data = self.compress(block)
+        self.index.append((self.f.tell(), len(data)))
+        self.f.write(data)
+        self.n_samples += len(samples)
+
+    def close(self):
+        if self.pending_samples:
+            self.writeBlock(np.concatenate(self.pending))
+        index_offset = self.f.tell()
+        np.array(self.index, dtype=INDEX_DTYPE).tofile(self.f)
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, VERSION, self.codec_name.encode(), self.shuffled,
+                                 dtypeString(self.dtype).encode(), self.block_samples, self.n_samples, index_offset))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CaptureArchive:
+    """
+    Read-only, array-like view of an archive: len() is the number of samples and slicing
+    (with any step) returns the samples as an ndarray, decompressing only the blocks the
+    slice covers. The last decoded block is kept, so reading a capture chunk by chunk
+    decodes every block once. offset and length restrict the view to part of the archive,
+    as in capture_reader.openCapture.
+    """
+    def __init__(self, file_path, offset=0, length=None):
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            magic, version, codec_name, self.shuffled, dtype, self.block_samples, self.n_samples, index_offset = \
+                HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('{} is not a capture archive'.format(file_path))
+            f.seek(index_offset)
+            self.index = np.fromfile(f, dtype=INDEX_DTYPE)
+        self.dtype = parseDtype(dtype.rstrip(b'\0').decode())
+        self.codec_name = codec_name.rstrip(b'\0').decode()
+        self.decompress = codec(self.codec_name)[1]
+        self.typesize = typesize(self.dtype)
+        self.base, self.item_shape = baseType(self.dtype)
+        self.f = open(file_path, 'rb')
+        self.cached = (None, None)
+        self.offset = min(offset, self.n_samples)
+        available = self.n_samples - self.offset
+        self.length = available if length is None else min(length, available)
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def shape(self):
+        return (self.length,) + (self.dtype.subdtype[1] if self.dtype.subdtype else ())
+
+    def block(self, i):
+        if self.cached[0] != i:
+            offset, size = self.index[i]
+            self.f.seek(int(offset))
+            data = self.decompress(self.f.read(int(size)))
+            if self.shuffled:
+                data = unshuffle(data, self.typesize)
+            self.cached = (i, np.frombuffer(data, dtype=self.base).reshape((-1,) + self.item_shape))
+        return self.cached[1]
+
+    #samples [start, stop) of the view
+    def read(self, start, stop):
+        start = max(start, 0)
+        stop = min(stop, self.length)
+        if stop <= start:
+            return np.zeros(0, dtype=self.dtype)
+        start += self.offset
+        stop += self.offset
+        first = start // self.block_samples
+        last = (stop - 1) // self.block_samples
+        if first == last:
+            base = first*self.block_samples
+            return self.block(first)[start-base:stop-base].copy()
+        parts = []
+        for i in range(first, last + 1):
+            base = i*self.block_samples
+            parts.append(self.block(i)[max(start-base, 0):stop-base])
+        return np.concatenate(parts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step > 0:
+                return self.read(start, stop)[::step] if step != 1 else self.read(start, stop)
+            return self.read(0, self.length)[key]
+        if isinstance(key, (int, np.integer)):
+            key = key + self.length if key < 0 else key
+            if not 0 <= key < self.length:
+                raise IndexError('sample index out of range')
+            return self.read(key, key + 1)[0]
+        #fancy indexing: decode the span the indices cover
+        key = np.asarray(key)
+        lo = int(key.min())
+        return self.read(lo, int(key.max()) + 1)[key - lo]
+
+    def close(self):
+        self.f.close()
+
+#Packs a raw capture into an archive and returns (raw bytes, archive bytes)
+def pack(file_path, archive_path, dtype=np.complex64, codec_name='zlib', level=None, shuffled=True,
+         block_samples=BLOCK_SAMPLES):
+    import capture_reader
+    with ArchiveWriter(archive_path, dtype, codec_name, level, shuffled, block_samples) as writer:
+        for chunk in capture_reader.iterChunks(capture_reader.openCapture(file_path, dtype), block_samples*4):
+            writer.write(chunk)
+    #the archive keeps the capture's metadata, unless it is already found under the archive's name
+    meta = capture_meta.readMeta(file_path)
+    if meta is not None and capture_meta.findMeta(archive_path) is None:
+        capture_meta.saveMeta(archive_path, meta)
+    return os.path.getsize(file_path), os.path.getsize(archive_path)
+
+#Unpacks an archive back into a raw capture
+def unpack(archive_path, file_path):
+    archive = CaptureArchive(archive_path)
+    with open(file_path, 'wb') as f:
+        for i in range(len(archive.index)):
+            archive.block(i).tofile(f)
+    archive.close()
+    meta = capture_meta.readMeta(archive_path)
+    if meta is not None and capture_meta.findMeta(file_path) is None:
+        capture_meta.saveMeta(file_path, meta)
+
+def main():
+    import capture_reader
+    parser = argparse.ArgumentParser(description='Pack raw captures into compressed archives with random access, or unpack them')
+    parser.add_argument('-p', '--path', type=str, required = True,
+                        help='Capture to pack, or archive to unpack')
+    parser.add_argument('-O', '--output', type=str, default = None,
+                        help='Output file, default: <path>' + EXTENSION + ' when packing, <path> without it when unpacking')
+    parser.add_argument('-u', '--unpack', action='store_true',
+                        help='Unpack an archive back into a raw capture')
+    parser.add_argument('-F', '--sample_format', type=str, default = None, choices = capture_reader.SAMPLE_FORMATS + ['f32'],
+                        help='Sample format of the capture (f32: bin_avg power files), default: from its sidecar, else fc32')
+    parser.add_argument('-c', '--codec', type=str, default = 'zlib', choices = CODECS,
+                        help='Compression codec, default: zlib')
+    parser.add_argument('-l', '--level', type=int, default = None,
+                        help='Compression level, default: the codec\'s fast setting')
+    parser.add_argument('--no_shuffle', action='store_true',
+                        help='Compress the bytes as they are instead of byte-shuffled')
+    parser.add_argument('-b', '--block_samples', type=int, default = BLOCK_SAMPLES,
+                        help='Samples per compressed block, default: %d' % BLOCK_SAMPLES)
+    args = parser.parse_args()
+
+    if args.unpack:
+        output = args.output or (args.path[:-len(EXTENSION)] if args.path.endswith(EXTENSION) else args.path + '.raw')
+        unpack(args.path, output)
+    else:
+        capture_meta.resolveArgs(args, args.path, {'sample_format': 'fc32'})
+        dtype = {'fc32': np.complex64, 'sc16': capture_reader.SC16, 'f32': np.float32}[args.sample_format]
+        output = args.output or args.path + EXTENSION
+        raw, packed = pack(args.path, output, dtype, args.codec, args.level, not args.no_shuffle, args.block_samples)
+        print('%s: %d -> %d bytes, ratio %.2f' % (output, raw, packed, raw/float(max(packed, 1))))
+
+if __name__ == "__main__":
+    main()
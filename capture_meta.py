@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+#SigMF-style metadata sidecars for captures. Every receiver writes <capture>.sigmf-meta
+#(JSON) next to the file it records, holding the sample format, rate, centre frequency,
+#gain, PN sequence and filter parameters, and the host and hardware time of sample 0.
+#The analysis scripts read it to fill in any of -s/-d/-F/... that was not given, and the
+#result cache keys on it.
+#
+#Fields defined by SigMF use its core: names; the rest live in the cir: namespace.
+
+import json
+import os
+import time
+import hashlib
+
+SUFFIX = '.sigmf-meta'
+SIGMF_VERSION = '1.0.0'
+
+#SigMF datatype of every sample format written by the receivers
+DATATYPES = {'fc32': 'cf32_le', 'sc16': 'ci16_le', 'f32': 'rf32_le'}
+SAMPLE_FORMATS = dict((v, k) for k, v in DATATYPES.items())
+
+#Extensions a sidecar is also looked up without (an archived CIR.capz keeps CIR's sidecar)
+STRIP_EXTENSIONS = ['.capz']
+
+#Takes in a capture path and returns the path of its sidecar
+def metaPath(capture_path):
+    return capture_path + SUFFIX
+
+#Returns the sidecar of a capture if there is one, else None
+def findMeta(capture_path):
+    candidates = [metaPath(capture_path)]
+    base, ext = os.path.splitext(capture_path)
+    if ext in STRIP_EXTENSIONS:
+        candidates.append(metaPath(base))
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return None
+
+#Returns a short digest of a list of filter taps, stored instead of long tap lists
+def tapsDigest(taps):
+    return hashlib.sha1(','.join('%.9g' % t for t in taps).encode()).hexdigest()
+
+#ISO 8601 UTC time of a unix timestamp, as SigMF's core:datetime wants it
+def isoTime(t):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(t)) + ('%.6fZ' % (t % 1))[1:]
+
+#Writes the sidecar of a capture. sample_format is one of DATATYPES; start_time is the
+#host time and hw_time the device time of sample 0, if known. Any other keyword (degree,
+#alpha, gain, taps, ...) is stored as cir:<keyword>. Returns the sidecar path
+def writeMeta(capture_path, sample_format='fc32', samp_rate=None, center_freq=None, start_time=None,
+              hw_time=None, recorder=None, **fields):
+    meta = {
+        'global': {
+            'core:datatype': DATATYPES[sample_format],
+            'core:version': SIGMF_VERSION,
+        },
+        'captures': [{'core:sample_start': 0}],
+        'annotations': [],
+    }
+    if samp_rate is not None:
+        meta['global']['core:sample_rate'] = float(samp_rate)
+    if recorder is not None:
+        meta['global']['core:recorder'] = recorder
+    for key, value in sorted(fields.items()):
+        if value is not None:
+            meta['global']['cir:' + key] = value
+    capture = meta['captures'][0]
+    if center_freq is not None:
+        capture['core:frequency'] = float(center_freq)
+    if start_time is not None:
+        capture['core:datetime'] = isoTime(start_time)
+        capture['cir:host_time'] = float(start_time)
+    if hw_time is not None:
+        capture['cir:hw_time'] = float(hw_time)
+    return saveMeta(capture_path, meta)
+
+#Writes a metadata dict to the capture's sidecar, replacing it atomically
+def saveMeta(capture_path, meta):
+    path = metaPath(capture_path)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+    os.rename(tmp, path)
+    return path
+
+#Returns the parsed sidecar of a capture, or None if it has none
+def readMeta(capture_path):
+    path = findMeta(capture_path)
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+#Sets the hardware time of sample 0 once the receiver has learnt it (from rx_time)
+def setHwTime(capture_path, hw_time):
+    meta = readMeta(capture_path)
+    if meta is None:
+        return
+    meta['captures'][0]['cir:hw_time'] = float(hw_time)
+    saveMeta(capture_path, meta)
+
+#Takes in a capture path and returns its parameters as a flat dict named like the
+#analysis scripts' options (samp_rate, degree, sample_format, full_scale, taps,
+#accumulated, center_freq, hw_time, ...). Empty if the capture has no sidecar
+def captureParams(capture_path):
+    meta = readMeta(capture_path)
+    if meta is None:
+        return {}
+    params = {}
+    g = meta.get('global', {})
+    if 'core:datatype' in g:
+        params['sample_format'] = SAMPLE_FORMATS.get(g['core:datatype'])
+    if 'core:sample_rate' in g:
+        params['samp_rate'] = g['core:sample_rate']
+    for key, value in g.items():
+        if key.startswith('cir:'):
+            params[key[4:]] = value
+    captures = meta.get('captures') or [{}]
+    if 'core:frequency' in captures[0]:
+        params['center_freq'] = captures[0]['core:frequency']
+    for key in ('host_time', 'hw_time'):
+        if 'cir:' + key in captures[0]:
+            params[key] = captures[0]['cir:' + key]
+    return params
+
+#Fills every option in defaults that is None in args: from the capture's sidecar if it
+#has the value, else from defaults. Returns the sidecar parameters
+def resolveArgs(args, capture_path, defaults):
+    params = captureParams(capture_path)
+    for name, default in defaults.items():
+        if getattr(args, name, None) is None:
+            value = params.get(name)
+            setattr(args, name, default if value is None else value)
+    return params
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+#Shared reader for binary captures (fc32 by default) written by uhd_rx_cfile,
+#uhd_rx_powerfile and the cir_rx*.py receivers. Captures are exposed as np.memmap
+#views so that the analysis scripts only page in the part of the file they touch.
+#sc16 captures (interleaved int16 I/Q, half the size) are converted to complex64 only
+#as they are sliced.
+
+import numpy as np
+import os
+import time
+import capture_archive
+
+#Number of samples handed out per chunk by iterChunks (32 MB of fc32)
+CHUNK_SIZE = 2**22
+
+#Sample formats of the captures. An sc16 sample is an (I, Q) pair of int16, and the int16
+#value SC16_MAX stands for the capture's full scale
+SAMPLE_FORMATS = ['fc32', 'sc16']
+SC16 = np.dtype((np.int16, 2))
+SC16_MAX = 32767
+
+#Returns the number of whole samples of type dtype in the file
+def captureLength(file_path, dtype=np.complex64):
+    if capture_archive.isArchive(file_path):
+        return capture_archive.CaptureArchive(file_path).n_samples
+    return os.path.getsize(file_path) // np.dtype(dtype).itemsize
+
+#Takes in a capture file and returns a read-only memmap view of it, starting at sample
+#offset, holding at most length samples (default: to the end of file) and taking every
+#stride-th sample. No data is read until the view is indexed. Compressed archives
+#(capture_archive.py) are opened as a CaptureArchive, which decodes only the blocks sliced.
+def openCapture(file_path, dtype=np.complex64, offset=0, length=None, stride=1):
+    dtype = np.dtype(dtype)
+    if capture_archive.isArchive(file_path):
+        archive = capture_archive.CaptureArchive(file_path, offset, length)
+        if archive.dtype != dtype:
+            raise ValueError('{} holds {} samples, not {}'.format(file_path, archive.dtype, dtype))
+        return archive[::stride] if stride != 1 else archive
+    available = max(captureLength(file_path, dtype) - offset, 0)
+    length = available if length is None else min(length, available)
+    if length <= 0:
+        return np.zeros(0, dtype=dtype)
+    view = np.memmap(file_path, dtype=dtype, mode='r', offset=offset*dtype.itemsize, shape=(length,))
+    return view[::stride] if stride != 1 else view
+
+#Takes in sc16 samples (an (n, 2) int16 array) and returns them as complex64, with
+#SC16_MAX mapped to full_scale
+def sc16ToComplex(raw, full_scale=1.0):
+    samples = np.asarray(raw, dtype=np.float32).reshape(-1, 2).view(np.complex64)[:, 0]
+    samples *= np.float32(full_scale/float(SC16_MAX))
+    return samples
+
+class SC16Capture:
+    """
+    Read-only view of an sc16 capture that behaves like the complex64 memmap of an fc32
+    one: len() is the number of samples and slicing returns complex64 samples, converted
+    (and scaled by full_scale/SC16_MAX) only for the slice asked for.
+    """
+    dtype = np.dtype(np.complex64)
+
+    def __init__(self, raw, full_scale=1.0):
+        self.raw = raw
+        self.full_scale = full_scale
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def shape(self):
+        return (len(self.raw),)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return sc16ToComplex(self.raw[key], self.full_scale)
+        return sc16ToComplex(self.raw[key], self.full_scale).reshape(np.shape(self.raw[key])[:-1])
+
+#Takes in a capture file of sample format fmt and returns complex samples: the memmap view
+#of openCapture for fc32, an SC16Capture for sc16. Archives carry their own format
+def openSamples(file_path, fmt='fc32', full_scale=1.0, offset=0, length=None):
+    if capture_archive.isArchive(file_path):
+        fmt = 'sc16' if capture_archive.CaptureArchive(file_path).dtype == SC16 else 'fc32'
+    if fmt == 'sc16':
+        return SC16Capture(openCapture(file_path, SC16, offset, length), full_scale)
+    if fmt != 'fc32':
+        raise ValueError('Unknown sample format: {}'.format(fmt))
+    return openCapture(file_path, np.complex64, offset, length)
+
+#Takes in a capture (a path or an array/memmap view) and yields consecutive zero-copy
+#views of at most chunk_size samples, from sample start on. Skip samples through start
+#rather than by slicing an archive, which would decode all of it at once
+def iterChunks(capture, chunk_size=CHUNK_SIZE, dtype=np.complex64, start=0):
+    if isinstance(capture, str):
+        capture = openCapture(capture, dtype)
+    for lo in range(min(start, len(capture)), len(capture), chunk_size):
+        yield capture[lo:lo+chunk_size]
+
+#Takes in a number of samples and returns [start, stop) ranges of at most split samples,
+#each a multiple of align long so that no averaging window is cut in two
+def splitRanges(n_samples, split, align=1):
+    split = max(split // align, 1) * align
+    return [(start, min(start + split, n_samples)) for start in range(0, n_samples, split)]
+
+#Takes in a capture that is still being written and yields zero-copy views of the samples
+#appended to it, at most chunk_size at a time, polling every poll_interval seconds. Stops
+#once the file has not grown (or not appeared) for idle_timeout seconds.
+def followCapture(file_path, dtype=np.complex64, chunk_size=CHUNK_SIZE, poll_interval=0.5, idle_timeout=5.0):
+    position = 0
+    last_growth = time.time()
+    while True:
+        available = captureLength(file_path, dtype) - position if os.path.exists(file_path) else 0
+        if available <= 0:
+            if time.time() - last_growth > idle_timeout:
+                return
+            time.sleep(poll_interval)
+            continue
+        last_growth = time.time()
+        for chunk in iterChunks(openCapture(file_path, dtype, offset=position, length=available), chunk_size):
+            position += len(chunk)
+            yield chunk
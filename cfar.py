@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+#Constant false alarm rate (CFAR) multipath detection over a matrix of linear power delay
+#profiles, one PDP per row. Every delay bin is compared with a threshold scaled from the
+#noise around it: the mean of the training cells on either side of it (CA-CFAR), or their
+#k-th smallest value (OS-CFAR), which a second strong path among the training cells does
+#not raise. Guard cells next to the bin under test are left out so the skirt of a path is
+#not taken for noise. Paths are the detected bins that are local maxima of their row.
+#
+#CA-CFAR takes its window sums from a cumulative sum, so the cost is O(bins) per row
+#whatever the window size. All rows are processed at once, in batches of about
+#BATCH_CELLS cells.
+
+import numpy as np
+
+#Default window: guard cells and training cells on each side of the bin under test
+GUARD = 2
+TRAINING = 16
+#Default probability of false alarm per bin
+PFA = 1e-4
+
+METHODS = ['ca', 'os']
+
+#Cells of the PDP matrix processed per batch (OS-CFAR holds 2*training values per cell)
+BATCH_CELLS = 2**22
+
+#Threshold factor of CA-CFAR over n training cells of exponentially distributed (square
+#law) noise for false alarm probability pfa. n may be an array
+def caFactor(n, pfa=PFA):
+    n = np.asarray(n, dtype=np.float64)
+    return n*(pfa**(-1.0/n) - 1)
+
+#Threshold factor of OS-CFAR using the k-th smallest of n training cells: solves
+#pfa = prod_{i<k} (n-i)/(n-i+alpha) for alpha by bisection
+def osFactor(n, k, pfa=PFA):
+    i = np.arange(k)
+    log_pfa = lambda alpha: np.sum(np.log(n-i) - np.log(n-i+alpha))
+    lo, hi = 0.0, 1.0
+    while log_pfa(hi) > np.log(pfa):
+        hi *= 2
+    for _ in range(100):
+        mid = (lo + hi)/2
+        if log_pfa(mid) > np.log(pfa):
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+#Takes in a (rows, bins) matrix of linear power and returns the per-cell CA-CFAR noise
+#estimate and threshold. At the ends of a row only the training cells that exist are used
+def caThreshold(pdps, guard=GUARD, training=TRAINING, pfa=PFA):
+    pdps = np.asarray(pdps, dtype=np.float64)
+    rows, bins = pdps.shape
+    half = guard + training
+    #cumulative sum padded with half zeros in front and half+1 copies of the row total
+    #behind, so every window sum is a difference of two column slices
+    cs = np.empty((rows, bins + 2*half + 2))
+    cs[:, :half+1] = 0
+    np.cumsum(pdps, axis=1, out=cs[:, half+1:half+1+bins])
+    cs[:, half+1+bins:] = cs[:, half+bins:half+1+bins]
+    total = (cs[:, training:training+bins] - cs[:, :bins] +
+             cs[:, 2*half+1:2*half+1+bins] - cs[:, half+guard+1:half+guard+1+bins])
+    i = np.arange(bins)
+    n = (np.clip(i - guard, 0, bins) - np.clip(i - half, 0, bins) +
+         np.clip(i + half + 1, 0, bins) - np.clip(i + guard + 1, 0, bins))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        noise = total/n
+        threshold = noise*caFactor(n, pfa)
+    return noise, threshold
+
+#Takes in a (rows, bins) matrix of linear power and returns the per-cell OS-CFAR noise
+#estimate (k-th smallest training cell, default 3/4 of them) and threshold. Rows are
+#mirrored at their ends so every bin has the full set of training cells
+def osThreshold(pdps, guard=GUARD, training=TRAINING, pfa=PFA, k=None):
+    pdps = np.asarray(pdps, dtype=np.float64)
+    n = 2*training
+    k = int(k or (3*n)//4)
+    half = guard + training
+    mode = 'reflect' if pdps.shape[1] > half else 'edge'
+    padded = np.ascontiguousarray(np.pad(pdps, ((0, 0), (half, half)), mode=mode))
+    #(rows, bins, 2*half+1) view of the window around every bin (as_strided rather than
+    #sliding_window_view, which needs numpy 1.20)
+    rows, bins = pdps.shape
+    windows = np.lib.stride_tricks.as_strided(padded, (rows, bins, 2*half + 1),
+                                              (padded.strides[0], padded.strides[1], padded.strides[1]),
+                                              writeable=False)
+    cells = np.concatenate([windows[..., :training], windows[..., -training:]], axis=-1)
+    noise = np.partition(cells, k - 1, axis=-1)[..., k - 1]
+    return noise, noise*osFactor(n, k, pfa)
+
+#Takes in a (rows, bins) matrix of linear power and returns (paths, noise, threshold): a
+#boolean matrix marking the bins that exceed their CFAR threshold and are local maxima of
+#their row, and the per-cell noise estimate and threshold
+def detect(pdps, method='ca', guard=GUARD, training=TRAINING, pfa=PFA, k=None):
+    pdps = np.atleast_2d(np.asarray(pdps, dtype=np.float64))
+    paths = np.zeros(pdps.shape, dtype=bool)
+    noise = np.empty(pdps.shape)
+    thresholds = np.empty(pdps.shape)
+    batch = max(BATCH_CELLS//(max(pdps.shape[1], 1)*(2*training if method == 'os' else 1)), 1)
+    for start in range(0, len(pdps), batch):
+        rows = pdps[start:start+batch]
+        if method == 'ca':
+            cell_noise, threshold = caThreshold(rows, guard, training, pfa)
+        elif method == 'os':
+            cell_noise, threshold = osThreshold(rows, guard, training, pfa, k)
+        else:
+            raise ValueError('Unknown CFAR method: {}'.format(method))
+        peak = np.ones(rows.shape, dtype=bool)
+        peak[:, 1:] &= rows[:, 1:] > rows[:, :-1]
+        peak[:, :-1] &= rows[:, :-1] >= rows[:, 1:]
+        paths[start:start+batch] = peak & (rows > threshold)
+        noise[start:start+batch] = cell_noise
+        thresholds[start:start+batch] = threshold
+    return paths, noise, thresholds
+
+#Takes in a (rows, bins) matrix of linear pdps, each starting at the direct path, and
+#returns every detected path as (row, delay in seconds, linear power) arrays together with
+#the noise floor (mean noise power) of every row. That is the mean of the bins below
+#-ln(pfa) times a first estimate from the row median, so that paths the detector missed
+#next to a stronger one do not pull it up
+def paths(pdps, samp_rate=1.0, method='ca', guard=GUARD, training=TRAINING, pfa=PFA, k=None):
+    pdps = np.atleast_2d(np.asarray(pdps, dtype=np.float64))
+    found = detect(pdps, method, guard, training, pfa, k)[0]
+    rows, bins = np.nonzero(found)
+    #the median of exponentially distributed power is ln 2 times its mean
+    rough = np.median(pdps, axis=1)[:, None]/np.log(2)
+    quiet = pdps <= rough*-np.log(pfa)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        noise = np.where(quiet, pdps, 0).sum(axis=1)/quiet.sum(axis=1)
+    return rows, bins/float(samp_rate), pdps[rows, bins], noise
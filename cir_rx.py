@@ -12,18 +12,47 @@ from gnuradio import blocks
 from gnuradio import filter
 from gnuradio.filter import firdes
 from gnuradio import gr
+import os
 import sys
 import signal
 from argparse import ArgumentParser
 from gnuradio.eng_arg import eng_float, intx
 from gnuradio import eng_notation
 from gnuradio import uhd
+import numpy as np
 import time
+import correlator
+import pn_taps
+import pdp_average
+import pdp_window
+import rotating_sink
+import capture_meta
+import time_probe
+
+
+COMMAND_DELAY = .2
+
+
+# Tune channels 0..channels-1 of a usrp_source; with more than one, at the same hardware
+# time so their LOs keep a fixed phase relation (also used by cir_rxd.py)
+def tune_channels(usrp, channels, center_freq):
+    command_time_set = False
+    if channels > 1:
+        try:
+            usrp.set_command_time(usrp.get_time_now() + uhd.time_spec(COMMAND_DELAY))
+            command_time_set = True
+        except RuntimeError:
+            sys.stderr.write('[CIR_RX] [WARNING] Failed to set command times.\n')
+    for chan in range(channels):
+        usrp.set_center_freq(center_freq, chan)
+    if command_time_set:
+        usrp.clear_command_time()
+        time.sleep(COMMAND_DELAY)
 
 
 class cir_rx(gr.top_block):
 
-    def __init__(self, alpha=0.5, center_freq=3560e6, gain=20, index=0, samp_rate=24e6):
+    def __init__(self, alpha=0.5, center_freq=3560e6, gain=20, index=0, samp_rate=24e6, correlator_backend='fir', fft_threads=1, degree=8, mask=0, tap_periods=1, decimation=1, channels=1, source='uhd', filename='CIR', subdev_spec='', nsamples=0, rotate_bytes=0, rotate_seconds=0, keep_files=0, keep_bytes=0, pdp_taps=0, pdp_pre=0, pdp_accumulate=0, pdp_average_periods=0, pdp_average_mode='mean', cpu_format='fc32', full_scale=0):
         gr.top_block.__init__(self, "Spread Spectrum Rx")
 
         ##################################################
@@ -34,67 +63,198 @@ class cir_rx(gr.top_block):
         self.gain = gain
         self.index = index
         self.samp_rate = samp_rate
+        self.correlator_backend = correlator_backend
+        self.fft_threads = fft_threads
+        self.degree = degree
+        self.mask = mask
+        self.tap_periods = tap_periods
+        self.decimation = decimation
+        self.channels = channels
+        self.source = source
+        if channels == 1:
+            self.filenames = [filename]
+        else:
+            base, ext = os.path.splitext(filename)
+            self.filenames = ["{base}.{num}{ext}".format(base=base, num=i, ext=ext) for i in range(channels)]
 
         ##################################################
         # Blocks
         ##################################################
-        self.uhd_usrp_source_0 = uhd.usrp_source(
-            ",".join(("", "")),
-            uhd.stream_args(
-                cpu_format="fc32",
-                args='',
-                channels=list(range(0,1)),
-            ),
-        )
-        self.uhd_usrp_source_0.set_clock_source('external', 0)
-        self.uhd_usrp_source_0.set_center_freq(center_freq, 0)
-        self.uhd_usrp_source_0.set_gain(gain, 0)
-        self.uhd_usrp_source_0.set_antenna('RX2', 0)
-        self.uhd_usrp_source_0.set_samp_rate(samp_rate)
-        self.uhd_usrp_source_0.set_time_unknown_pps(uhd.time_spec())
-        self.root_raised_cosine_filter_0 = filter.fir_filter_ccf(
-            1,
-            firdes.root_raised_cosine(
-                1,
-                samp_rate,
-                samp_rate,
-                alpha,
-                64))
-        self.fir_filter_xxx_0_0 = filter.fir_filter_ccc(1, [-1,-1,1,-1,1,-1,-1,1,-1,1,-1,1,-1,-1,1,1,1,-1,1,1,1,-1,1,1,-1,-1,1,1,1,1,-1,1,1,1,1,1,1,-1,1,-1,-1,1,1,-1,-1,1,1,-1,1,-1,1,-1,-1,-1,1,1,-1,-1,-1,-1,-1,1,1,1,-1,1,-1,1,-1,1,-1,1,1,1,1,1,-1,-1,1,-1,1,-1,-1,-1,-1,1,-1,-1,1,1,1,1,1,1,1,1,-1,-1,-1,-1,1,-1,1,1,1,1,-1,-1,-1,1,1,-1,1,-1,-1,-1,-1,-1,-1,-1,1,-1,-1,-1,1,1,1,-1,-1,-1,1,-1,-1,1,-1,1,1,1,-1,-1,-1,-1,-1,-1,1,1,-1,-1,1,-1,-1,1,-1,-1,1,1,-1,1,1,1,-1,-1,1,-1,-1,-1,-1,-1,1,-1,1,-1,1,1,-1,1,1,-1,1,-1,1,1,-1,-1,1,-1,1,1,-1,-1,-1,-1,1,1,1,1,1,-1,1,1,-1,1,1,1,1,-1,1,-1,1,1,1,-1,1,-1,-1,-1,1,-1,-1,-1,-1,1,1,-1,1,1,-1,-1,-1,1,1,1,1,-1,-1,1,1,1,-1,-1,1,1,-1,-1,-1,1,-1,1,1,-1,1,-1,-1,1,-1,-1,-1,1,-1,1,-1,-1,1,-1,1,-1,1,-1,-1,1,1,1,-1,1,1,1,-1,1,1,-1,-1,1,1,1,1,-1,1,1,1,1,1,1,-1,1,-1,-1,1,1,-1,-1,1,1,-1,1,-1,1,-1,-1,-1,1,1,-1,-1,-1,-1,-1,1,1,1,-1,1,-1,1,-1,1,-1,1,1,1,1,1,-1,-1,1,-1,1,-1,-1,-1,-1,1,-1,-1,1,1,1,1,1,1,1,1,-1,-1,-1,-1,1,-1,1,1,1,1,-1,-1,-1,1,1,-1,1,-1,-1,-1,-1,-1,-1,-1,1,-1,-1,-1,1,1,1,-1,-1,-1,1,-1,-1,1,-1,1,1,1,-1,-1,-1,-1,-1,-1,1,1,-1,-1,1,-1,-1,1,-1,-1,1,1,-1,1,1,1,-1,-1,1,-1,-1,-1,-1,-1,1,-1,1,-1,1,1,-1,1,1,-1,1,-1,1,1,-1,-1,1,-1,1,1,-1,-1,-1,-1,1,1,1,1,1,-1,1,1,-1,1,1,1,1,-1,1,-1,1,1,1,-1,1,-1,-1,-1,1,-1,-1,-1,-1,1,1,-1,1,1,-1,-1,-1,1,1,1,1,-1,-1,1,1,1,-1,-1,1,1,-1,-1,-1,1,-1,1,1,-1,1,-1,-1,1,-1,-1,-1,1,-1,1,-1,-1,1,-1,1,-1,1,-1,-1,1,1,1,-1,1,1,1,-1,1,1,-1,-1,1,1,1,1,-1,1,1,1,1,1,1,-1,1,-1,-1,1,1,-1,-1,1,1,-1,1,-1,1,-1,-1,-1,1,1,-1,-1,-1,-1,-1,1,1,1,-1,1,-1,1,-1,1,-1,1,1,1,1,1,-1,-1,1,-1,1,-1,-1,-1,-1,1,-1,-1,1,1,1,1,1,1,1,1,-1,-1,-1,-1,1,-1,1,1,1,1,-1,-1,-1,1,1,-1,1,-1,-1,-1,-1,-1,-1,-1,1,-1,-1,-1,1,1,1,-1,-1,-1,1,-1,-1,1,-1,1,1,1,-1,-1,-1,-1,-1,-1,1,1,-1,-1,1,-1,-1,1,-1,-1,1,1,-1,1,1,1,-1,-1,1,-1,-1,-1,-1,-1,1,-1,1,-1,1,1,-1,1,1,-1,1,-1,1,1,-1,-1,1,-1,1,1,-1,-1,-1,-1,1,1,1,1,1,-1,1,1,-1,1,1,1,1,-1,1,-1,1,1,1,-1,1,-1,-1,-1,1,-1,-1,-1,-1,1,1,-1,1,1,-1,-1,-1,1,1,1,1,-1,-1,1,1,1,-1,-1,1,1,-1,-1,-1,1,-1,1,1,-1,1,-1,-1,1,-1,-1,-1,1,-1,1,-1,-1,1,-1,1,-1,1,-1,-1,1,1,1,-1,1,1,1,-1,1,1,-1,-1,1,1,1,1,-1,1,1,1,1,1,1,-1,1,-1,-1,1,1,-1,-1,1,1,-1,1,-1,1,-1,-1,-1,1,1,-1,-1,-1,-1,-1,1,1,1,-1,1,-1,1,-1,1,-1,1,1,1,1,1,-1,-1,1,-1,1,-1,-1,-1,-1,1,-1,-1,1,1,1,1,1,1,1,1,-1,-1,-1,-1,1,-1,1,1,1,1,-1,-1,-1,1,1,-1,1,-1,-1,-1,-1,-1,-1,-1,1,-1,-1,-1,1,1,1,-1,-1,-1,1,-1,-1,1,-1,1,1,1,-1,-1,-1,-1,-1,-1,1,1,-1,-1,1,-1,-1,1,-1,-1,1,1,-1,1,1,1,-1,-1,1,-1,-1,-1,-1,-1,1,-1,1,-1,1,1,-1,1,1,-1,1,-1,1,1,-1,-1,1,-1,1,1,-1,-1,-1,-1,1,1,1,1,1,-1,1,1,-1,1,1,1,1,-1,1,-1,1,1,1,-1,1,-1,-1,-1,1,-1,-1,-1,-1,1,1,-1,1,1,-1,-1,-1,1,1,1,1,-1,-1,1,1,1,-1,-1,1,1,-1,-1,-1,1,-1,1,1,-1,1,-1,-1,1,-1,-1,-1,1])
-        self.fir_filter_xxx_0_0.declare_sample_delay(0)
-        self.blocks_file_sink_1 = blocks.file_sink(gr.sizeof_gr_complex*1, 'CIR', False)
-        self.blocks_file_sink_1.set_unbuffered(False)
+        # All channels come from one streamer, so their samples share the same timing.
+        # 'null' or a file name (formatted with the channel index) stand in for the USRP.
+        if source == 'uhd':
+            self.uhd_usrp_source_0 = uhd.usrp_source(
+                ",".join(("", "")),
+                uhd.stream_args(
+                    cpu_format="fc32",
+                    args='',
+                    channels=list(range(0,channels)),
+                ),
+            )
+            if subdev_spec:
+                self.uhd_usrp_source_0.set_subdev_spec(subdev_spec, 0)
+            self.uhd_usrp_source_0.set_clock_source('external', 0)
+            self.uhd_usrp_source_0.set_samp_rate(samp_rate)
+            self.uhd_usrp_source_0.set_time_unknown_pps(uhd.time_spec())
+            for chan in range(channels):
+                self.uhd_usrp_source_0.set_gain(gain, chan)
+                self.uhd_usrp_source_0.set_antenna('RX2', chan)
+            self.tune(center_freq)
+            self.sources = [(self.uhd_usrp_source_0, chan) for chan in range(channels)]
+        else:
+            self.uhd_usrp_source_0 = None
+            self.sources = []
+            for chan in range(channels):
+                if source == 'null':
+                    self.sources.append((blocks.null_source(gr.sizeof_gr_complex*1), 0))
+                else:
+                    self.sources.append((blocks.file_source(gr.sizeof_gr_complex*1, source.format(chan), False), 0))
+        self.pn_taps = pn_taps.correlator_taps(degree, mask, 1, tap_periods)
+        # Written items: correlator samples, or with pdp_taps one window of taps around the
+        # peak per PN period (complex) or per pdp_accumulate periods (averaged power), or
+        # with pdp_average_periods the whole PN period averaged in the flowgraph
+        self.pdp_period = (2**degree-1)/float(decimation)
+        if pdp_taps and pdp_average_periods:
+            raise ValueError('pdp_taps and pdp_average_periods are mutually exclusive')
+        if pdp_taps:
+            item_type = np.float32 if pdp_accumulate else np.complex64
+            item_rate = samp_rate/decimation/self.pdp_period/max(pdp_accumulate, 1)
+            vlen = int(pdp_taps)
+            sample_format = 'f32' if pdp_accumulate else 'fc32'
+        elif pdp_average_periods:
+            if self.pdp_period != int(self.pdp_period):
+                raise ValueError('PN period of {} samples is not a whole number of samples'.format(self.pdp_period))
+            item_type = np.float32
+            item_rate = samp_rate/decimation/self.pdp_period/pdp_average_periods
+            vlen = int(self.pdp_period)
+            sample_format = 'f32'
+        elif cpu_format == 'sc16':
+            item_type = np.int16
+            item_rate = samp_rate/decimation
+            vlen = 2
+            sample_format = 'sc16'
+        else:
+            item_type = np.complex64
+            item_rate = samp_rate/decimation
+            vlen = 1
+            sample_format = 'fc32'
+        if cpu_format == 'sc16' and (pdp_taps or pdp_average_periods):
+            raise ValueError('sc16 output is only available for the full CIR')
+        # sc16 maps full_scale (default: the correlation peak of a full-scale input) to 32767
+        self.full_scale = full_scale or (2**degree-1)*tap_periods
+        rrc_taps = firdes.root_raised_cosine(1, samp_rate, samp_rate, alpha, 64)
+        # Sidecar fields named like the pdp_analysis options they stand for; the CIR sample
+        # rate is the file's sample rate, vectors are written at item_rate
+        self.meta = dict(sample_format=sample_format, samp_rate=samp_rate/decimation, center_freq=center_freq,
+                         recorder='cir_rx.py', degree=degree, mask=mask, alpha=alpha, tap_periods=tap_periods,
+                         decimation=decimation, gain=gain if source == 'uhd' else None, source=source,
+                         rrc_taps=len(rrc_taps), rrc_digest=capture_meta.tapsDigest(rrc_taps),
+                         pn_digest=capture_meta.tapsDigest(self.pn_taps),
+                         full_scale=self.full_scale if sample_format == 'sc16' else None,
+                         taps=vlen if pdp_taps or pdp_average_periods else None,
+                         pdp_pre=pdp_pre if pdp_taps else None,
+                         accumulated=True if sample_format == 'f32' else None,
+                         pdp_average_periods=pdp_average_periods or pdp_accumulate or None,
+                         item_rate=item_rate if vlen > 1 and sample_format != 'sc16' else None)
+        self.heads = []
+        self.root_raised_cosine_filters = []
+        self.correlators = []
+        self.pdp_stages = []
+        self.sc16_scales = []
+        self.sc16_converters = []
+        self.file_sinks = []
+        self.time_probes = []
+        for chan in range(channels):
+            if nsamples:
+                self.heads.append(blocks.head(gr.sizeof_gr_complex*1, int(nsamples)))
+            self.root_raised_cosine_filters.append(filter.fir_filter_ccf(
+                decimation,
+                rrc_taps))
+            self.correlators.append(correlator.make_correlator(self.pn_taps, correlator_backend, fft_threads))
+            if pdp_taps:
+                self.pdp_stages.append(pdp_window.pdp_window(self.pdp_period, pdp_taps, pdp_pre, 2, pdp_accumulate,
+                                                               samp_rate/float(decimation)))
+            elif pdp_average_periods:
+                self.pdp_stages.append(pdp_average.pdp_average(self.pdp_period, int(pdp_average_periods), pdp_average_mode))
+            elif cpu_format == 'sc16':
+                self.sc16_scales.append(blocks.multiply_const_cc(32767.0/self.full_scale))
+                self.sc16_converters.append(blocks.complex_to_interleaved_short(True))
+            meta = dict(self.meta, channel=chan if channels > 1 else None)
+            if source not in ('uhd', 'null'):
+                # an offline run keeps the timing of the capture it correlates
+                params = capture_meta.captureParams(source.format(chan))
+                meta.update(center_freq=params.get('center_freq'), gain=params.get('gain'))
+                meta.update(start_time=params.get('host_time'), hw_time=params.get('hw_time'))
+            if rotate_bytes or rotate_seconds:
+                file_sink = rotating_sink.rotating_file_sink(self.filenames[chan], item_rate, rotate_bytes,
+                                                             rotate_seconds, keep_files, keep_bytes, item_type, vlen, meta)
+            else:
+                file_sink = blocks.file_sink(np.dtype(item_type).itemsize*vlen, self.filenames[chan], False)
+                file_sink.set_unbuffered(False)
+                if meta.get('start_time') is None:
+                    meta['start_time'] = time.time()
+                capture_meta.writeMeta(self.filenames[chan], **meta)
+                if source == 'uhd':
+                    # the hardware time of sample 0 is known once the first rx_time tag arrives
+                    self.time_probes.append(time_probe.rx_time_probe(
+                        lambda hw_time, path=self.filenames[chan]: capture_meta.setHwTime(path, hw_time), samp_rate))
+            self.file_sinks.append(file_sink)
+        self.root_raised_cosine_filter_0 = self.root_raised_cosine_filters[0]
+        self.fir_filter_xxx_0_0 = self.correlators[0]
+        self.blocks_file_sink_1 = self.file_sinks[0]
 
 
 
         ##################################################
         # Connections
         ##################################################
-        self.connect((self.fir_filter_xxx_0_0, 0), (self.blocks_file_sink_1, 0))
-        self.connect((self.root_raised_cosine_filter_0, 0), (self.fir_filter_xxx_0_0, 0))
-        self.connect((self.uhd_usrp_source_0, 0), (self.root_raised_cosine_filter_0, 0))
-
+        for chan in range(channels):
+            if self.pdp_stages:
+                self.connect((self.correlators[chan], 0), (self.pdp_stages[chan], 0))
+                self.connect((self.pdp_stages[chan], 0), (self.file_sinks[chan], 0))
+            elif self.sc16_converters:
+                self.connect((self.correlators[chan], 0), (self.sc16_scales[chan], 0))
+                self.connect((self.sc16_scales[chan], 0), (self.sc16_converters[chan], 0))
+                self.connect((self.sc16_converters[chan], 0), (self.file_sinks[chan], 0))
+            else:
+                self.connect((self.correlators[chan], 0), (self.file_sinks[chan], 0))
+            self.connect((self.root_raised_cosine_filters[chan], 0), (self.correlators[chan], 0))
+            if nsamples:
+                self.connect(self.sources[chan], (self.heads[chan], 0))
+                self.connect((self.heads[chan], 0), (self.root_raised_cosine_filters[chan], 0))
+            else:
+                self.connect(self.sources[chan], (self.root_raised_cosine_filters[chan], 0))
+            if self.time_probes:
+                self.connect(self.sources[chan], (self.time_probes[chan], 0))
+
+    # Tune every channel; with more than one, at the same hardware time so they stay coherent
+    def tune(self, center_freq):
+        tune_channels(self.uhd_usrp_source_0, self.channels, center_freq)
 
     def get_alpha(self):
         return self.alpha
 
     def set_alpha(self, alpha):
         self.alpha = alpha
-        self.root_raised_cosine_filter_0.set_taps(firdes.root_raised_cosine(1, self.samp_rate, self.samp_rate, self.alpha, 64))
+        for rrc in self.root_raised_cosine_filters:
+            rrc.set_taps(firdes.root_raised_cosine(1, self.samp_rate, self.samp_rate, self.alpha, 64))
 
     def get_center_freq(self):
         return self.center_freq
 
     def set_center_freq(self, center_freq):
         self.center_freq = center_freq
-        self.uhd_usrp_source_0.set_center_freq(self.center_freq, 0)
+        if self.uhd_usrp_source_0 is not None:
+            self.tune(self.center_freq)
 
     def get_gain(self):
         return self.gain
 
     def set_gain(self, gain):
         self.gain = gain
-        self.uhd_usrp_source_0.set_gain(self.gain, 0)
+        if self.uhd_usrp_source_0 is not None:
+            for chan in range(self.channels):
+                self.uhd_usrp_source_0.set_gain(self.gain, chan)
 
     def get_index(self):
         return self.index
@@ -102,13 +262,24 @@ class cir_rx(gr.top_block):
     def set_index(self, index):
         self.index = index
 
+    def get_degree(self):
+        return self.degree
+
+    def set_degree(self, degree):
+        self.degree = degree
+        self.pn_taps = pn_taps.correlator_taps(self.degree, self.mask, 1, self.tap_periods)
+        for corr in self.correlators:
+            corr.set_taps(self.pn_taps)
+
     def get_samp_rate(self):
         return self.samp_rate
 
     def set_samp_rate(self, samp_rate):
         self.samp_rate = samp_rate
-        self.root_raised_cosine_filter_0.set_taps(firdes.root_raised_cosine(1, self.samp_rate, self.samp_rate, self.alpha, 64))
-        self.uhd_usrp_source_0.set_samp_rate(self.samp_rate)
+        for rrc in self.root_raised_cosine_filters:
+            rrc.set_taps(firdes.root_raised_cosine(1, self.samp_rate, self.samp_rate, self.alpha, 64))
+        if self.uhd_usrp_source_0 is not None:
+            self.uhd_usrp_source_0.set_samp_rate(self.samp_rate)
 
 
 
@@ -130,13 +301,79 @@ def argument_parser():
     parser.add_argument(
         "-s", "--samp-rate", dest="samp_rate", type=eng_float, default="24.0M",
         help="Set samp_rate [default=%(default)r]")
+    parser.add_argument(
+        "-c", "--correlator", dest="correlator_backend", choices=correlator.BACKENDS, default="fir",
+        help="Set correlator backend [default=%(default)r]")
+    parser.add_argument(
+        "--fft-threads", dest="fft_threads", type=intx, default=1,
+        help="Set threads of the fft correlator [default=%(default)r]")
+    parser.add_argument(
+        "-d", "--degree", dest="degree", type=intx, default=8,
+        help="Set degree of the PN sequence [default=%(default)r]")
+    parser.add_argument(
+        "-m", "--mask", dest="mask", type=intx, default=0,
+        help="Set GLFSR mask, 0 for the glfsr_source_f default [default=%(default)r]")
+    parser.add_argument(
+        "--tap-periods", dest="tap_periods", type=intx, default=1,
+        help="Set PN periods spanned by the correlator taps [default=%(default)r]")
+    parser.add_argument(
+        "--decimation", dest="decimation", type=intx, default=1,
+        help="Set decimation of the RRC filter [default=%(default)r]")
+    parser.add_argument(
+        "-n", "--channels", dest="channels", type=intx, default=1,
+        help="Set number of coherent receive channels [default=%(default)r]")
+    parser.add_argument(
+        "--spec", dest="subdev_spec", type=str, default="",
+        help="Set subdevice spec, e.g. 'A:0 B:0' for both X310 daughterboards [default=%(default)r]")
+    parser.add_argument(
+        "--source", dest="source", type=str, default="uhd",
+        help="Set sample source: uhd, null, or a file name formatted with the channel index [default=%(default)r]")
+    parser.add_argument(
+        "-o", "--output", dest="filename", type=str, default="CIR",
+        help="Set output file, suffixed .<channel> with more than one channel [default=%(default)r]")
+    parser.add_argument(
+        "-N", "--nsamples", dest="nsamples", type=eng_float, default="0",
+        help="Set samples to receive per channel, 0 for no limit [default=%(default)r]")
+    parser.add_argument(
+        "--rotate-size", dest="rotate_bytes", type=eng_float, default="0",
+        help="Start a new timestamped output file every this many bytes, 0 for one file [default=%(default)r]")
+    parser.add_argument(
+        "--rotate-seconds", dest="rotate_seconds", type=eng_float, default="0",
+        help="Start a new timestamped output file every this many seconds of samples [default=%(default)r]")
+    parser.add_argument(
+        "--keep-files", dest="keep_files", type=intx, default=0,
+        help="Delete the oldest rotated files beyond this many, 0 to keep all [default=%(default)r]")
+    parser.add_argument(
+        "--keep-size", dest="keep_bytes", type=eng_float, default="0",
+        help="Delete the oldest rotated files beyond this many bytes in total, 0 to keep all [default=%(default)r]")
+    parser.add_argument(
+        "-W", "--pdp-taps", dest="pdp_taps", type=intx, default=0,
+        help="Only write this many taps around the correlation peak of each PN period, 0 for the full CIR [default=%(default)r]")
+    parser.add_argument(
+        "--pdp-pre", dest="pdp_pre", type=intx, default=0,
+        help="Set taps kept before the peak [default=%(default)r]")
+    parser.add_argument(
+        "-K", "--pdp-accumulate", dest="pdp_accumulate", type=intx, default=0,
+        help="Write the power of the windows averaged over this many periods instead, 0 to keep complex taps [default=%(default)r]")
+    parser.add_argument(
+        "-P", "--pdp-average", dest="pdp_average_periods", type=intx, default=0,
+        help="Write whole-period PDPs averaged over this many PN periods in the flowgraph, 0 for the full CIR [default=%(default)r]")
+    parser.add_argument(
+        "--pdp-average-mode", dest="pdp_average_mode", choices=pdp_average.MODES, default="mean",
+        help="Average PDPs as a block mean or an exponential average [default=%(default)r]")
+    parser.add_argument(
+        "--cpu-format", dest="cpu_format", choices=['fc32', 'sc16'], default="fc32",
+        help="Set sample format of the CIR file; sc16 is half the size [default=%(default)r]")
+    parser.add_argument(
+        "--full-scale", dest="full_scale", type=eng_float, default="0",
+        help="Set CIR magnitude written as 32767 in sc16, 0 for 2**degree-1 [default=%(default)r]")
     return parser
 
 
 def main(top_block_cls=cir_rx, options=None):
     if options is None:
         options = argument_parser().parse_args()
-    tb = top_block_cls(alpha=options.alpha, center_freq=options.center_freq, gain=options.gain, index=options.index, samp_rate=options.samp_rate)
+    tb = top_block_cls(alpha=options.alpha, center_freq=options.center_freq, gain=options.gain, index=options.index, samp_rate=options.samp_rate, correlator_backend=options.correlator_backend, fft_threads=options.fft_threads, degree=options.degree, mask=options.mask, tap_periods=options.tap_periods, decimation=options.decimation, channels=options.channels, source=options.source, filename=options.filename, subdev_spec=options.subdev_spec, nsamples=options.nsamples, rotate_bytes=options.rotate_bytes, rotate_seconds=options.rotate_seconds, keep_files=options.keep_files, keep_bytes=options.keep_bytes, pdp_taps=options.pdp_taps, pdp_pre=options.pdp_pre, pdp_accumulate=options.pdp_accumulate, pdp_average_periods=options.pdp_average_periods, pdp_average_mode=options.pdp_average_mode, cpu_format=options.cpu_format, full_scale=options.full_scale)
 
     def sig_handler(sig=None, frame=None):
         tb.stop()
@@ -149,6 +386,11 @@ def main(top_block_cls=cir_rx, options=None):
 
     tb.start()
 
+    # Bounded runs (a sample count or a capture file as the source) stop by themselves
+    if options.nsamples or options.source not in ('uhd', 'null'):
+        tb.wait()
+        return
+
     try:
         input('Press Enter to quit: ')
     except EOFError:
@@ -12,6 +12,7 @@ from gnuradio import blocks
 from gnuradio import filter
 from gnuradio.filter import firdes
 from gnuradio import gr
+import os
 import sys
 import signal
 from argparse import ArgumentParser
@@ -19,6 +20,12 @@ from gnuradio.eng_arg import eng_float, intx
 from gnuradio import eng_notation
 from gnuradio import uhd
 import time
+import numpy as np
+import ring_sink
+import rotating_sink
+import capture_meta
+import time_probe
+from cir_rx import tune_channels
 
 '''
 def timing(self,userStartTime):
@@ -73,7 +80,7 @@ def timing(self,userStartTime):
 '''
 class cir_rx8d(gr.top_block):
 
-    def __init__(self, alpha=0.5, center_freq=3555e6, gain=20, index=0, samp_rate=24e6, start_time=59, duration = 2):
+    def __init__(self, alpha=0.5, center_freq=3555e6, gain=20, index=0, samp_rate=24e6, start_time=59, duration = 2, channels=1, filename='RAW', subdev_spec='', rotate_bytes=0, rotate_seconds=0, keep_files=0, keep_bytes=0, ring='', ring_size=2**25, cpu_format='fc32', full_scale=1.0):
         gr.top_block.__init__(self, "Spread Spectrum Rx")
 
         ##################################################
@@ -86,6 +93,12 @@ class cir_rx8d(gr.top_block):
         self.samp_rate = samp_rate
         self.start_time = start_time
         self.duration = duration
+        self.channels = channels
+        if channels == 1:
+            self.filenames = [filename]
+        else:
+            base, ext = os.path.splitext(filename)
+            self.filenames = ["{base}.{num}{ext}".format(base=base, num=i, ext=ext) for i in range(channels)]
         ##################################################
         # Blocks
         ##################################################
@@ -94,36 +107,85 @@ class cir_rx8d(gr.top_block):
             uhd.stream_args(
                 cpu_format="fc32",
                 args='',
-                channels=list(range(0,1)),
+                channels=list(range(0,channels)),
             ),
         )
+        if subdev_spec:
+            self.uhd_usrp_source_0.set_subdev_spec(subdev_spec, 0)
         self.uhd_usrp_source_0.set_time_source('external', 0)
         self.uhd_usrp_source_0.set_clock_source('external', 0)
-        self.uhd_usrp_source_0.set_center_freq(center_freq, 0)
-        self.uhd_usrp_source_0.set_gain(gain, 0)
-        self.uhd_usrp_source_0.set_antenna('RX2', 0)
         self.uhd_usrp_source_0.set_samp_rate(samp_rate)
         self.uhd_usrp_source_0.set_time_unknown_pps(uhd.time_spec())
-        self.root_raised_cosine_filter_0 = filter.fir_filter_ccf(
-            1,
-            firdes.root_raised_cosine(
+        for chan in range(channels):
+            self.uhd_usrp_source_0.set_gain(gain, chan)
+            self.uhd_usrp_source_0.set_antenna('RX2', chan)
+        # Timed tune (as cir_rx.py) once the device time is set, so the channels are coherent
+        tune_channels(self.uhd_usrp_source_0, channels, center_freq)
+        # One head/RRC/file sink chain per channel; the timed start below applies to the
+        # whole streamer, so every channel's first sample is taken at the same PPS edge
+        # sc16 files hold the RRC output scaled so that full_scale is written as 32767
+        self.cpu_format = 'fc32' if ring else cpu_format
+        self.full_scale = full_scale
+        rrc_taps = firdes.root_raised_cosine(1, samp_rate, samp_rate, alpha, 64)
+        self.meta = dict(sample_format=self.cpu_format, samp_rate=samp_rate, center_freq=center_freq,
+                         recorder='cir_rxd.py', gain=gain, alpha=alpha, rrc_taps=len(rrc_taps),
+                         rrc_digest=capture_meta.tapsDigest(rrc_taps),
+                         full_scale=full_scale if self.cpu_format == 'sc16' else None)
+        self.blocks_heads = []
+        self.root_raised_cosine_filters = []
+        self.sc16_scales = []
+        self.sc16_converters = []
+        self.file_sinks = []
+        self.time_probes = []
+        for chan in range(channels):
+            meta = dict(self.meta, channel=chan if channels > 1 else None)
+            self.blocks_heads.append(blocks.head(gr.sizeof_gr_complex*1, int(duration*samp_rate)))
+            self.root_raised_cosine_filters.append(filter.fir_filter_ccf(
                 1,
-                samp_rate,
-                samp_rate,
-                alpha,
-                64))
-        self.blocks_head_0 = blocks.head(gr.sizeof_gr_complex*1, int(duration*samp_rate))
-        self.blocks_file_sink_1 = blocks.file_sink(gr.sizeof_gr_complex*1, 'RAW', False)
-        self.blocks_file_sink_1.set_unbuffered(False)
+                rrc_taps))
+            if self.cpu_format == 'sc16':
+                self.sc16_scales.append(blocks.multiply_const_cc(32767.0/full_scale))
+                self.sc16_converters.append(blocks.complex_to_interleaved_short(True))
+            if ring:
+                file_sink = ring_sink.ring_sink(ring if channels == 1 else '{}.{}'.format(ring, chan), ring_size)
+            elif rotate_bytes or rotate_seconds:
+                if self.cpu_format == 'sc16':
+                    file_sink = rotating_sink.rotating_file_sink(self.filenames[chan], samp_rate, rotate_bytes,
+                                                                 rotate_seconds, keep_files, keep_bytes, np.int16, 2, meta)
+                else:
+                    file_sink = rotating_sink.rotating_file_sink(self.filenames[chan], samp_rate, rotate_bytes,
+                                                                 rotate_seconds, keep_files, keep_bytes, meta=meta)
+            else:
+                if self.cpu_format == 'sc16':
+                    file_sink = blocks.file_sink(gr.sizeof_short*2, self.filenames[chan], False)
+                else:
+                    file_sink = blocks.file_sink(gr.sizeof_gr_complex*1, self.filenames[chan], False)
+                file_sink.set_unbuffered(False)
+                # the sidecar is written once the start time is set, and its hardware time
+                # corrected from the first rx_time tag
+                self.time_probes.append(time_probe.rx_time_probe(
+                    lambda hw_time, path=self.filenames[chan]: capture_meta.setHwTime(path, hw_time), samp_rate))
+            self.file_sinks.append(file_sink)
+        self.blocks_head_0 = self.blocks_heads[0]
+        self.root_raised_cosine_filter_0 = self.root_raised_cosine_filters[0]
+        self.blocks_file_sink_1 = self.file_sinks[0]
 
 
 
         ##################################################
         # Connections
         ##################################################
-        self.connect((self.blocks_head_0, 0), (self.root_raised_cosine_filter_0, 0))
-        self.connect((self.root_raised_cosine_filter_0, 0), (self.blocks_file_sink_1, 0))
-        self.connect((self.uhd_usrp_source_0, 0), (self.blocks_head_0, 0))
+        for chan in range(channels):
+            self.connect((self.blocks_heads[chan], 0), (self.root_raised_cosine_filters[chan], 0))
+            if self.sc16_converters:
+                self.connect((self.root_raised_cosine_filters[chan], 0), (self.sc16_scales[chan], 0))
+                self.connect((self.sc16_scales[chan], 0), (self.sc16_converters[chan], 0))
+                self.connect((self.sc16_converters[chan], 0), (self.file_sinks[chan], 0))
+            else:
+                self.connect((self.root_raised_cosine_filters[chan], 0), (self.file_sinks[chan], 0))
+            self.connect((self.uhd_usrp_source_0, chan), (self.blocks_heads[chan], 0))
+            if self.time_probes:
+                self.connect((self.blocks_heads[chan], 0), (self.time_probes[chan], 0))
 
         self.init_timed_streaming(self.start_time)
 
@@ -132,21 +194,23 @@ class cir_rx8d(gr.top_block):
 
     def set_alpha(self, alpha):
         self.alpha = alpha
-        self.root_raised_cosine_filter_0.set_taps(firdes.root_raised_cosine(1, self.samp_rate, self.samp_rate, self.alpha, 64))
+        for rrc in self.root_raised_cosine_filters:
+            rrc.set_taps(firdes.root_raised_cosine(1, self.samp_rate, self.samp_rate, self.alpha, 64))
 
     def get_center_freq(self):
         return self.center_freq
 
     def set_center_freq(self, center_freq):
         self.center_freq = center_freq
-        self.uhd_usrp_source_0.set_center_freq(self.center_freq, 0)
+        tune_channels(self.uhd_usrp_source_0, self.channels, self.center_freq)
 
     def get_gain(self):
         return self.gain
 
     def set_gain(self, gain):
         self.gain = gain
-        self.uhd_usrp_source_0.set_gain(self.gain, 0)
+        for chan in range(self.channels):
+            self.uhd_usrp_source_0.set_gain(self.gain, chan)
 
     def get_index(self):
         return self.index
@@ -159,7 +223,8 @@ class cir_rx8d(gr.top_block):
 
     def set_samp_rate(self, samp_rate):
         self.samp_rate = samp_rate
-        self.root_raised_cosine_filter_0.set_taps(firdes.root_raised_cosine(1, self.samp_rate, self.samp_rate, self.alpha, 64))
+        for rrc in self.root_raised_cosine_filters:
+            rrc.set_taps(firdes.root_raised_cosine(1, self.samp_rate, self.samp_rate, self.alpha, 64))
         self.uhd_usrp_source_0.set_samp_rate(self.samp_rate)
 
     def init_timed_streaming(self, start_time):
@@ -180,6 +245,10 @@ class cir_rx8d(gr.top_block):
         start = int(future_time-local_time)
 
         self.uhd_usrp_source_0.set_start_time(uhd.time_spec(start))
+        if self.time_probes:
+            for chan in range(self.channels):
+                capture_meta.writeMeta(self.filenames[chan], start_time=future_time, hw_time=start,
+                                       **dict(self.meta, channel=chan if self.channels > 1 else None))
 
         self.uhd_usrp_source_0.set_time_unknown_pps(uhd.time_spec(0))
         curr_hw_time = self.uhd_usrp_source_0.get_time_last_pps()
@@ -229,6 +298,39 @@ def argument_parser():
     parser.add_argument(
         "-d", "--duration", dest="duration", type=eng_float, default="2",
         help="Set receiver duration in sec [default=%(default)r]")
+    parser.add_argument(
+        "-n", "--channels", dest="channels", type=intx, default=1,
+        help="Set number of coherent receive channels [default=%(default)r]")
+    parser.add_argument(
+        "--spec", dest="subdev_spec", type=str, default="",
+        help="Set subdevice spec, e.g. 'A:0 B:0' for both X310 daughterboards [default=%(default)r]")
+    parser.add_argument(
+        "-o", "--output", dest="filename", type=str, default="RAW",
+        help="Set output file, suffixed .<channel> with more than one channel [default=%(default)r]")
+    parser.add_argument(
+        "--rotate-size", dest="rotate_bytes", type=eng_float, default="0",
+        help="Start a new timestamped output file every this many bytes, 0 for one file [default=%(default)r]")
+    parser.add_argument(
+        "--rotate-seconds", dest="rotate_seconds", type=eng_float, default="0",
+        help="Start a new timestamped output file every this many seconds of samples [default=%(default)r]")
+    parser.add_argument(
+        "--keep-files", dest="keep_files", type=intx, default=0,
+        help="Delete the oldest rotated files beyond this many, 0 to keep all [default=%(default)r]")
+    parser.add_argument(
+        "--keep-size", dest="keep_bytes", type=eng_float, default="0",
+        help="Delete the oldest rotated files beyond this many bytes in total, 0 to keep all [default=%(default)r]")
+    parser.add_argument(
+        "--ring", dest="ring", type=str, default="",
+        help="Write into the shared-memory ring of this name (read with shm_ring.py -m consume) instead of a file [default=%(default)r]")
+    parser.add_argument(
+        "--ring-size", dest="ring_size", type=eng_float, default="32M",
+        help="Set ring size in samples [default=%(default)r]")
+    parser.add_argument(
+        "--cpu-format", dest="cpu_format", choices=['fc32', 'sc16'], default="fc32",
+        help="Set sample format of the RAW file; sc16 is half the size [default=%(default)r]")
+    parser.add_argument(
+        "--full-scale", dest="full_scale", type=eng_float, default="1.0",
+        help="Set sample magnitude written as 32767 in sc16 [default=%(default)r]")
     return parser
 
 
@@ -236,7 +338,11 @@ def main(top_block_cls=cir_rx8d, options=None):
     if options is None:
         options = argument_parser().parse_args()
     tb = top_block_cls(alpha=options.alpha, center_freq=options.center_freq, gain=options.gain,\
-                       index=options.index, samp_rate=options.samp_rate, start_time=options.start_time, duration=options.duration)
+                       index=options.index, samp_rate=options.samp_rate, start_time=options.start_time, duration=options.duration,\
+                       channels=options.channels, filename=options.filename, subdev_spec=options.subdev_spec,\
+                       rotate_bytes=options.rotate_bytes, rotate_seconds=options.rotate_seconds, keep_files=options.keep_files, keep_bytes=options.keep_bytes,\
+                       ring=options.ring, ring_size=options.ring_size,\
+                       cpu_format=options.cpu_format, full_scale=options.full_scale)
     def sig_handler(sig=None, frame=None):
         tb.stop()
         tb.wait()
@@ -24,7 +24,7 @@ import time
 
 class cir_tx(gr.top_block):
 
-    def __init__(self, alpha=0.5, center_freq=3560e6, degree=8, gain=31.5, samp_rate=24e6):
+    def __init__(self, alpha=0.5, center_freq=3560e6, degree=8, gain=31.5, samp_rate=24e6, mask=0):
         gr.top_block.__init__(self, "Spread Spectrum Tx")
 
         ##################################################
@@ -33,6 +33,7 @@ class cir_tx(gr.top_block):
         self.alpha = alpha
         self.center_freq = center_freq
         self.degree = degree
+        self.mask = mask
         self.gain = gain
         self.samp_rate = samp_rate
 
@@ -62,7 +63,7 @@ class cir_tx(gr.top_block):
                 samp_rate,
                 0.5,
                 64))
-        self.digital_glfsr_source_x_0 = digital.glfsr_source_f(degree, True, 0, 1)
+        self.digital_glfsr_source_x_0 = digital.glfsr_source_f(int(degree), True, mask, 1)
         self.blocks_null_source_0 = blocks.null_source(gr.sizeof_float*1)
         self.blocks_multiply_const_vxx_0 = blocks.multiply_const_cc(10)
         self.blocks_float_to_complex_0 = blocks.float_to_complex(1)
@@ -133,13 +134,16 @@ def argument_parser():
     parser.add_argument(
         "-s", "--samp-rate", dest="samp_rate", type=eng_float, default="24.0M",
         help="Set samp_rate [default=%(default)r]")
+    parser.add_argument(
+        "-m", "--mask", dest="mask", type=intx, default=0,
+        help="Set GLFSR mask, 0 for the default of the degree [default=%(default)r]")
     return parser
 
 
 def main(top_block_cls=cir_tx, options=None):
     if options is None:
         options = argument_parser().parse_args()
-    tb = top_block_cls(alpha=options.alpha, center_freq=options.center_freq, degree=options.degree, gain=options.gain, samp_rate=options.samp_rate)
+    tb = top_block_cls(alpha=options.alpha, center_freq=options.center_freq, degree=options.degree, gain=options.gain, samp_rate=options.samp_rate, mask=options.mask)
 
     def sig_handler(sig=None, frame=None):
         tb.stop()
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+#Correlator backends for the cir_rx receivers. 'fir' is the time-domain
+#filter.fir_filter_ccc the flowgraphs were generated with and costs one complex
+#multiply-add per tap per sample. 'fft' runs the same taps through
+#filter.fft_filter_ccc (overlap-save), whose cost grows with log(len(taps)).
+
+from gnuradio import filter
+
+BACKENDS = ['fir', 'fft']
+
+#Takes in the PN correlator taps and returns the correlator block of the chosen backend
+def make_correlator(taps, backend='fir', nthreads=1):
+    if backend == 'fft':
+        block = filter.fft_filter_ccc(1, taps, nthreads)
+    elif backend == 'fir':
+        block = filter.fir_filter_ccc(1, taps)
+    else:
+        raise ValueError('Unknown correlator backend: {}'.format(backend))
+    block.declare_sample_delay(0)
+    return block
@@ -1,81 +1,161 @@
-#!/usr/bin/python3
-#Program that takes in a complex binary file (fc32)
-#and calculates the received power and outputs a plot
-#of average received power
-#comment
-
-import numpy as np
-import scipy
-import os
-import matplotlib.pyplot as plt
-import math
-from decimal import *
-import argparse
-
-
-#Takes in binary file and returns binary data array
-def readBin(file_path):
-	return np.fromfile(file_path, dtype=np.complex64)
-
-#Takes in binary I/Q data and returns array of linear power values
-def binToLinearPower(bin_data):
-	return np.abs(bin_data)**2
-
-#Takes in power measurements and computes averages in non-overlapping windows of size N.
-def windowedAvg(power_data, N):
-	truncate = len(power_data) % N
-	mv_avg_power = []
-	count = 0
-	power = 0
-	for i in range(len(power_data) - truncate):
-		if count < N:
-			power += power_data[i]
-			count += 1
-		else:
-			mv_avg_power.append(power/float(N))
-			count = 0
-			power = 0
-	return mv_avg_power
-
-#Takes in linear power measurements and returns decibel measurements. If power is 0, return NaN
-def linearPowerToDecibel(lin_power):
-	db_power = []
-	for i in range(0,len(lin_power)):
-		db_power.append(Decimal("10")*Decimal(lin_power[i]).log10() if lin_power[i] != 0 else Decimal('NaN'))
-	return db_power
-
-def toCSV(array,filename):
-	np.savetxt(filename,[array], delimiter=',')
-
-def main():
-	#get user input
-	parser = argparse.ArgumentParser(description='Binary I/Q data file to csv of decibel powers')
-	parser.add_argument('-p', '--path', type=str,
-	                   help='Directory path to i/q data file')
-	parser.add_argument('-w', '--window_size', type=int, default = 20000, required = False,
-	                   help='Size of averaging window, default: 20000')
-	parser.add_argument('-n', '--name', type=str,  default = 'db_power',
-	                   help='Name your CSV file, default: db_power')
-	args = parser.parse_args()
-	#Decimal precision
-	getcontext().prec = 10
-
-	#initialize variables
-	file_path = args.path
-	N = args.window_size
-	file_name = args.name
-
-	#do work
-	bin_file = readBin(file_path)
-	power = binToLinearPower(bin_file)
-	avg_power = windowedAvg(power,N)
-	avg_decibel_power = linearPowerToDecibel(avg_power)
-	#save to CSV
-	toCSV(avg_decibel_power,file_name+".csv")
-
-if __name__ == "__main__":
-	main()
-
-#plot of received power
-#plt.plot(db_power)
-#plt.show()
+#!/usr/bin/python3
+#Program that takes in a complex binary file (fc32)
+#and calculates the received power and outputs a plot
+#of average received power
+#comment
+
+import numpy as np
+import scipy
+import os
+import matplotlib.pyplot as plt
+import math
+import time
+import argparse
+import capture_reader
+import output_writer
+import window_avg
+import capture_meta
+import result_cache
+import online_stats
+from capture_reader import CHUNK_SIZE
+from window_avg import chunkedWindowedAvg
+
+#Takes in binary file and returns a memory-mapped binary data array. sc16 captures are
+#converted to complex64 (SC16_MAX being full_scale) as they are read
+def readBin(file_path, fmt='fc32', full_scale=1.0):
+	return capture_reader.openSamples(file_path, fmt, full_scale)
+
+#Takes in binary file and yields complex64 chunks of at most chunk_size samples (zero-copy
+#views for fc32)
+def readBinChunks(file_path, chunk_size=CHUNK_SIZE, fmt='fc32', full_scale=1.0):
+	return capture_reader.iterChunks(readBin(file_path, fmt, full_scale), chunk_size)
+
+#Takes in binary I/Q data and returns array of linear power values
+def binToLinearPower(bin_data):
+	return bin_data.real*bin_data.real + bin_data.imag*bin_data.imag
+
+#Takes in power measurements and computes averages in non-overlapping windows of size N.
+def windowedAvg(power_data, N):
+	return window_avg.windowedAvg([power_data], N)
+
+#Takes in linear power measurements and returns decibel measurements. If power is 0, return NaN
+def linearPowerToDecibel(lin_power):
+	lin_power = np.asarray(lin_power, dtype=np.float64)
+	with np.errstate(divide='ignore'):
+		db_power = 10*np.log10(lin_power)
+	db_power[lin_power == 0] = np.nan
+	return db_power
+
+def toCSV(array,filename):
+	np.savetxt(filename,[array], delimiter=',')
+
+#Takes in an iterable of I/Q chunks and writes the dB power of every window to writer as
+#soon as it completes. With stats (an online_stats.OnlineStats) the windows are also added
+#to it, and it is saved to stats_path every online_stats.SAVE_INTERVAL seconds and at the end.
+#With collect (a list) the windows are also appended to it, as they are written
+def processChunks(chunks, N, writer, stats=None, stats_path=None, collect=None):
+	power = (binToLinearPower(chunk) for chunk in chunks)
+	saved = time.time()
+	for avg_power in chunkedWindowedAvg(power, N):
+		db_power = linearPowerToDecibel(avg_power)
+		writer.write(db_power)
+		if collect is not None:
+			collect.append(db_power)
+		if stats is not None:
+			stats.update(db_power)
+			if stats_path and time.time() - saved >= online_stats.SAVE_INTERVAL:
+				stats.save(stats_path)
+				saved = time.time()
+	if stats is not None and stats_path:
+		stats.save(stats_path)
+
+#Takes in an iterable of I/Q chunks and returns the dB power of every window of size N
+def powerWindows(chunks, N):
+	power = (binToLinearPower(chunk) for chunk in chunks)
+	return linearPowerToDecibel(window_avg.windowedAvg(power, N))
+
+#Tails a capture that uhd_rx_cfile is still writing and appends the dB power of every
+#window to the output as soon as it completes
+def follow(file_path, N, writer, chunk_size=CHUNK_SIZE, idle_timeout=5.0, fmt='fc32', full_scale=1.0, stats=None,
+           stats_path=None):
+	if fmt == 'sc16':
+		raw = capture_reader.followCapture(file_path, capture_reader.SC16, chunk_size, idle_timeout=idle_timeout)
+		chunks = (capture_reader.sc16ToComplex(chunk, full_scale) for chunk in raw)
+	else:
+		chunks = capture_reader.followCapture(file_path, np.complex64, chunk_size, idle_timeout=idle_timeout)
+	try:
+		processChunks(chunks, N, writer, stats, stats_path)
+	except KeyboardInterrupt:
+		if stats is not None and stats_path:
+			stats.save(stats_path)
+
+def main():
+	#get user input
+	parser = argparse.ArgumentParser(description='Binary I/Q data file to csv of decibel powers')
+	parser.add_argument('-p', '--path', type=str,
+	                   help='Directory path to i/q data file')
+	parser.add_argument('-w', '--window_size', type=int, default = 20000, required = False,
+	                   help='Size of averaging window, default: 20000')
+	parser.add_argument('-n', '--name', type=str,  default = 'db_power',
+	                   help='Name your output file (without extension), default: db_power')
+	parser.add_argument('-o', '--format', type=str, default = 'csv', choices = output_writer.FORMATS,
+	                   help='Output format, default: csv')
+	parser.add_argument('-s', '--samp_rate', type=float, default = None, required = False,
+	                   help='Sample rate used for output timestamps, default: from the capture\'s sidecar, else 24e6')
+	parser.add_argument('-k', '--chunk_size', type=int, default = CHUNK_SIZE, required = False,
+	                   help='Samples read per chunk, default: %d' % CHUNK_SIZE)
+	parser.add_argument('-f', '--follow', action='store_true',
+	                   help='Tail a capture that is still being written and append windows as they complete')
+	parser.add_argument('-t', '--idle_timeout', type=float, default = 5.0, required = False,
+	                   help='With --follow, stop once the file has not grown for this many seconds, default: 5')
+	parser.add_argument('-F', '--sample_format', type=str, default = None, choices = capture_reader.SAMPLE_FORMATS,
+	                   help='Sample format of the capture (uhd_rx_cfile --output-shorts writes sc16), default: from the sidecar, else fc32')
+	parser.add_argument('--full_scale', type=float, default = None, required = False,
+	                   help='Value an sc16 sample of 32767 stands for, default: from the sidecar, else 1.0')
+	parser.add_argument('--stats', action='store_true',
+	                   help='Also keep running statistics of the window powers (mean, std, min/max, quantiles, histogram) in <name>%s' % online_stats.SUFFIX)
+	result_cache.addArguments(parser)
+	args = parser.parse_args()
+	#options not given come from the capture's metadata sidecar, if it has one
+	capture_meta.resolveArgs(args, args.path, {'samp_rate': 24e6, 'sample_format': 'fc32', 'full_scale': 1.0})
+
+	#initialize variables
+	file_path = args.path
+	N = args.window_size
+	file_name = args.name
+	stats = online_stats.OnlineStats() if args.stats else None
+	stats_path = file_name + online_stats.SUFFIX
+
+	#do work, writing windows out as they are computed
+	with output_writer.openWriter(args.format, file_name, N, args.samp_rate) as writer:
+		if args.follow:
+			follow(file_path, N, writer, args.chunk_size, args.idle_timeout, args.sample_format, args.full_scale,
+			       stats, stats_path)
+		else:
+			cache = result_cache.fromArgs(args)
+			if cache is None:
+				processChunks(readBinChunks(file_path, args.chunk_size, args.sample_format, args.full_scale), N, writer,
+				              stats, stats_path)
+			else:
+				#reruns with the same window size read the windows back instead of the capture; a
+				#first run still writes them out as they are computed, and caches them at the end
+				full_scale = args.full_scale if args.sample_format == 'sc16' else None
+				key = cache.key(file_path, 'power', window=N, fmt=args.sample_format, full_scale=full_scale)
+				db_power = cache.get(key)
+				if db_power is None:
+					windows = [np.zeros(0)]
+					processChunks(readBinChunks(file_path, args.chunk_size, args.sample_format, args.full_scale), N, writer,
+					              stats, stats_path, windows)
+					cache.put(key, np.concatenate(windows))
+				else:
+					writer.write(db_power)
+					if stats is not None:
+						stats.update(db_power)
+						stats.save(stats_path)
+
+if __name__ == "__main__":
+	main()
+
+#plot of received power
+#plt.plot(db_power)
+#plt.show()
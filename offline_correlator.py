@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+#Offline PN correlator for RAW captures (cir_rxd.py, cir_rx8d.py: RRC-filtered samples).
+#The capture is correlated with the same taps cir_rx.py runs in its flowgraph, by FFT
+#overlap-save, and written either as a CIR file pdp_analysis.py reads like one recorded by
+#cir_rx, or straight as averaged PDPs. The capture is split into ranges that a process
+#pool correlates in parallel; every range is read with the taps' worth of samples before
+#it, so the output does not depend on how the capture was split. The radio host then only
+#has to stream samples to disk, and correlation can run later or elsewhere.
+#
+#In pdp mode the capture is cut into blocks of window PN periods; the PDP of a block is
+#the average power of the periods whose correlation peak lies in it, starting at the peak.
+#The result is a float32 file of one PDP per row that pdp_analysis.py reads (with -A -W
+#period -w 1, which its sidecar fills in).
+
+import numpy as np
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import capture_reader
+import capture_meta
+import pn_taps
+import pdp_analysis
+
+try:
+    import scipy.fft as fft
+except ImportError:
+    fft = np.fft
+
+#FFT size of the overlap-save blocks (at least 4 times the number of taps)
+FFT_SIZE = 2**13
+
+#Samples correlated at a time inside a worker, and default size of the worker ranges
+CHUNK_SIZE = 2**22
+SPLIT_SAMPLES = 2**25
+
+MODES = ['cir', 'pdp']
+
+#Smallest power of two at least n
+def nextPow2(n):
+    return 1 << max(int(n) - 1, 0).bit_length()
+
+class OverlapSave:
+    """
+    FIR filter y[n] = sum_k taps[k] x[n-k] (what filter.fir_filter_ccc computes) by FFT
+    overlap-save. filter() takes the len(taps)-1 samples preceding x as history (zeros at
+    the start of a capture) and transforms all blocks of x in one batched FFT.
+    """
+    def __init__(self, taps, fft_size=None):
+        self.taps = np.asarray(taps, dtype=np.complex64)
+        self.ntaps = len(self.taps)
+        self.fft_size = max(fft_size or FFT_SIZE, nextPow2(4*self.ntaps))
+        self.step = self.fft_size - self.ntaps + 1
+        self.response = fft.fft(self.taps, self.fft_size).astype(np.complex64)
+
+    def filter(self, x, history=()):
+        x = np.asarray(x, dtype=np.complex64)
+        keep = min(len(history), self.ntaps - 1)
+        n_blocks = -(-len(x) // self.step)
+        buf = np.zeros((n_blocks - 1)*self.step + self.fft_size, dtype=np.complex64)
+        if keep:
+            buf[self.ntaps - 1 - keep:self.ntaps - 1] = history[len(history) - keep:]
+        buf[self.ntaps - 1:self.ntaps - 1 + len(x)] = x
+        frames = np.lib.stride_tricks.as_strided(buf, (n_blocks, self.fft_size), (self.step*buf.itemsize, buf.itemsize))
+        out = fft.ifft(fft.fft(frames, axis=1)*self.response, axis=1)[:, self.ntaps - 1:]
+        return out.reshape(-1)[:len(x)].astype(np.complex64)
+
+#Correlates samples [start, stop) of a capture, chunk by chunk, yielding (offset, cir)
+def correlateRange(data, correlator, start, stop, chunk_size=CHUNK_SIZE):
+    for lo in range(start, stop, chunk_size):
+        hi = min(lo + chunk_size, stop)
+        history = np.asarray(data[max(lo - correlator.ntaps + 1, 0):lo], dtype=np.complex64)
+        yield lo, correlator.filter(data[lo:hi], history)
+
+#Worker (cir mode): correlates samples [start, stop) of the capture into the same range
+#of the output file, which the caller has already sized
+def cirRange(file_path, fmt, full_scale, taps, output, out_fmt, out_scale, start, stop, fft_size):
+    t0 = time.time()
+    data = capture_reader.openSamples(file_path, fmt, full_scale)
+    correlator = OverlapSave(taps, fft_size)
+    dtype = capture_reader.SC16 if out_fmt == 'sc16' else np.complex64
+    out = np.memmap(output, dtype=dtype, mode='r+')
+    for lo, cir in correlateRange(data, correlator, start, stop):
+        if out_fmt == 'sc16':
+            scaled = cir*(capture_reader.SC16_MAX/out_scale)
+            out[lo:lo+len(cir), 0] = np.clip(np.round(scaled.real), -32768, 32767)
+            out[lo:lo+len(cir), 1] = np.clip(np.round(scaled.imag), -32768, 32767)
+        else:
+            out[lo:lo+len(cir)] = cir
+    out.flush()
+    return stop - start, time.time() - t0
+
+#Worker (pdp mode): averaged PDPs of the blocks of window PN periods that start in
+#[start, stop), start being a multiple of the block length. Returns a (blocks, period) array.
+#The range is correlated chunk_size samples at a time and only the block sums are kept
+def pdpRange(file_path, fmt, full_scale, taps, degree, window, start, stop, n_samples, fft_size,
+             chunk_size=CHUNK_SIZE):
+    t0 = time.time()
+    period = 2**degree - 1
+    block = window*period
+    data = capture_reader.openSamples(file_path, fmt, full_scale)
+    correlator = OverlapSave(taps, fft_size)
+    n_blocks = -(-(stop - start) // block)
+    sums = np.zeros((n_blocks, period))
+    counts = np.zeros(n_blocks, dtype=np.int64)
+    #peaks are in order, so the periods of a block are consecutive rows
+    def add(peaks, rows):
+        ids = (peaks - start)//block
+        first = np.unique(ids, return_index=True)[1]
+        sums[ids[first]] += np.add.reduceat(rows, first, axis=0, dtype=np.float64)
+        counts[ids[first]] += np.diff(np.append(first, len(ids)))
+    #the last peak of a chunk waits for the next chunk: chunks judge their peaks apart, so
+    #of two closer than the peak distance the lower is dropped, as merge_pn_peaks does
+    pending = None
+    for s in range(start, stop, chunk_size):
+        e = min(s + chunk_size, stop)
+        #peaks are judged with a period of margin either side, and a peak near the end
+        #needs a period of samples after it
+        lo = max(s - 2**degree, 0)
+        hi = min(e + 2**degree + period, n_samples)
+        history = np.asarray(data[max(lo - correlator.ntaps + 1, 0):lo], dtype=np.complex64)
+        cir = correlator.filter(data[lo:hi], history)
+        power = pdp_analysis.complexToMagS(cir)
+        peaks = pdp_analysis.find_pn_peaks_range(cir, degree, s - lo, e - lo)
+        peaks = peaks[peaks + period <= len(cir)]
+        rows = power[peaks[:, None] + np.arange(period)]
+        heights = power[peaks]
+        peaks = peaks + lo
+        if pending is not None and len(peaks) and peaks[0] - pending[0][0] < 2**degree - 3:
+            if pending[1] < heights[0]:
+                pending = None
+            else:
+                peaks, rows, heights = peaks[1:], rows[1:], heights[1:]
+        if len(peaks):
+            if pending is not None:
+                add(pending[0], pending[2])
+            add(peaks[:-1], rows[:-1])
+            pending = (peaks[-1:], heights[-1], rows[-1:])
+    if pending is not None:
+        add(pending[0], pending[2])
+    used = counts > 0
+    return (sums[used]/counts[used, None]).astype(np.float32), stop - start, time.time() - t0
+
+#Correlates a RAW capture into output, over a pool of workers. Returns (samples, seconds)
+def correlate(file_path, output, degree, mask=0, tap_periods=1, mode='cir', window=100, fmt='fc32',
+              full_scale=1.0, out_fmt='fc32', out_scale=None, workers=None, split=SPLIT_SAMPLES,
+              fft_size=None):
+    taps = pn_taps.correlator_taps(degree, mask, 1, tap_periods)
+    data = capture_reader.openSamples(file_path, fmt, full_scale)
+    n_samples = len(data)
+    out_scale = out_scale or (2**degree - 1)*tap_periods
+    t0 = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if mode == 'cir':
+            itemsize = 4 if out_fmt == 'sc16' else 8
+            with open(output, 'wb') as f:
+                f.truncate(n_samples*itemsize)
+            futures = [pool.submit(cirRange, file_path, fmt, full_scale, taps, output, out_fmt, out_scale,
+                                   start, stop, fft_size) for start, stop in capture_reader.splitRanges(n_samples, split)]
+            for future in futures:
+                future.result()
+        elif mode == 'pdp':
+            ranges = capture_reader.splitRanges(n_samples, split, window*(2**degree - 1))
+            futures = [pool.submit(pdpRange, file_path, fmt, full_scale, taps, degree, window, start, stop,
+                                   n_samples, fft_size) for start, stop in ranges]
+            with open(output, 'wb') as f:
+                for future in futures:
+                    future.result()[0].tofile(f)
+        else:
+            raise ValueError('Unknown mode: {}'.format(mode))
+    return n_samples, time.time() - t0
+
+def main():
+    parser = argparse.ArgumentParser(description='Correlate RAW captures with the PN sequence into CIR files or averaged PDPs')
+    parser.add_argument('-p', '--path', type=str, required = True,
+                        help='RAW capture to correlate')
+    parser.add_argument('-o', '--output', type=str, default = None,
+                        help='Output file, default: <path>.cir (cir) or <path>.pdp (pdp)')
+    parser.add_argument('-m', '--mode', type=str, default = 'cir', choices = MODES,
+                        help='cir: the correlator output; pdp: PDPs averaged over window periods, default: cir')
+    parser.add_argument('-d', '--degree', type=int, default = None,
+                        help='Degree of PN sequence, default: from the capture\'s sidecar, else 8')
+    parser.add_argument('--mask', type=lambda x: int(x, 0), default = 0,
+                        help='GLFSR feedback mask, default: 0 (gnuradio default for the degree)')
+    parser.add_argument('-T', '--tap_periods', type=int, default = 1,
+                        help='PN periods the correlator taps span, as cir_rx --tap-periods, default: 1')
+    parser.add_argument('-w', '--window_size', type=int, default = 100,
+                        help='PN periods per averaged PDP (pdp), default: 100')
+    parser.add_argument('-F', '--sample_format', type=str, default = None, choices = capture_reader.SAMPLE_FORMATS,
+                        help='Sample format of the capture, default: from the sidecar, else fc32')
+    parser.add_argument('--full_scale', type=float, default = None,
+                        help='Value an sc16 sample of 32767 stands for, default: from the sidecar, else 1.0')
+    parser.add_argument('--cpu-format', dest='cpu_format', type=str, default = 'fc32', choices = capture_reader.SAMPLE_FORMATS,
+                        help='Sample format of the CIR written (cir), scaled as cir_rx --cpu-format, default: fc32')
+    parser.add_argument('-j', '--workers', type=int, default = os.cpu_count(),
+                        help='Worker processes, default: number of cores')
+    parser.add_argument('-S', '--split', type=int, default = SPLIT_SAMPLES,
+                        help='Samples per worker range, default: %d' % SPLIT_SAMPLES)
+    parser.add_argument('--fft_size', type=int, default = None,
+                        help='Overlap-save FFT size, default: %d or 4 times the taps' % FFT_SIZE)
+    parser.add_argument('-s', '--samp_rate', type=float, default = None,
+                        help='Sample rate of the capture, default: from the sidecar, else 24e6')
+    args = parser.parse_args()
+    params = capture_meta.resolveArgs(args, args.path, {'degree': 8, 'sample_format': 'fc32', 'full_scale': 1.0,
+                                                          'samp_rate': 24e6})
+    output = args.output or args.path + '.' + args.mode
+
+    #do work
+    n_samples, seconds = correlate(args.path, output, args.degree, args.mask, args.tap_periods, args.mode,
+                                   args.window_size, args.sample_format, args.full_scale, args.cpu_format,
+                                   workers=args.workers, split=args.split, fft_size=args.fft_size)
+    rate = n_samples/max(seconds, 1e-9)
+    print('%s: %d samples in %.2f s, %.1f Msamples/s, %.1fx real time' % (
+        output, n_samples, seconds, rate/1e6, rate/args.samp_rate))
+
+    #the output's sidecar carries the capture's, plus what pdp_analysis needs to read it
+    period = 2**args.degree - 1
+    meta = dict((k, params[k]) for k in ('gain', 'alpha', 'channel') if k in params)
+    if args.mode == 'cir':
+        capture_meta.writeMeta(output, args.cpu_format, args.samp_rate, params.get('center_freq'),
+                               params.get('host_time'), params.get('hw_time'), recorder='offline_correlator.py',
+                               degree=args.degree, mask=args.mask, tap_periods=args.tap_periods,
+                               full_scale=(period*args.tap_periods if args.cpu_format == 'sc16' else None), **meta)
+    else:
+        capture_meta.writeMeta(output, 'f32', args.samp_rate, params.get('center_freq'),
+                               params.get('host_time'), params.get('hw_time'), recorder='offline_correlator.py',
+                               degree=args.degree, mask=args.mask, tap_periods=args.tap_periods,
+                               taps=period, accumulated=True, pdp_average_periods=args.window_size,
+                               window_size=1, **meta)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+#Online statistics of power measurements for long unattended runs. OnlineStats takes
+#values chunk by chunk and keeps, in constant memory:
+#  count, mean and variance   Welford's update, chunks combined with Chan's formula
+#  min and max
+#  histogram                  fixed dB bins (HIST_STEP wide) plus under/overflow counts
+#  quantiles                  a merging t-digest of at most about DELTA/2 centroids
+#Every part merges exactly (the t-digest approximately, as it would have been built from
+#all the values), so statistics of the ranges a process pool works on, or of the captures
+#of several nodes, combine without a second pass over the data. They are saved as JSON;
+#online_stats.py merges saved files and prints the result.
+#
+#Non-finite values (the NaN dB of a zero-power window) are counted apart and left out.
+
+import numpy as np
+import os
+import json
+import argparse
+
+#Compression of the t-digest: more centroids, finer quantiles
+DELTA = 300
+#Histogram range and bin width in dB
+HIST_LO = -200.0
+HIST_HI = 50.0
+HIST_STEP = 0.1
+
+#Suffix of the statistics file written next to an output, and how often (seconds) a run
+#that follows a live capture saves it
+SUFFIX = '_stats.json'
+SAVE_INTERVAL = 60.0
+
+#Quantiles printed in a summary
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+class TDigest:
+    """
+    Merging t-digest: centroids (mean, weight) sorted by mean, each covering at most one
+    unit of the k1 scale k(q) = delta/(2 pi) asin(2q-1), so they are small near the tails
+    and large around the median. update() and merge() pool the new values or centroids
+    with the current ones and compress them again in one vectorized pass.
+    """
+    def __init__(self, delta=DELTA):
+        self.delta = delta
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+
+    @property
+    def count(self):
+        return self.weights.sum()
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self._compress(np.concatenate((self.means, values)), np.concatenate((self.weights, np.ones(len(values)))))
+
+    def merge(self, other):
+        self._compress(np.concatenate((self.means, other.means)), np.concatenate((self.weights, other.weights)))
+
+    #Groups the sorted centroids by the k1 unit their left edge falls in
+    def _compress(self, means, weights):
+        if len(means) == 0:
+            return
+        order = np.argsort(means, kind='mergesort')
+        means = means[order]
+        weights = weights[order]
+        total = weights.sum()
+        q_left = (np.cumsum(weights) - weights)/total
+        k = np.floor(self.delta/(2*np.pi)*np.arcsin(np.clip(2*q_left - 1, -1, 1)))
+        first = np.concatenate(([0], np.nonzero(np.diff(k))[0] + 1))
+        self.weights = np.add.reduceat(weights, first)
+        self.means = np.add.reduceat(weights*means, first)/self.weights
+
+    #Value below which fraction q (scalar or array) of the data lies, interpolated between
+    #centroid centres; lo and hi (the exact min and max) pin the ends
+    def quantile(self, q, lo=None, hi=None):
+        if len(self.means) == 0:
+            return np.full(np.shape(q), np.nan)
+        centres = (np.cumsum(self.weights) - self.weights/2)/self.count
+        lo = self.means[0] if lo is None else lo
+        hi = self.means[-1] if hi is None else hi
+        return np.interp(q, np.concatenate(([0], centres, [1])), np.concatenate(([lo], self.means, [hi])))
+
+    def toDict(self):
+        return {'delta': self.delta, 'means': self.means.tolist(), 'weights': self.weights.tolist()}
+
+    @classmethod
+    def fromDict(cls, d):
+        digest = cls(d['delta'])
+        digest.means = np.asarray(d['means'], dtype=np.float64)
+        digest.weights = np.asarray(d['weights'], dtype=np.float64)
+        return digest
+
+class OnlineStats:
+    """
+    Running statistics of a stream of values (dB power of every window): count, mean,
+    variance, min, max, a fixed-bin histogram and a t-digest for quantiles. update() takes
+    a chunk at a time; merge() folds in the statistics of another part of the data, which
+    must use the same histogram bins.
+    """
+    def __init__(self, delta=DELTA, hist_lo=HIST_LO, hist_hi=HIST_HI, hist_step=HIST_STEP):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.nan_count = 0
+        self.hist_lo = hist_lo
+        self.hist_step = hist_step
+        self.hist = np.zeros(int(round((hist_hi - hist_lo)/hist_step)), dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.digest = TDigest(delta)
+
+    @property
+    def hist_hi(self):
+        return self.hist_lo + len(self.hist)*self.hist_step
+
+    @property
+    def variance(self):
+        return self.m2/self.count if self.count else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    #Lower edges of the histogram bins
+    def edges(self):
+        return self.hist_lo + self.hist_step*np.arange(len(self.hist))
+
+    #Combines count, mean and sum of squared deviations of another part (Chan et al.)
+    def _combine(self, count, mean, m2):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta*count/total
+        self.m2 += m2 + delta*delta*self.count*count/total
+        self.count = total
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        finite = np.isfinite(values)
+        self.nan_count += int(len(values) - finite.sum())
+        values = values[finite]
+        if len(values) == 0:
+            return
+        mean = values.mean()
+        self._combine(len(values), mean, np.sum((values - mean)**2))
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        idx = np.floor((values - self.hist_lo)/self.hist_step).astype(np.int64)
+        self.underflow += int(np.sum(idx < 0))
+        self.overflow += int(np.sum(idx >= len(self.hist)))
+        inside = idx[(idx >= 0) & (idx < len(self.hist))]
+        self.hist += np.bincount(inside, minlength=len(self.hist))
+        self.digest.update(values)
+
+    def merge(self, other):
+        if (other.hist_lo, other.hist_step, len(other.hist)) != (self.hist_lo, self.hist_step, len(self.hist)):
+            raise ValueError('Cannot merge statistics with different histogram bins')
+        self._combine(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.nan_count += other.nan_count
+        self.hist += other.hist
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.digest.merge(other.digest)
+        return self
+
+    #Value below which fraction q (scalar or array) of the values lies, from the t-digest
+    def quantile(self, q):
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan)
+        return self.digest.quantile(q, self.min, self.max)
+
+    def summary(self, quantiles=QUANTILES):
+        summary = {'count': self.count, 'nan_count': self.nan_count, 'mean': float(self.mean), 'std': float(self.std),
+                   'min': float(self.min), 'max': float(self.max)}
+        for q, value in zip(quantiles, np.atleast_1d(self.quantile(quantiles))):
+            summary['q%g' % (100*q)] = float(value)
+        return summary
+
+    def toDict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'nan_count': self.nan_count,
+                'min': self.min if self.count else None, 'max': self.max if self.count else None,
+                'hist_lo': self.hist_lo, 'hist_step': self.hist_step, 'hist': self.hist.tolist(),
+                'underflow': self.underflow, 'overflow': self.overflow, 'digest': self.digest.toDict()}
+
+    @classmethod
+    def fromDict(cls, d):
+        stats = cls(d['digest']['delta'], d['hist_lo'], d['hist_lo'] + len(d['hist'])*d['hist_step'], d['hist_step'])
+        stats.count = d['count']
+        stats.mean = d['mean']
+        stats.m2 = d['m2']
+        stats.nan_count = d['nan_count']
+        stats.min = np.inf if d['min'] is None else d['min']
+        stats.max = -np.inf if d['max'] is None else d['max']
+        stats.hist = np.asarray(d['hist'], dtype=np.int64)
+        stats.underflow = d['underflow']
+        stats.overflow = d['overflow']
+        stats.digest = TDigest.fromDict(d['digest'])
+        return stats
+
+    #Writes the statistics to a JSON file, replacing it atomically
+    def save(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.toDict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.fromDict(json.load(f))
+
+#Takes in a list of OnlineStats and returns their merge (a new object)
+def mergeAll(stats):
+    merged = OnlineStats.fromDict(stats[0].toDict())
+    for other in stats[1:]:
+        merged.merge(other)
+    return merged
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge and summarize power statistics saved by iq_to_power, bin_avg and batch_process --stats')
+    parser.add_argument('paths', type=str, nargs='+',
+                        help='Statistics files (*%s) to merge, e.g. one per node' % SUFFIX)
+    parser.add_argument('-o', '--output', type=str, default = None,
+                        help='Also save the merged statistics to this file')
+    args = parser.parse_args()
+
+    merged = mergeAll([OnlineStats.load(path) for path in args.paths])
+    if args.output:
+        merged.save(args.output)
+    for key, value in merged.summary().items():
+        print('%-10s %g' % (key, value))
+
+if __name__ == "__main__":
+    main()
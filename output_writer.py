@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+#Output layer shared by the analysis scripts. A writer takes the per-window results of a
+#run (dB power values) in as many pieces as the caller produces them and stores them as
+#CSV (the single comma-separated row the scripts always wrote), .npy, raw float32 or
+#Parquet with window-index and timestamp columns.
+
+import numpy as np
+import struct
+
+#Output formats selectable with -o/--format, and the file extension each one uses
+FORMATS = ['csv', 'npy', 'f32', 'parquet']
+EXTENSIONS = {'csv': '.csv', 'npy': '.npy', 'f32': '.f32', 'parquet': '.parquet'}
+
+#Total size of the .npy header written by NpyWriter. It is reserved up front and
+#rewritten with the final shape on close
+NPY_HEADER_LEN = 128
+
+#Rows buffered by ParquetWriter before a row group is written
+ROW_GROUP_SIZE = 2**16
+
+class OutputWriter:
+    """
+    Base class of the writers. window_size and samp_rate turn the running window index
+    into the timestamp (seconds since start_time) of the first sample of each window.
+    """
+    def __init__(self, filename, window_size=1, samp_rate=1.0, start_time=0.0):
+        self.filename = filename
+        self.window_size = window_size
+        self.samp_rate = samp_rate
+        self.start_time = start_time
+        self.count = 0
+
+    def write(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self._write(values)
+        self.count += len(values)
+
+    def _write(self, values):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    #Window index and timestamp columns for the next n values
+    def columns(self, n):
+        index = np.arange(self.count, self.count + n, dtype=np.int64)
+        return index, self.start_time + index*(self.window_size/float(self.samp_rate))
+
+class CSVWriter(OutputWriter):
+    """
+    Writes one comma-separated row, formatted the way np.savetxt did in toCSV.
+    """
+    def __init__(self, filename, *args, **kwargs):
+        OutputWriter.__init__(self, filename, *args, **kwargs)
+        self.f = open(filename, 'w')
+
+    def _write(self, values):
+        if len(values) == 0:
+            return
+        if self.count:
+            self.f.write(',')
+        np.savetxt(self.f, [values], fmt='%.18e', delimiter=',', newline='')
+        self.f.flush()
+
+    def close(self):
+        self.f.write('\n')
+        self.f.close()
+
+class RawWriter(OutputWriter):
+    """
+    Writes bare little-endian float32 values, readable with np.fromfile(name, np.float32).
+    """
+    dtype = np.dtype('<f4')
+
+    def __init__(self, filename, *args, **kwargs):
+        OutputWriter.__init__(self, filename, *args, **kwargs)
+        self.f = open(filename, 'wb')
+
+    def _write(self, values):
+        values.astype(self.dtype).tofile(self.f)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+class NpyWriter(RawWriter):
+    """
+    Writes a 1-D float64 .npy array. The header is rewritten with the final length on
+    close, so the file can be appended to without holding the data in memory.
+    """
+    dtype = np.dtype('<f8')
+
+    def __init__(self, filename, *args, **kwargs):
+        RawWriter.__init__(self, filename, *args, **kwargs)
+        self.f.write(self.header(0))
+
+    def header(self, n):
+        header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (self.dtype.str, n)
+        header = header.ljust(NPY_HEADER_LEN - 10 - 1) + '\n'
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+    def close(self):
+        self.f.seek(0)
+        self.f.write(self.header(self.count))
+        self.f.close()
+
+class ParquetWriter(OutputWriter):
+    """
+    Writes a Parquet table with window, time_s and power_db columns, one row group per
+    ROW_GROUP_SIZE rows. Needs pyarrow, the engine pandas uses for Parquet.
+    """
+    def __init__(self, filename, *args, **kwargs):
+        OutputWriter.__init__(self, filename, *args, **kwargs)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('Parquet output needs pyarrow: pip3 install -r requirements.txt, or choose another -o format')
+        self.pa = pyarrow
+        self.schema = pyarrow.schema([('window', pyarrow.int64()), ('time_s', pyarrow.float64()),
+                                      ('power_db', pyarrow.float64())])
+        self.writer = pyarrow.parquet.ParquetWriter(filename, self.schema)
+        self.pending = []
+        self.pending_rows = 0
+
+    def _write(self, values):
+        index, timestamp = self.columns(len(values))
+        self.pending.append((index, timestamp, values))
+        self.pending_rows += len(values)
+        if self.pending_rows >= ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_rows:
+            return
+        columns = [np.concatenate([p[i] for p in self.pending]) for i in range(3)]
+        self.writer.write_table(self.pa.Table.from_arrays([self.pa.array(c) for c in columns], schema=self.schema))
+        self.pending = []
+        self.pending_rows = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+WRITERS = {'csv': CSVWriter, 'npy': NpyWriter, 'f32': RawWriter, 'parquet': ParquetWriter}
+
+#Takes in an output format and a file name without extension and returns an open writer
+def openWriter(fmt, name, window_size=1, samp_rate=1.0, start_time=0.0):
+    return WRITERS[fmt](name + EXTENSIONS[fmt], window_size, samp_rate, start_time)
+
+#Writes a whole array of results in one go
+def writeArray(array, fmt, name, window_size=1, samp_rate=1.0, start_time=0.0):
+    with openWriter(fmt, name, window_size, samp_rate, start_time) as writer:
+        writer.write(array)
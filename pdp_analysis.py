@@ -1,152 +1,422 @@
-#!/usr/bin/python3
-#Program that takes in a complex binary file (fc32) of channel impulse response
-#and outputs a single pdp plot as png
-#comment
-
-import numpy as np
-from mpl_toolkits import mplot3d
-import scipy
-import os
-import matplotlib.pyplot as plt
-import math
-from decimal import *
-import argparse
-import matplotlib.pyplot as plt
-import scipy.fftpack
-from scipy.signal import find_peaks
-from mpl_toolkits.mplot3d.axes3d import Axes3D
-import plotly.graph_objects as go
-import pandas as pd
-import cmath
-
-#Takes in complex binary file and returns binary data array
-def readBin(file_path):
-	return np.fromfile(file_path, dtype=np.complex64)
-
-def zero_to_nan(values):
-    """Replace every 0 with 'nan' and return a copy."""
-    return [float('nan') if x==0 else x for x in values]
-#Takes in complex vector and returns magnitude squared
-def complexToMagS(c):
-    return np.abs(c)**2
-#input complex cir data. Discards first and last 20000 samples and averages pdp's
-#together
-def avg_pdp(data,window,degree):
-    pn_len = 2**degree-1
-    pdp_mag = complexToMagS(data)
-    indices = find_peaks(pdp_mag,distance=2**degree-3)[0]
-
-    #return indices of first peak after 20000
-    indices = indices[indices > 20000]
-    indices = indices[indices < len(pdp_mag) - 20000]
-    start = indices[0]
-
-    avg_pdp = np.zeros(len(pdp_mag))
-
-    count = 0
-    temp = np.zeros(pn_len)
-    avg_pdp_index = 0
-    for i in indices:
-        if count < window:
-            temp = temp + pdp_mag[i:i+pn_len]
-            count = count + 1
-        else:
-            temp = temp/window
-            avg_pdp[avg_pdp_index:avg_pdp_index+pn_len] = temp
-            temp = np.zeros(pn_len)
-            count = 0
-            avg_pdp_index = avg_pdp_index + pn_len
-
-    return avg_pdp[avg_pdp != 0]
-
-#input linear linear measurements to get power in dB
-def linearPowerToDecibel(lin_power):
-    db_power = []
-    for i in range(0,len(lin_power)):
-        db_power.append(10*np.log10(lin_power[i]) if lin_power[i] != 0 else np.NaN)
-    return db_power
-
-#given a set of pdps, save a png of a single pdp
-def makeFig(pdp,degree,name):
-    indices = find_peaks(pdp,distance=2**degree-3)[0]
-    plt.plot(pdp[indices[20]:indices[20]+2**degree-60])
-    plt.xlabel('Delay (\u03BCs)')
-    plt.ylabel('Power (dB)')
-    plt.title('Sample Power Delay Profile')
-    plt.xticks(np.arange(0,260,step=50),['0','2', '4', '6', '8'])
-    plt.savefig(name+".png")
-
-def find_multi_peaks(pdp,samp_rate):
-    indices = find_peaks(pdp)[0]
-    noise = noiseFloor(pdp)
-    for i in range(len(indices)):
-        if pdp[indices[i]] < noise:
-                indices[i] = 0
-    indices = [i for i in indices if i !=0]
-    time_delays = [float(i)/float(samp_rate)-float(indices[0])/float(samp_rate) for i in indices]
-    magnitudes = [pdp[i] for i in indices]
-    #remove first path
-    time_delays.pop(0)
-    magnitudes.pop(0)
-    indices.pop(0)
-    return time_delays, magnitudes, indices
-
-#Function to find noise floor
-def noiseFloor(data):
-    return np.average(data)
-
-#input power delay profiles, output mean delay spread, rms delay spread
-def delaySpread(pdp,degree,samp_rate):
-    indices = find_peaks(pdp,distance=2**degree-3)[0]
-    pdp = pdp[indices[0]:indices[-1]]
-    mean_delay = 0
-    rms_delay = 0
-    for i in indices[0:-2]:
-        single_pdp = pdp[i:i+2**degree-60]
-        time_delays, magnitudes, index = find_multi_peaks(single_pdp,samp_rate)
-        mean_delay = mean_delay + np.dot(magnitudes,time_delays)/sum(magnitudes)
-    mean_delay = mean_delay/len(indices[0:-2])
-    for i in indices[0:-2]:
-        single_pdp = pdp[i:i+2**degree-60]
-        time_delays, magnitudes, index = find_multi_peaks(single_pdp,samp_rate)
-        delays = [(i - mean_delay)**2 for i in time_delays]
-        rms_delay = rms_delay + math.sqrt(np.dot(magnitudes,delays)/sum(magnitudes))
-    rms_delay = rms_delay/len(indices[0:-2])
-    print('mean delay: ' + str(mean_delay) + 's')
-    print('rms delay: ' + str(rms_delay) + 's')
-
-def toCSV(array,filename):
-	np.savetxt(filename,[array], delimiter=',')
-
-def main():
-	#get user input
-	parser = argparse.ArgumentParser(description='Binary I/Q channel impulse response to png/CSv')
-	parser.add_argument('-p', '--path', type=str,
-	help='Directory path to data file')
-	parser.add_argument('-w', '--window_size', type=int, default = 100, required = False,
-	help='Size of averaging window, default: 100')
-	parser.add_argument('-d', '--degree', type=int, default = 8, required = False,
-	help='Degree of PN sequence, default: 8')
-	parser.add_argument('-s', '--samp_rate', type=int, default = 25*10**6, required = False,
-	help='Samp rate default = 25M')
-	parser.add_argument('-n', '--name', type=str,  default = 'pdp',
-	help='Name your png file, default: pdp')
-	parser.add_argument('-c', '--csv', type=str,  default = 'pdp',
-	help='Name your CSV file, default: pdp')
-	args = parser.parse_args()
-	#initialize variableshome
-	file_path = args.path
-	N = args.window_size
-	file_name = args.name
-	csv_name = args.csv
-	samp_rate = args.samp_rate
-	degree = args.degree
-	#do work
-	data = readBin(file_path)
-	avg_cir = avg_pdp(data,N,8)
-	pdp = linearPowerToDecibel(avg_cir)
-	makeFig(pdp,degree,file_name)
-	toCSV(pdp,csv_name+".csv")
-	delaySpread(pdp,degree,samp_rate)
-if __name__ == "__main__":
-    main()
+#!/usr/bin/python3
+#Program that takes in a complex binary file (fc32) of channel impulse response
+#and outputs a single pdp plot as png
+#comment
+
+import numpy as np
+from mpl_toolkits import mplot3d
+import scipy
+import os
+import sys
+import matplotlib.pyplot as plt
+import math
+from decimal import *
+import argparse
+import matplotlib.pyplot as plt
+import scipy.fftpack
+from scipy.signal import find_peaks
+from mpl_toolkits.mplot3d.axes3d import Axes3D
+import plotly.graph_objects as go
+import pandas as pd
+import cmath
+import capture_reader
+import output_writer
+import capture_meta
+import result_cache
+import cfar
+import peak_interp
+from capture_reader import CHUNK_SIZE
+
+#Takes in complex binary file and returns a memory-mapped binary data array. sc16 captures
+#are converted to complex64 (SC16_MAX being full_scale) only as they are sliced
+def readBin(file_path, fmt='fc32', full_scale=1.0):
+	return capture_reader.openSamples(file_path, fmt, full_scale)
+
+#Opens a CIR capture the way the analysis reads it: float32 power rows if the receiver
+#accumulated them, else complex samples of sample_format (sc16 scaled to full_scale, by
+#default 2**degree-1 as cir_rx writes it). Returns the data and the read parameters the
+#result cache keys on
+def openCIR(file_path, degree, sample_format='fc32', full_scale=None, accumulated=False):
+	if accumulated:
+		return capture_reader.openCapture(file_path, np.float32), {'accumulated': True}
+	full_scale = full_scale if full_scale is not None else 2**degree-1
+	data = readBin(file_path, sample_format, full_scale)
+	return data, {'fmt': sample_format, 'full_scale': full_scale if sample_format == 'sc16' else None}
+
+def zero_to_nan(values):
+    """Replace every 0 with 'nan' and return a copy."""
+    return [float('nan') if x==0 else x for x in values]
+#Takes in complex vector and returns magnitude squared
+def complexToMagS(c):
+    c = np.asarray(c)
+    return c.real*c.real + c.imag*c.imag
+#input complex cir data, returns the PN-period correlation peaks that lie in data[start:stop].
+#The scan looks one period past both ends so edge peaks are judged as in a full scan
+def find_pn_peaks_range(data,degree,start,stop):
+    overlap = 2**degree
+    lo = max(start - overlap, 0)
+    hi = min(stop + overlap, len(data))
+    found = find_peaks(complexToMagS(data[lo:hi]),distance=2**degree-3)[0] + lo
+    return found[(found >= start) & (found < stop)]
+
+#input complex cir data and a list of peak arrays found range by range, in order.
+#Ranges decide independently, so drop the lower of two peaks closer than distance
+def merge_pn_peaks(data,peaks,degree):
+    distance = 2**degree-3
+    peaks = np.concatenate(peaks) if len(peaks) else np.zeros(0, dtype=np.intp)
+    keep = np.ones(len(peaks), dtype=bool)
+    for k in np.nonzero(np.diff(peaks) < distance)[0]:
+        if not keep[k]:
+            continue
+        if complexToMagS(data[peaks[k]]) < complexToMagS(data[peaks[k+1]]):
+            keep[k] = False
+        else:
+            keep[k+1] = False
+    return peaks[keep]
+
+#input complex cir data, returns the index of the correlation peak of every PN period.
+#The capture is scanned in chunks so only one chunk of magnitudes is in memory
+def find_pn_peaks(data,degree,chunk_size=CHUNK_SIZE):
+    peaks = [find_pn_peaks_range(data,degree,start,start+chunk_size) for start in range(0, len(data), chunk_size)]
+    return merge_pn_peaks(data,peaks,degree)
+
+#input complex cir data. Discards first and last 20000 samples and averages the pdp's of
+#every group of window consecutive PN periods, returning an (n_groups, pn_len) array.
+#indices are the PN-period peaks if already known
+def avg_pdp(data,window,degree,indices=None,chunk_size=CHUNK_SIZE):
+    pn_len = 2**degree-1
+    if indices is None:
+        indices = find_pn_peaks(data,degree)
+
+    #keep peaks at least 20000 samples away from either end
+    indices = indices[indices > 20000]
+    indices = indices[indices < len(data) - 20000]
+
+    #per batch of groups, take the magnitudes of the span they cover, gather the segments
+    #as a (groups, window, pn_len) array and reduce over the window axis. Batches keep
+    #about chunk_size samples in memory
+    n_groups = len(indices)//window
+    starts = indices[:n_groups*window].reshape(n_groups, window, 1)
+    offsets = np.arange(pn_len)
+    avg_pdp = np.empty((n_groups, pn_len))
+    batch = max(chunk_size//(window*pn_len), 1)
+    for g in range(0, n_groups, batch):
+        group_starts = starts[g:g+batch]
+        lo = group_starts.min()
+        span = complexToMagS(data[lo:group_starts.max()+pn_len])
+        avg_pdp[g:g+batch] = span[group_starts - lo + offsets].mean(axis=1, dtype=np.float64)
+    return avg_pdp
+
+#Takes in the complex correlation peaks of groups of consecutive PN periods (groups, window)
+#and their sample indices, and returns the residual carrier frequency offset of every group
+#in radians per sample, from the mean phase step between consecutive peaks. Unambiguous
+#while the phase drifts less than pi per period (+-47 kHz for degree 8 at 24 Msps)
+def estimate_cfo(peaks,starts):
+    step = np.angle(np.sum(peaks[:, 1:]*np.conj(peaks[:, :-1]), axis=1))
+    spacing = (starts[:, -1] - starts[:, 0])/max(peaks.shape[1] - 1, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cfo = step/spacing
+    cfo[~np.isfinite(cfo)] = 0
+    return cfo
+
+#input complex cir data. Groups the PN periods as avg_pdp does, but averages the complex
+#CIRs of every group before taking their power: each group's frequency offset is estimated
+#from the phase drift of its correlation peaks and removed, so the channel adds up in phase
+#and the noise floor drops as window rather than sqrt(window). The channel must stay
+#coherent over the window. Returns the (n_groups, pn_len) pdps and the offset of every
+#group in radians per sample
+def avg_pdp_coherent(data,window,degree,indices=None,chunk_size=CHUNK_SIZE):
+    pn_len = 2**degree-1
+    if indices is None:
+        indices = find_pn_peaks(data,degree)
+
+    indices = indices[indices > 20000]
+    indices = indices[indices < len(data) - 20000]
+
+    n_groups = len(indices)//window
+    starts = indices[:n_groups*window].reshape(n_groups, window)
+    offsets = np.arange(pn_len)
+    avg_pdp = np.empty((n_groups, pn_len))
+    cfo = np.empty(n_groups)
+    batch = max(chunk_size//(window*pn_len), 1)
+    for g in range(0, n_groups, batch):
+        group_starts = starts[g:g+batch]
+        lo = group_starts.min()
+        span = np.asarray(data[lo:group_starts.max()+pn_len], dtype=np.complex64)
+        cirs = span[group_starts[:, :, None] - lo + offsets]
+        cfo[g:g+batch] = estimate_cfo(cirs[:, :, 0], group_starts)
+        #phase of every period's start relative to the group's first peak. The ramp along
+        #the taps of a period turns each averaged tap by a constant, which its power drops
+        t = group_starts - group_starts[:, :1]
+        rotation = np.exp(-1j*cfo[g:g+batch, None]*t).astype(np.complex64)
+        avg_pdp[g:g+batch] = complexToMagS(np.matmul(rotation[:, None, :], cirs)[:, 0]/window)
+    return avg_pdp, cfo
+
+#input a capture windowed by the receiver (cir_rx -W taps: one row of taps per PN period),
+#returns the (n_groups, taps) array of pdps averaged over window rows. Accumulated
+#captures (cir_rx -K or -P) hold float32 power rows and are averaged as is. Every pdp is
+#rotated so its strongest tap comes first, as -P rows are not aligned on the peak
+def avg_windowed(data,window,taps):
+    rows = data[:len(data)//taps*taps].reshape(-1, taps)
+    n_groups = len(rows)//window
+    rows = rows[:n_groups*window]
+    power = complexToMagS(rows) if np.iscomplexobj(rows) else rows
+    pdps = power.reshape(n_groups, window, taps).mean(axis=1, dtype=np.float64)
+    shift = pdps.argmax(axis=1)[:, None]
+    return pdps[np.arange(n_groups)[:, None], (shift + np.arange(taps)) % taps]
+
+#input linear linear measurements to get power in dB
+def linearPowerToDecibel(lin_power):
+    lin_power = np.asarray(lin_power, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        db_power = 10*np.log10(lin_power)
+    db_power[lin_power == 0] = np.nan
+    return db_power
+
+#given a matrix of linear pdps (as returned by avg_pdp), save a png of a single pdp
+def makeFig(pdps,degree,name,row=20):
+    pdps = np.atleast_2d(pdps)
+    plt.plot(linearPowerToDecibel(pdps[min(row, len(pdps)-1), :2**degree-60]))
+    plt.xlabel('Delay (\u03BCs)')
+    plt.ylabel('Power (dB)')
+    plt.title('Sample Power Delay Profile')
+    plt.xticks(np.arange(0,260,step=50),['0','2', '4', '6', '8', '10'])
+    plt.savefig(name+".png")
+
+def find_multi_peaks(pdp,samp_rate):
+    pdp = np.asarray(pdp)
+    indices = find_peaks(pdp)[0]
+    indices = indices[pdp[indices] >= noiseFloor(pdp)]
+    time_delays = (indices - indices[0])/float(samp_rate)
+    #remove first path
+    return time_delays[1:].tolist(), pdp[indices[1:]].tolist(), indices[1:].tolist()
+
+#Function to find noise floor
+def noiseFloor(data):
+    return np.average(data)
+
+#input matrix of linear pdps, one per row, each starting at the direct path. Returns a
+#boolean matrix marking the direct path and every local maximum above the noise floor
+#(the average of the row in dB) of its row
+def find_multi_peaks_matrix(pdps):
+    pdps = np.atleast_2d(pdps)
+    with np.errstate(divide='ignore'):
+        db = 10*np.log10(pdps)
+    db[~np.isfinite(db)] = np.nan
+    noise = np.nanmean(db, axis=1)[:, None]
+    paths = np.zeros(pdps.shape, dtype=bool)
+    mid = pdps[:, 1:-1]
+    paths[:, 1:-1] = (mid > pdps[:, :-2]) & (mid >= pdps[:, 2:]) & (db[:, 1:-1] > noise)
+    paths[:, 0] = True
+    return paths
+
+#Path detectors: CFAR over the linear pdps (cfar.py), or local maxima above the row's
+#mean in dB (find_multi_peaks_matrix)
+DETECTORS = cfar.METHODS + ['peaks']
+
+#input matrix of linear pdps, one per row, each starting at the direct path. Returns a
+#boolean matrix marking the direct path and every path the detector finds
+def detect_paths(pdps,detector='os',pfa=cfar.PFA):
+    if detector == 'peaks':
+        return find_multi_peaks_matrix(pdps)
+    paths = cfar.detect(pdps,detector,pfa=pfa)[0]
+    paths[:, 0] = True
+    return paths
+
+#input matrix of linear pdps, one per row, each starting at the direct path. Returns the
+#power-weighted mean delay and rms delay spread of the detected paths of every row, in
+#seconds. Only the first span delay bins of each row are used
+def delay_spread(pdps,samp_rate,span=None,detector='os',pfa=cfar.PFA):
+    pdps = np.atleast_2d(pdps)[:, :span]
+    weights = np.where(detect_paths(pdps,detector,pfa), pdps, 0)
+    delays = np.arange(pdps.shape[1])/float(samp_rate)
+    total = weights.sum(axis=1)
+    mean_delay = weights.dot(delays)/total
+    rms_delay = np.sqrt(np.maximum(weights.dot(delays**2)/total - mean_delay**2, 0))
+    return mean_delay, rms_delay
+
+#input the paths of a set of pdps as (row, delay in seconds, linear power) arrays, returns
+#the power-weighted mean delay and rms delay spread of every one of the n_rows pdps
+def path_delay_spread(rows,delays,powers,n_rows):
+    total = np.bincount(rows, powers, n_rows)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_delay = np.bincount(rows, powers*delays, n_rows)/total
+        rms_delay = np.sqrt(np.maximum(np.bincount(rows, powers*delays**2, n_rows)/total - mean_delay**2, 0))
+    return mean_delay, rms_delay
+
+#input matrix of linear power delay profiles (as returned by avg_pdp), prints the average
+#mean delay and rms delay spread and returns both per pdp. The last 59 bins of every
+#period are left out as they run into the next correlation peak
+def delaySpread(pdp,degree,samp_rate):
+    mean_delay, rms_delay = delay_spread(pdp,samp_rate,2**degree-60)
+    print('mean delay: ' + str(np.mean(mean_delay)) + 's')
+    print('rms delay: ' + str(np.mean(rms_delay)) + 's')
+    return mean_delay, rms_delay
+
+class PDPAnalysis:
+    """
+    PDP pipeline over one CIR capture. The PN-period peaks are found once, on first use,
+    and every operation below reuses them; averaged pdps are cached per window size.
+    With cache (a result_cache.CaptureCache of the capture) peaks and averaged pdps are
+    also kept on disk across runs.
+    """
+    def __init__(self, data, degree, samp_rate, indices=None, taps=None, cache=None, detector='os', pfa=cfar.PFA,
+                 interpolation=None, coherent=False):
+        self.data = data
+        self.degree = degree
+        self.samp_rate = samp_rate
+        self.pn_len = 2**degree-1
+        #receiver-windowed captures hold taps samples per period, all of them delays
+        self.taps = taps
+        self.span = 2**degree-60 if taps is None else None
+        self._indices = indices
+        self._averages = {}
+        self.cache = cache
+        self.detector = detector
+        self.pfa = pfa
+        #peak_interp method giving paths sub-sample delays, None for whole samples
+        self.interpolation = interpolation
+        #average complex CIRs after removing the frequency offset (avg_pdp_coherent)
+        self.coherent = coherent
+        self._offsets = {}
+
+    #result of compute(), through the on-disk cache if there is one
+    def _cached(self, stage, compute, **params):
+        if self.cache is None:
+            return compute()
+        return self.cache.cached(stage, compute, degree=self.degree, **params)
+
+    #index of the correlation peak of every PN period
+    @property
+    def indices(self):
+        if self._indices is None:
+            self._indices = self._cached('pn_peaks', lambda: find_pn_peaks(self.data,self.degree))
+        return self._indices
+
+    #(n_groups, pn_len) matrix of linear pdps averaged over window periods
+    def average(self, window):
+        if window not in self._averages:
+            if self.taps:
+                self._averages[window] = self._cached('pdp_windowed', lambda: avg_windowed(self.data,window,self.taps),
+                                                      window=window, taps=self.taps)
+            elif self.coherent:
+                self._averages[window], self._offsets[window] = self._cached(
+                    'pdp_coherent', lambda: avg_pdp_coherent(self.data,window,self.degree,self.indices), window=window)
+            else:
+                self._averages[window] = self._cached('pdp_average', lambda: avg_pdp(self.data,window,self.degree,self.indices),
+                                                      window=window)
+        return self._averages[window]
+
+    #residual frequency offset in Hz of every averaged pdp (coherent averaging only)
+    def frequency_offset(self, window):
+        self.average(window)
+        return self._offsets[window]*self.samp_rate/(2*np.pi)
+
+    #save a png of one averaged pdp
+    def figure(self, name, window, row=20):
+        makeFig(self.average(window),self.degree,name,row)
+
+    #per averaged pdp mean delay and rms delay spread, in seconds
+    def delay_spread(self, window):
+        if self.interpolation:
+            return path_delay_spread(*self.multipath(window), n_rows=len(self.average(window)))
+        return delay_spread(self.average(window),self.samp_rate,self.span,self.detector,self.pfa)
+
+    #every detected path as (pdp row, delay in seconds, linear power) arrays. With
+    #interpolation the delays are fractional, measured from the interpolated direct path
+    def multipath(self, window):
+        full = self.average(window)
+        pdps = full[:, :self.span]
+        rows, bins = np.nonzero(detect_paths(pdps,self.detector,self.pfa))
+        if not self.interpolation:
+            return rows, bins/float(self.samp_rate), pdps[rows, bins]
+        delays = peak_interp.interpolate(full,rows,bins,self.interpolation)
+        direct = peak_interp.interpolate(full,np.arange(len(full)),np.zeros(len(full), dtype=np.intp),self.interpolation)
+        return rows, (delays - direct[rows])/float(self.samp_rate), pdps[rows, bins]
+
+    #noise floor (linear power) of every averaged pdp, as the CFAR detector estimates it
+    def noise(self, window):
+        method = 'ca' if self.detector == 'peaks' else self.detector
+        return cfar.paths(self.average(window)[:, :self.span],self.samp_rate,method,pfa=self.pfa)[3]
+
+def toCSV(array,filename):
+	np.savetxt(filename,[array], delimiter=',')
+
+def main():
+	#get user input
+	parser = argparse.ArgumentParser(description='Binary I/Q channel impulse response to png/CSv')
+	parser.add_argument('-p', '--path', type=str,
+	help='Directory path to data file')
+	parser.add_argument('-w', '--window_size', type=int, default = None, required = False,
+	help='Size of averaging window, default: from the capture\'s sidecar (1 for rows already averaged), else 100')
+	parser.add_argument('-d', '--degree', type=int, default = None, required = False,
+	help='Degree of PN sequence, default: from the capture\'s sidecar, else 8')
+	parser.add_argument('-s', '--samp_rate', type=int, default = None, required = False,
+	help='Samp rate default = from the capture\'s sidecar, else 25M')
+	parser.add_argument('-n', '--name', type=str,  default = 'pdp',
+	help='Name your png file, default: pdp')
+	parser.add_argument('-c', '--csv', type=str,  default = 'pdp',
+	help='Name your CSV file, default: pdp')
+	parser.add_argument('-o', '--format', type=str, default = 'csv', choices = output_writer.FORMATS,
+	help='Format of the PDP output file, default: csv')
+	parser.add_argument('-t', '--delays', type=str, default = None,
+	help='Also write the mean and rms delay spread of every averaged pdp to <name>_mean/<name>_rms')
+	parser.add_argument('-W', '--taps', type=int, default = None,
+	help='Capture was windowed by the receiver (cir_rx -W) to this many taps per period, default: from the sidecar')
+	parser.add_argument('-A', '--accumulated', action='store_true', default = None,
+	help='Windowed capture holds float32 power averaged by the receiver (cir_rx -K, or -P with -W 2**degree-1), default: from the sidecar')
+	parser.add_argument('-F', '--sample_format', type=str, default = None, choices = capture_reader.SAMPLE_FORMATS,
+	help='Sample format of the CIR capture (cir_rx --cpu-format), default: from the sidecar, else fc32')
+	parser.add_argument('--full_scale', type=float, default = None,
+	help='Value an sc16 sample of 32767 stands for, default: from the sidecar, else 2**degree-1 as cir_rx writes it')
+	parser.add_argument('-D', '--detector', type=str, default = 'os', choices = DETECTORS,
+	help='Path detector for the delay spread: OS-CFAR, CA-CFAR (fastest, but a strong path hides weaker ones next to it), or local maxima above the mean dB (peaks), default: os')
+	parser.add_argument('--pfa', type=float, default = cfar.PFA,
+	help='CFAR false alarm probability per delay bin, default: %g' % cfar.PFA)
+	parser.add_argument('-I', '--interpolation', type=str, default = None, choices = peak_interp.METHODS,
+	help='Estimate path delays to a fraction of a sample: gaussian (best at one sample per chip), parabolic, or sinc (oversampled captures), default: whole samples')
+	parser.add_argument('-C', '--coherent', action='store_true',
+	help='Average complex CIRs after removing the residual frequency offset, so the noise floor drops N-fold instead of sqrt(N) (channel must be static over the window)')
+	result_cache.addArguments(parser)
+	args = parser.parse_args()
+	#options not given come from the capture's metadata sidecar (cir_rx writes them all)
+	capture_meta.resolveArgs(args, args.path, {'degree': 8, 'samp_rate': 25*10**6, 'sample_format': 'fc32',
+	                                           'taps': None, 'accumulated': False, 'full_scale': None,
+	                                           'window_size': 100})
+	if args.coherent and (args.taps or args.accumulated):
+		parser.error('--coherent needs a full CIR capture, not one windowed or accumulated by the receiver')
+	#initialize variableshome
+	file_path = args.path
+	N = args.window_size
+	file_name = args.name
+	csv_name = args.csv
+	samp_rate = args.samp_rate
+	degree = args.degree
+	#do work
+	data, read_params = openCIR(file_path, degree, args.sample_format, args.full_scale, args.accumulated)
+	cache = result_cache.fromArgs(args)
+	if cache is not None:
+		cache = result_cache.CaptureCache(cache, file_path, **read_params)
+	analysis = PDPAnalysis(data,degree,samp_rate,taps=args.taps,cache=cache,detector=args.detector,pfa=args.pfa,
+	                       interpolation=args.interpolation,coherent=args.coherent)
+	if len(analysis.average(N)) == 0:
+		sys.stderr.write('{}: too short for one pdp averaged over {} periods\n'.format(file_path, N))
+		exit(1)
+	pdp = linearPowerToDecibel(analysis.average(N).ravel())
+	analysis.figure(file_name,N)
+	output_writer.writeArray(pdp, args.format, csv_name, 1, samp_rate)
+	mean_delay, rms_delay = analysis.delay_spread(N)
+	print('mean delay: ' + str(np.mean(mean_delay)) + 's')
+	print('rms delay: ' + str(np.mean(rms_delay)) + 's')
+	if args.coherent:
+		print('frequency offset: ' + str(np.mean(analysis.frequency_offset(N))) + ' Hz')
+	if args.delays:
+		#one value per averaged pdp, i.e. every N PN periods
+		period = N*(2**degree-1)
+		output_writer.writeArray(mean_delay, args.format, args.delays+'_mean', period, samp_rate)
+		output_writer.writeArray(rms_delay, args.format, args.delays+'_rms', period, samp_rate)
+		output_writer.writeArray(linearPowerToDecibel(analysis.noise(N)), args.format, args.delays+'_noise', period, samp_rate)
+		if args.coherent:
+			output_writer.writeArray(analysis.frequency_offset(N), args.format, args.delays+'_cfo', period, samp_rate)
+if __name__ == "__main__":
+    main()
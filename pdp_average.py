@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+#Real-time PDP averaging for the cir_rx flowgraph, built from stock blocks. The
+#correlator output is cut into PN-period vectors (stream_to_vector), turned into power
+#(complex_to_mag_squared) and averaged over N periods, either as a block mean
+#(integrate_ff, one vector out per N in) or an exponential average (single_pole_iir_filter_ff,
+#one vector out every N periods). The vectors are not aligned on the correlation peak,
+#but the peak stays in the same bin from one vector to the next.
+
+from gnuradio import blocks
+from gnuradio import filter
+from gnuradio import gr
+
+MODES = ['mean', 'exp']
+
+class pdp_average(gr.hier_block2):
+    """
+    Complex correlator samples in, float vectors of period bins out, each the average
+    power delay profile of the last N periods. In 'exp' mode every output is an
+    exponential average with time constant N periods.
+    """
+    def __init__(self, period, N, mode='mean'):
+        period = int(period)
+        gr.hier_block2.__init__(self, "pdp_average",
+                                gr.io_signature(1, 1, gr.sizeof_gr_complex),
+                                gr.io_signature(1, 1, gr.sizeof_float*period))
+        self.period = period
+        self.N = N
+        self.mode = mode
+        self.stream_to_vector = blocks.stream_to_vector(gr.sizeof_gr_complex, period)
+        self.mag_squared = blocks.complex_to_mag_squared(period)
+        if mode == 'mean':
+            self.average = blocks.integrate_ff(N, period)
+            self.output = blocks.multiply_const_vff([1.0/N]*period)
+        elif mode == 'exp':
+            self.average = filter.single_pole_iir_filter_ff(1.0/N, period)
+            self.output = blocks.keep_one_in_n(gr.sizeof_float*period, N)
+        else:
+            raise ValueError('Unknown averaging mode: {}'.format(mode))
+        self.connect(self, self.stream_to_vector, self.mag_squared, self.average, self.output, self)
+
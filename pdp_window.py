@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+#Receiver-side PDP windowing. The correlator output is only of interest around the
+#correlation peak of each PN period, so this stage locks onto the periodic peak and
+#keeps `taps` samples of each period starting `pre` samples before it, or sums the
+#power of those windows over K periods and emits one averaged PDP per K periods.
+#With a 255-chip sequence and 64 taps that is 4x (or 4K x) less to write, and the
+#output is already aligned for pdp_analysis (-W).
+
+import numpy as np
+import pmt
+from gnuradio import gr
+
+#Periods averaged to find the peak phase before the first window is emitted
+ACQUIRE_PERIODS = 8
+
+RX_TIME = pmt.intern('rx_time')
+
+class PeakWindow:
+    """
+    Tracks the correlation peak of a periodic correlator output fed in arbitrary chunks.
+    Every period, the peak is searched for within +-track samples of where the previous
+    one predicts it, so slow clock drift between transmitter and receiver is followed.
+    period may be fractional (e.g. a decimated correlator output). After every call,
+    starts holds the input offset of the first sample of each vector returned.
+    """
+    def __init__(self, period, taps, pre=0, track=2, accumulate=0):
+        self.period = float(period)
+        self.taps = int(taps)
+        self.pre = int(pre)
+        self.track = int(track)
+        self.accumulate = int(accumulate)
+        self.buffer = np.zeros(0, dtype=np.complex64)
+        #expected position of the next peak in buffer coordinates, None before acquisition
+        self.next_peak = None
+        #a tracked peak can come track samples early, and its window starts pre before it
+        self.margin_lo = self.pre + self.track
+        self.margin_hi = self.track + max(self.taps - self.pre, 1)
+        self.acc = np.zeros(self.taps)
+        self.acc_count = 0
+        #input offset of buffer[0], and of the first window being accumulated
+        self.offset = 0
+        self.acc_start = 0
+        self.starts = np.zeros(0, dtype=np.int64)
+
+    #Finds the peak phase from the power of the first ACQUIRE_PERIODS periods
+    def acquire(self):
+        period = int(round(self.period))
+        span = ACQUIRE_PERIODS*period
+        if len(self.buffer) < span + period:
+            return False
+        power = np.abs(self.buffer[:span].reshape(ACQUIRE_PERIODS, period))**2
+        peak = int(power.sum(axis=0).argmax())
+        while peak < self.margin_lo:
+            peak += period
+        self.next_peak = float(peak)
+        return True
+
+    #Takes in the next chunk of correlator output and returns the complex windows
+    #(periods, taps) completed by it
+    def windows(self, samples):
+        self.buffer = np.concatenate((self.buffer, samples))
+        self.starts = np.zeros(0, dtype=np.int64)
+        if self.next_peak is None and not self.acquire():
+            return np.zeros((0, self.taps), dtype=np.complex64)
+        n = int(np.floor((len(self.buffer) - self.margin_hi - 1 - self.next_peak)/self.period)) + 1
+        if n <= 0:
+            return np.zeros((0, self.taps), dtype=np.complex64)
+        expected = np.round(self.next_peak + self.period*np.arange(n)).astype(np.intp)
+        search = expected[:, None] + np.arange(-self.track, self.track + 1)
+        found = search[np.arange(n), (np.abs(self.buffer[search])**2).argmax(axis=1)]
+        windows = self.buffer[found[:, None] - self.pre + np.arange(self.taps)]
+        self.starts = (found - self.pre + self.offset).astype(np.int64)
+        #keep from just before the next expected peak onwards
+        next_peak = found[-1] + self.period
+        drop = min(int(np.floor(next_peak)) - self.margin_lo, len(self.buffer))
+        self.buffer = self.buffer[drop:]
+        self.offset += drop
+        self.next_peak = next_peak - drop
+        return windows
+
+    #Same as windows, but returns the (pdps, taps) power windows averaged over every
+    #`accumulate` periods completed so far. A pdp starts where its first window does
+    def averages(self, samples):
+        power = np.abs(self.windows(samples))**2
+        starts = self.starts
+        K = self.accumulate
+        if self.acc_count:
+            need = K - self.acc_count
+            self.acc += power[:need].sum(axis=0)
+            self.acc_count += len(power[:need])
+            power = power[need:]
+            starts = starts[need:]
+            if self.acc_count < K:
+                self.starts = np.zeros(0, dtype=np.int64)
+                return np.zeros((0, self.taps), dtype=np.float32)
+            out = [self.acc[None, :]]
+            out_starts = [[self.acc_start]]
+        else:
+            out = []
+            out_starts = []
+        n = len(power)//K
+        out.append(power[:n*K].reshape(n, K, self.taps).sum(axis=1))
+        out_starts.append(starts[:n*K:K])
+        rest = power[n*K:]
+        self.acc = rest.sum(axis=0) if len(rest) else np.zeros(self.taps)
+        self.acc_count = len(rest)
+        if len(rest):
+            self.acc_start = starts[n*K]
+        self.starts = np.concatenate(out_starts).astype(np.int64)
+        return (np.concatenate(out)/K).astype(np.float32)
+
+    def process(self, samples):
+        if self.accumulate:
+            return self.averages(samples)
+        return self.windows(samples)
+
+#Returns an rx_time value (uhd's (uint64 secs, double frac) tuple) advanced by seconds
+def shiftTime(value, seconds):
+    secs = pmt.to_uint64(pmt.tuple_ref(value, 0))
+    frac = pmt.to_double(pmt.tuple_ref(value, 1)) + seconds
+    whole = int(np.floor(frac))
+    return pmt.make_tuple(pmt.from_uint64(secs + whole), pmt.from_double(frac - whole))
+
+class pdp_window(gr.basic_block):
+    """
+    GNU Radio wrapper of PeakWindow: complex correlator samples in, one vector of taps per
+    PN period (complex) or per accumulate periods (float power) out. Tags are moved to
+    the first vector that starts at or after them; with samp_rate (of the input), rx_time
+    tags are also advanced to the time of that vector's first sample.
+    """
+    def __init__(self, period, taps, pre=0, track=2, accumulate=0, samp_rate=None):
+        out_type = np.float32 if accumulate else np.complex64
+        gr.basic_block.__init__(self, name='pdp_window', in_sig=[np.complex64], out_sig=[(out_type, int(taps))])
+        self.tracker = PeakWindow(period, taps, pre, track, accumulate)
+        self.samp_rate = samp_rate
+        self.pending = np.zeros((0, int(taps)), dtype=out_type)
+        self.pending_starts = np.zeros(0, dtype=np.int64)
+        self.tags = []
+        #one vector per period (or accumulate periods) of input; tags are placed by hand
+        self.set_relative_rate(1.0/(float(period)*max(int(accumulate), 1)))
+        self.set_tag_propagation_policy(gr.TPP_DONT)
+
+    def forecast(self, noutput_items, ninput_items_required):
+        ninput_items_required[0] = int(noutput_items*self.tracker.period*max(self.tracker.accumulate, 1))
+
+    #All input is consumed every call; vectors that do not fit the output buffer wait
+    #in self.pending for the next one
+    def general_work(self, input_items, output_items):
+        samples = input_items[0]
+        self.tags.extend(self.get_tags_in_window(0, 0, len(samples)))
+        self.consume(0, len(samples))
+        self.pending = np.concatenate((self.pending, self.tracker.process(samples)))
+        self.pending_starts = np.concatenate((self.pending_starts, self.tracker.starts))
+        n = min(len(self.pending), len(output_items[0]))
+        output_items[0][:n] = self.pending[:n]
+        self.placeTags(self.pending_starts[:n])
+        self.pending = self.pending[n:]
+        self.pending_starts = self.pending_starts[n:]
+        return n
+
+    #Adds the held tags that the vectors about to be written (starting at input offsets
+    #starts) cover to the output, the rest stay held
+    def placeTags(self, starts):
+        if not self.tags or not len(starts):
+            return
+        written = self.nitems_written(0)
+        held = []
+        for tag in self.tags:
+            i = int(np.searchsorted(starts, tag.offset))
+            if i == len(starts):
+                held.append(tag)
+                continue
+            value = tag.value
+            if self.samp_rate and pmt.eq(tag.key, RX_TIME):
+                value = shiftTime(value, (starts[i] - tag.offset)/float(self.samp_rate))
+            self.add_item_tag(0, written + i, tag.key, value, tag.srcid)
+        self.tags = held
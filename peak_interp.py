@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+#Sub-sample position of PDP peaks. Given the (row, bin) of every detected path in a matrix
+#of linear pdps, returns fractional bins for all of them at once:
+#  parabolic  vertex of the parabola through the magnitude (sqrt of power) at bin-1, bin, bin+1
+#  gaussian   the same on log power, exact for a Gaussian-shaped peak
+#  sinc       maximum of the band-limited (windowed sinc) interpolation of the power over
+#             SINC_TAPS bins on each side, searched on a grid and refined parabolically
+#Rows are treated as circular (a PN-period pdp wraps around), so the direct path at bin 0
+#takes its left neighbour from the end of the row.
+
+import numpy as np
+
+METHODS = ['parabolic', 'gaussian', 'sinc']
+
+#Bins on each side used by the sinc interpolation, and grid points per bin it searches
+SINC_TAPS = 8
+SINC_GRID = 32
+
+#Takes in the values left of, at and right of a peak (arrays) and returns the offset of
+#the vertex of the parabola through them, within [-0.5, 0.5]
+def parabolicOffset(left, centre, right):
+    denom = left - 2*centre + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = 0.5*(left - right)/denom
+    offset[~np.isfinite(offset)] = 0
+    return np.clip(offset, -0.5, 0.5)
+
+#(n, len(offsets)) gather of pdps[rows, bins+offsets], wrapping around the rows
+def neighbours(pdps, rows, bins, offsets):
+    return pdps[rows[:, None], (bins[:, None] + offsets) % pdps.shape[1]]
+
+#Kernel that evaluates the sinc interpolation at SINC_GRID points per bin in [-0.5, 0.5]
+#from the 2*taps+1 bins around a peak, Hann-windowed to limit ringing
+def sincKernel(taps=SINC_TAPS, grid=SINC_GRID):
+    points = np.linspace(-0.5, 0.5, grid + 1)
+    k = np.arange(-taps, taps + 1)
+    t = points[:, None] - k
+    window = 0.5 + 0.5*np.cos(np.pi*t/(taps + 1))
+    return points, np.sinc(t)*window
+
+def sincOffset(pdps, rows, bins, taps=SINC_TAPS, grid=SINC_GRID):
+    points, kernel = sincKernel(taps, grid)
+    values = neighbours(pdps, rows, bins, np.arange(-taps, taps + 1)).dot(kernel.T)
+    best = np.clip(values.argmax(axis=1), 1, grid - 1)
+    i = np.arange(len(values))
+    step = points[1] - points[0]
+    refine = parabolicOffset(values[i, best-1], values[i, best], values[i, best+1])
+    return np.clip(points[best] + refine*step, -0.5, 0.5)
+
+#Takes in a (rows, bins) matrix of linear pdps and the row and bin index arrays of its
+#peaks and returns their fractional bins
+def interpolate(pdps, rows, bins, method='parabolic'):
+    pdps = np.atleast_2d(np.asarray(pdps, dtype=np.float64))
+    rows = np.asarray(rows, dtype=np.intp)
+    bins = np.asarray(bins, dtype=np.intp)
+    if len(rows) == 0:
+        return np.zeros(0)
+    if method == 'sinc':
+        return bins + sincOffset(pdps, rows, bins)
+    around = neighbours(pdps, rows, bins, np.arange(-1, 2))
+    if method == 'parabolic':
+        around = np.sqrt(around)
+    elif method == 'gaussian':
+        around = np.log(np.maximum(around, np.finfo(np.float64).tiny))
+    else:
+        raise ValueError('Unknown interpolation: {}'.format(method))
+    return bins + parabolicOffset(around[:, 0], around[:, 1], around[:, 2])
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+#PN correlator taps generated from the same Galois LFSR that digital.glfsr_source_f runs
+#in cir_tx.py, so the receivers no longer carry literal tap lists per degree. Sequences
+#are cached on disk keyed by degree, mask and seed.
+
+import numpy as np
+import os
+import argparse
+
+#Default feedback masks per degree, as used by gnuradio's glfsr when mask=0
+GLFSR_MASKS = [
+    0x0000, 0x0001, 0x0003, 0x0005, 0x0009, 0x0012, 0x0021, 0x0041, 0x008E,
+    0x0108, 0x0204, 0x0402, 0x0829, 0x100D, 0x2015, 0x4001, 0x8016,
+]
+
+#Directory the generated sequences are cached in
+CACHE_DIR = os.environ.get('PN_TAPS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'pn_taps'))
+
+#Returns the feedback mask glfsr uses for degree when given mask (0 means the default)
+def glfsr_mask(degree, mask=0):
+    if mask:
+        return mask
+    if not 1 <= degree < len(GLFSR_MASKS):
+        raise ValueError('No default GLFSR mask for degree {}, pass one explicitly'.format(degree))
+    return GLFSR_MASKS[degree]
+
+#Returns one period (2**degree-1 chips) of the +-1 sequence glfsr_source_f(degree, True,
+#mask, seed) outputs
+def glfsr_sequence(degree, mask=0, seed=1):
+    mask = glfsr_mask(degree, mask)
+    register = seed
+    chips = np.empty(2**degree-1, dtype=np.int8)
+    for i in range(len(chips)):
+        bit = register & 1
+        register >>= 1
+        if bit:
+            register ^= mask
+        chips[i] = 2*bit-1
+    return chips
+
+#Same as glfsr_sequence, read from (or stored to) the on-disk cache
+def cached_sequence(degree, mask=0, seed=1, cache_dir=CACHE_DIR):
+    mask = glfsr_mask(degree, mask)
+    path = os.path.join(cache_dir, 'glfsr_d{}_m{:x}_s{:x}.npy'.format(degree, mask, seed))
+    try:
+        return np.load(path)
+    except (IOError, ValueError):
+        pass
+    chips = glfsr_sequence(degree, mask, seed)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(path, chips)
+    except OSError:
+        pass
+    return chips
+
+#Returns the matched-filter taps for the PN sequence of degree: the time-reversed
+#sequence, repeated over periods PN periods, as a list for filter.fir_filter_ccc
+def correlator_taps(degree, mask=0, seed=1, periods=1, cache_dir=CACHE_DIR):
+    chips = cached_sequence(degree, mask, seed, cache_dir)[::-1]
+    return np.tile(chips, periods).tolist()
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate and cache PN correlator taps')
+    parser.add_argument('-d', '--degree', type=int, action='append', required = True,
+                        help='Degree of the PN sequence, may be repeated')
+    parser.add_argument('-m', '--mask', type=lambda x: int(x, 0), default = 0,
+                        help='GLFSR feedback mask, default: 0 (gnuradio default for the degree)')
+    parser.add_argument('--seed', type=lambda x: int(x, 0), default = 1,
+                        help='GLFSR seed, default: 1')
+    args = parser.parse_args()
+    for degree in args.degree:
+        taps = correlator_taps(degree, args.mask, args.seed)
+        print('degree {}: {} taps, mask 0x{:x}, cached in {}'.format(degree, len(taps), glfsr_mask(degree, args.mask), CACHE_DIR))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+#On-disk cache of analysis results (windowed power, PN-period peaks, averaged PDPs, ...).
+#An entry is keyed by the capture it was computed from and the parameters of the stage
+#that computed it, so reruns and parameter sweeps over the same captures only recompute
+#what changed. A capture is identified by its size, modification time and metadata
+#sidecar, or with content_hash by a hash of its samples. The least recently used entries
+#are evicted once the cache grows past its size cap.
+
+import numpy as np
+import os
+import json
+import hashlib
+import argparse
+import capture_meta
+
+#Directory and size cap of the cache, overridable from the environment
+CACHE_DIR = os.environ.get('RESULT_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'cir_results'))
+MAX_BYTES = int(float(os.environ.get('RESULT_CACHE_SIZE', 2**30)))
+
+EXTENSION = '.npz'
+
+#Bytes read at a time when hashing a capture
+HASH_CHUNK = 2**24
+
+#Takes in a capture path and returns a string identifying its contents: size, mtime and
+#sidecar, or a hash of the whole file with content_hash
+def captureFingerprint(file_path, content_hash=False):
+    st = os.stat(file_path)
+    meta = capture_meta.readMeta(file_path)
+    if content_hash:
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_CHUNK), b''):
+                digest.update(block)
+        ident = {'sha1': digest.hexdigest()}
+    else:
+        ident = {'path': os.path.realpath(file_path), 'size': st.st_size, 'mtime': st.st_mtime_ns}
+    ident['meta'] = meta
+    return json.dumps(ident, sort_keys=True)
+
+class ResultCache:
+    """
+    Cache of ndarrays (or tuples of them) in cache_dir, one .npz file per entry. get()
+    marks an entry as used by touching it, and put() evicts the entries touched longest
+    ago until the cache holds at most max_bytes.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES, content_hash=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        self.fingerprints = {}
+        self.hits = 0
+        self.misses = 0
+
+    #Identity of a capture, worked out once per capture
+    def fingerprint(self, file_path):
+        if file_path not in self.fingerprints:
+            self.fingerprints[file_path] = captureFingerprint(file_path, self.content_hash)
+        return self.fingerprints[file_path]
+
+    #Key of the result of stage on a capture with the given parameters
+    def key(self, file_path, stage, **params):
+        text = json.dumps([self.fingerprint(file_path), stage, params], sort_keys=True, default=str)
+        return stage + '_' + hashlib.sha1(text.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + EXTENSION)
+
+    #Returns the cached value of key, or None if there is none. An entry that cannot be
+    #loaded (truncated, corrupt, written by another numpy) is a miss, and is deleted
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with np.load(path) as f:
+                if 'value' in f.files:
+                    value = f['value']
+                else:
+                    value = tuple(f['arr_%d' % i] for i in range(len(f.files)))
+        except Exception as e:
+            self.misses += 1
+            if not isinstance(e, FileNotFoundError):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    #Stores an ndarray or tuple of ndarrays under key. A cache that cannot be written is
+    #not an error: the result is simply not kept
+    def put(self, key, value):
+        path = self.path(key)
+        tmp = '%s.%d.tmp%s' % (path[:-len(EXTENSION)], os.getpid(), EXTENSION)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if isinstance(value, tuple):
+                np.savez(tmp, *value)
+            else:
+                np.savez(tmp, value=value)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self.evict()
+
+    #Returns the cached result of stage on a capture, computing and storing it with
+    #compute() if it is not cached
+    def cached(self, file_path, stage, compute, **params):
+        key = self.key(file_path, stage, **params)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    #(path, size, last use) of every entry, least recently used first
+    def entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(EXTENSION) or '.tmp' in name:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    #Deletes least recently used entries until the cache holds at most max_bytes
+    def evict(self, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+class CaptureCache:
+    """
+    A ResultCache bound to one capture and the parameters it was read with (sample
+    format, full scale, ...), which every stage's key then includes.
+    """
+    def __init__(self, cache, file_path, **params):
+        self.cache = cache
+        self.file_path = file_path
+        self.params = params
+
+    def cached(self, stage, compute, **params):
+        return self.cache.cached(self.file_path, stage, compute, **dict(self.params, **params))
+
+#Adds the cache options shared by the analysis scripts to an argparse parser
+def addArguments(parser):
+    parser.add_argument('--cache_dir', type=str, default = CACHE_DIR,
+                        help='Result cache directory (with --cache), default: %s' % CACHE_DIR)
+    parser.add_argument('--cache_size', type=float, default = MAX_BYTES,
+                        help='Result cache size cap in bytes, default: %d' % MAX_BYTES)
+    parser.add_argument('--cache_hash', action='store_true',
+                        help='Identify captures by a hash of their contents instead of size and mtime')
+    parser.add_argument('--cache', action='store_true',
+                        help='Read and write the result cache (off by default)')
+
+#Returns the ResultCache the parsed options ask for, or None without --cache
+def fromArgs(args):
+    if not args.cache:
+        return None
+    return ResultCache(args.cache_dir, int(args.cache_size), args.cache_hash)
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or clear the analysis result cache')
+    parser.add_argument('--cache_dir', type=str, default = CACHE_DIR,
+                        help='Result cache directory, default: %s' % CACHE_DIR)
+    parser.add_argument('-c', '--clear', action='store_true',
+                        help='Delete every entry')
+    parser.add_argument('-e', '--evict', type=float, default = None,
+                        help='Evict least recently used entries down to this many bytes')
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache_dir)
+    if args.clear:
+        cache.evict(0)
+    elif args.evict is not None:
+        cache.evict(int(args.evict))
+    entries = cache.entries()
+    print('%s: %d entries, %d bytes' % (args.cache_dir, len(entries), sum(size for _, size, _ in entries)))
+
+if __name__ == "__main__":
+    main()
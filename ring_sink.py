@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+#GNU Radio sink that writes its input into a shm_ring.RingBuffer instead of a file, so an
+#analysis process (shm_ring.py -m consume) can work on the samples while they arrive.
+
+import numpy as np
+from gnuradio import gr
+import shm_ring
+
+class ring_sink(gr.sync_block):
+    """
+    Creates the ring called name (size samples) and appends every input sample to it.
+    Samples that do not fit because the consumer fell behind are dropped and counted in
+    the ring header rather than stalling the receiver.
+    """
+    def __init__(self, name='cir_ring', size=shm_ring.RING_SIZE):
+        gr.sync_block.__init__(self, name='ring_sink', in_sig=[np.complex64], out_sig=None)
+        self.ring = shm_ring.RingBuffer(name, int(size), np.complex64, create=True)
+
+    def work(self, input_items, output_items):
+        self.ring.write(input_items[0])
+        return len(input_items[0])
+
+    def stop(self):
+        self.ring.close_writer()
+        return True
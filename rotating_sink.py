@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+#Rotating file sink for long receiver runs. Samples go to a series of files named
+#<prefix>_<YYYYmmdd-HHMMSS>_<seq>, each closed after max_bytes or max_seconds worth of
+#samples. A CSV index next to them records, per file, the offset of its first sample in
+#the stream, its length, and the host and hardware (rx_time) time of that sample.
+#Optionally only the newest files are kept, by count and/or total size. Given the
+#capture's metadata, every file also gets its own sidecar (capture_meta) with its start times.
+
+import numpy as np
+import os
+import time
+import pmt
+import capture_meta
+from gnuradio import gr
+
+RX_TIME = pmt.intern('rx_time')
+
+#Columns of the index file
+INDEX_COLUMNS = ['seq', 'file', 'first_sample', 'samples', 'host_time', 'hw_time']
+
+#Takes in a timestamp (seconds) and returns the string used in rotated file names
+def timestamp(t):
+    return time.strftime('%Y%m%d-%H%M%S', time.gmtime(t))
+
+#Reads an index file back as a list of dicts, numbers converted
+def read_index(path):
+    rows = []
+    with open(path) as f:
+        header = f.readline().strip().split(',')
+        for line in f:
+            row = dict(zip(header, line.strip().split(',')))
+            for key in ('seq', 'first_sample', 'samples'):
+                row[key] = int(row[key])
+            for key in ('host_time', 'hw_time'):
+                row[key] = float(row[key]) if row[key] else None
+            rows.append(row)
+    return rows
+
+class rotating_file_sink(gr.sync_block):
+    """
+    Writes complex64 samples (or items of any dtype and vector length, samp_rate then
+    being items per second) to rotating files. max_bytes / max_seconds of 0 disable that
+    limit (both 0 gives a single, timestamped file). keep_files / keep_bytes of 0 keep
+    every file, otherwise the oldest closed files are deleted to stay within them.
+    meta, if given, holds the capture_meta.writeMeta arguments shared by every file.
+    """
+    def __init__(self, prefix='CIR', samp_rate=24e6, max_bytes=0, max_seconds=0, keep_files=0, keep_bytes=0,
+                 dtype=np.complex64, vlen=1, meta=None):
+        gr.sync_block.__init__(self, name='rotating_file_sink', in_sig=[(dtype, vlen) if vlen > 1 else dtype], out_sig=None)
+        self.prefix = prefix
+        self.samp_rate = samp_rate
+        self.itemsize = np.dtype(dtype).itemsize*vlen
+        limits = []
+        if max_bytes:
+            limits.append(int(max_bytes) // self.itemsize)
+        if max_seconds:
+            limits.append(int(max_seconds * samp_rate))
+        self.max_samples = max(min(limits), 1) if limits else 0
+        self.keep_files = int(keep_files)
+        self.keep_bytes = int(keep_bytes)
+        self.meta = meta
+        self.seq = 0
+        self.f = None
+        self.closed_files = []
+        #last rx_time tag: (stream offset, hardware seconds)
+        self.time_ref = None
+        self.index_name = '{}_{}.index.csv'.format(prefix, timestamp(time.time()))
+        self.index = open(self.index_name, 'w')
+        self.index.write(','.join(INDEX_COLUMNS) + '\n')
+        self.index.flush()
+
+    #Hardware time of the sample at a stream offset, from the last rx_time tag
+    def hw_time(self, offset):
+        if self.time_ref is None:
+            return None
+        tag_offset, secs = self.time_ref
+        return secs + (offset - tag_offset) / float(self.samp_rate)
+
+    def open_file(self, offset):
+        self.close_file()
+        self.file_host_time = time.time()
+        self.file_name = '{}_{}_{:05d}'.format(self.prefix, timestamp(self.file_host_time), self.seq)
+        self.f = open(self.file_name, 'wb')
+        self.file_offset = offset
+        self.file_hw_time = self.hw_time(offset)
+        self.file_samples = 0
+        if self.meta is not None:
+            capture_meta.writeMeta(self.file_name, **dict(self.meta, start_time=self.file_host_time,
+                                                          hw_time=self.file_hw_time, first_sample=offset))
+
+    def close_file(self):
+        if self.f is None:
+            return
+        self.f.close()
+        self.f = None
+        hw_time = '' if self.file_hw_time is None else '%.9f' % self.file_hw_time
+        self.index.write('%d,%s,%d,%d,%.6f,%s\n' % (self.seq, self.file_name, self.file_offset, self.file_samples,
+                                                    self.file_host_time, hw_time))
+        self.index.flush()
+        self.seq += 1
+        self.closed_files.append((self.file_name, self.file_samples * self.itemsize))
+        self.retain()
+
+    #Deletes the oldest closed files beyond keep_files / keep_bytes
+    def retain(self):
+        while self.closed_files and (
+                (self.keep_files and len(self.closed_files) > self.keep_files) or
+                (self.keep_bytes and sum(size for _, size in self.closed_files) > self.keep_bytes)):
+            name, _ = self.closed_files.pop(0)
+            for path in (name, capture_meta.metaPath(name)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def work(self, input_items, output_items):
+        samples = input_items[0]
+        n = len(samples)
+        offset = self.nitems_read(0)
+        tags = [(tag.offset, pmt.to_uint64(pmt.tuple_ref(tag.value, 0)) + pmt.to_double(pmt.tuple_ref(tag.value, 1)))
+                for tag in self.get_tags_in_window(0, 0, n, RX_TIME)]
+        start = 0
+        while start < n:
+            #apply the time tags up to here before a new file takes its start time from them
+            while tags and tags[0][0] <= offset + start:
+                self.time_ref = tags.pop(0)
+            if self.f is None or (self.max_samples and self.file_samples >= self.max_samples):
+                self.open_file(offset + start)
+            count = n - start
+            if self.max_samples:
+                count = min(count, self.max_samples - self.file_samples)
+            samples[start:start + count].tofile(self.f)
+            self.file_samples += count
+            start += count
+        if tags:
+            self.time_ref = tags[-1]
+        return n
+
+    def stop(self):
+        self.close_file()
+        self.index.close()
+        return True
@@ -0,0 +1,282 @@
+#!/usr/bin/python3
+#Shared-memory ring buffer between a receiver and analysis processes. One producer (the
+#ring_sink block in cir_rxd.py, or the synthetic producer below) appends samples and
+#advances a head counter; one consumer reads zero-copy views of the samples between its
+#tail counter and the head, then advances the tail. Neither side ever waits on the other:
+#when the ring is full the producer drops the samples that do not fit and counts them.
+#
+#The ring lives in multiprocessing.shared_memory where available (Python 3.8+), otherwise
+#in an mmap of a file in /dev/shm. Both sides see the same layout: a header of uint64
+#counters followed by the sample data.
+
+import numpy as np
+import os
+import mmap
+import time
+import argparse
+import multiprocessing
+import capture_reader
+import output_writer
+import iq_to_power
+import window_avg
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+SHM_DIR = '/dev/shm'
+
+#Header: 32 uint64 slots. head, tail and dropped sit on separate cache lines since they
+#are written by different processes
+HEADER_SLOTS = 32
+HEADER_BYTES = HEADER_SLOTS*8
+MAGIC, CAPACITY, ITEMSIZE, HEAD, TAIL, DROPPED, CLOSED = 0, 1, 2, 8, 16, 24, 25
+RING_MAGIC = 0x474e4952434d4853
+
+#Default ring size in samples (256 MB of fc32, about 1.3 s at 25 Msps)
+RING_SIZE = 2**25
+
+class RingBuffer:
+    """
+    Single-producer, single-consumer ring of samples in shared memory. create=True makes a
+    new ring of capacity samples; otherwise an existing one called name is attached to and
+    its capacity and dtype item size are taken from the header.
+
+    The counters only ever grow. The producer writes samples before publishing the new
+    head and the consumer is done with them before publishing the new tail, so on x86
+    (stores are not reordered with other stores) neither side needs a lock.
+    """
+    def __init__(self, name, capacity=RING_SIZE, dtype=np.complex64, create=False):
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        size = HEADER_BYTES + capacity*self.dtype.itemsize
+        self.shm = None
+        self.mm = None
+        if shared_memory is not None:
+            if create:
+                try:
+                    shared_memory.SharedMemory(name=name).unlink()
+                except FileNotFoundError:
+                    pass
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            else:
+                self.shm = shared_memory.SharedMemory(name=name)
+                #only the creator owns the segment; keep the resource tracker of an
+                #unrelated process from unlinking it when that process exits (children
+                #share their parent's tracker, which already knows the segment)
+                if multiprocessing.parent_process() is None:
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(self.shm._name, 'shared_memory')
+            buf = self.shm.buf
+        else:
+            path = os.path.join(SHM_DIR, name)
+            if create:
+                with open(path, 'wb') as f:
+                    f.truncate(size)
+            fd = os.open(path, os.O_RDWR)
+            try:
+                self.mm = mmap.mmap(fd, 0)
+            finally:
+                os.close(fd)
+            buf = self.mm
+        self.ctrl = np.frombuffer(buf, dtype=np.uint64, count=HEADER_SLOTS)
+        if create:
+            self.ctrl[:] = 0
+            self.ctrl[CAPACITY] = capacity
+            self.ctrl[ITEMSIZE] = self.dtype.itemsize
+            self.ctrl[MAGIC] = RING_MAGIC
+        elif self.ctrl[MAGIC] != RING_MAGIC or self.ctrl[ITEMSIZE] != self.dtype.itemsize:
+            raise ValueError('{} is not a ring buffer of {}'.format(name, self.dtype))
+        self.capacity = int(self.ctrl[CAPACITY])
+        self.data = np.frombuffer(buf, dtype=self.dtype, count=self.capacity, offset=HEADER_BYTES)
+        self.owner = create
+
+    #Producer: appends as many samples as fit, counts the rest as dropped, and returns
+    #the number written
+    def write(self, samples):
+        head = int(self.ctrl[HEAD])
+        free = self.capacity - (head - int(self.ctrl[TAIL]))
+        n = len(samples)
+        if n > free:
+            self.ctrl[DROPPED] = int(self.ctrl[DROPPED]) + n - free
+            n = free
+        pos = head % self.capacity
+        first = min(n, self.capacity - pos)
+        self.data[pos:pos+first] = samples[:first]
+        self.data[:n-first] = samples[first:n]
+        self.ctrl[HEAD] = head + n
+        return n
+
+    #Producer: marks the end of the stream
+    def close_writer(self):
+        self.ctrl[CLOSED] = 1
+
+    #Consumer: number of unread samples
+    def available(self):
+        return int(self.ctrl[HEAD]) - int(self.ctrl[TAIL])
+
+    #Consumer: zero-copy view of at most max_items unread samples, up to the end of the
+    #ring. The view stays valid until release() hands the samples back to the producer
+    def peek(self, max_items=None):
+        tail = int(self.ctrl[TAIL])
+        n = int(self.ctrl[HEAD]) - tail
+        pos = tail % self.capacity
+        n = min(n, self.capacity - pos)
+        if max_items is not None:
+            n = min(n, max_items)
+        return self.data[pos:pos+n]
+
+    def release(self, n):
+        self.ctrl[TAIL] = int(self.ctrl[TAIL]) + n
+
+    @property
+    def dropped(self):
+        return int(self.ctrl[DROPPED])
+
+    @property
+    def closed(self):
+        return bool(self.ctrl[CLOSED])
+
+    def close(self):
+        self.ctrl = None
+        self.data = None
+        if self.shm is not None:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        else:
+            self.mm.close()
+            if self.owner:
+                os.remove(os.path.join(SHM_DIR, self.name))
+
+#Takes in a ring and yields zero-copy views of at most chunk_size samples as they arrive.
+#Each view is released once the next one is requested. Stops when the producer has closed
+#the stream and everything is read, or after idle_timeout seconds without new samples.
+#The idle timer only starts with the first sample, so a consumer started ahead of a timed
+#receiver waits for it however long the start is
+def iterRing(ring, chunk_size=capture_reader.CHUNK_SIZE, poll_interval=0.001, idle_timeout=5.0):
+    last_data = None
+    while True:
+        chunk = ring.peek(chunk_size)
+        if len(chunk) == 0:
+            if ring.closed and ring.available() == 0:
+                return
+            if last_data is not None and time.time() - last_data > idle_timeout:
+                return
+            time.sleep(poll_interval)
+            continue
+        last_data = time.time()
+        yield chunk
+        ring.release(len(chunk))
+
+#Synthetic producer: writes noise at rate samples/s (0 for as fast as possible) for
+#seconds, block samples at a time. Returns (samples offered, samples dropped)
+def produce(ring, rate, seconds, block=2**16):
+    rng = np.random.RandomState(0)
+    noise = (rng.standard_normal(block) + 1j*rng.standard_normal(block)).astype(ring.dtype)
+    offered = 0
+    start = time.time()
+    while True:
+        elapsed = time.time() - start
+        if elapsed >= seconds:
+            break
+        if rate and offered > elapsed*rate:
+            time.sleep(min(block/float(rate), 0.001))
+            continue
+        ring.write(noise)
+        offered += block
+    ring.close_writer()
+    return offered, ring.dropped
+
+#Consumer: windowed power (iq_to_power) of everything read from the ring. Writes it with
+#writer if given and returns (samples read, windows computed, seconds)
+def consume(ring, N, writer=None, chunk_size=2**18, idle_timeout=5.0):
+    count = [0]
+    def counted(chunks):
+        for chunk in chunks:
+            count[0] += len(chunk)
+            yield chunk
+    t0 = time.time()
+    windows = 0
+    power = (iq_to_power.binToLinearPower(c) for c in counted(iterRing(ring, chunk_size, idle_timeout=idle_timeout)))
+    for avg in window_avg.chunkedWindowedAvg(power, N):
+        db = iq_to_power.linearPowerToDecibel(avg)
+        if writer is not None:
+            writer.write(db)
+        windows += len(db)
+    return count[0], windows, time.time() - t0
+
+def consumerProcess(name, N, results):
+    ring = RingBuffer(name)
+    results.put(consume(ring, N))
+    ring.close()
+
+#Runs the synthetic producer against a consumer process at every rate and prints whether
+#samples were dropped. Returns the highest rate sustained without drops
+def bench(rates, seconds, size, N, name='shm_ring_bench'):
+    sustained = 0
+    print('%12s %12s %12s %10s %14s' % ('rate Msps', 'offered', 'dropped', 'drop %', 'consumer Msps'))
+    for rate in rates:
+        ring = RingBuffer(name, size, create=True)
+        results = multiprocessing.Queue()
+        consumer = multiprocessing.Process(target=consumerProcess, args=(name, N, results))
+        consumer.start()
+        offered, dropped = produce(ring, rate, seconds)
+        read, windows, took = results.get()
+        consumer.join()
+        ring.close()
+        print('%12.1f %12d %12d %10.3f %14.1f' % (rate/1e6, offered, dropped, 100.0*dropped/max(offered, 1),
+                                                   read/max(took, 1e-9)/1e6))
+        if dropped == 0:
+            sustained = max(sustained, rate)
+    print('sustained without drops: %.1f Msamples/s' % (sustained/1e6))
+    return sustained
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared-memory ring buffer between a receiver and analysis')
+    parser.add_argument('-m', '--mode', type=str, default = 'bench', choices = ['bench', 'produce', 'consume'],
+                        help='bench: synthetic producer against a consumer at each rate; produce/consume: one side, default: bench')
+    parser.add_argument('-n', '--name', type=str, default = 'cir_ring',
+                        help='Name of the ring, default: cir_ring')
+    parser.add_argument('-S', '--size', type=int, default = RING_SIZE,
+                        help='Ring size in samples (produce/bench), default: %d' % RING_SIZE)
+    parser.add_argument('-r', '--rate', type=float, action='append',
+                        help='Producer rate in samples/s, may be repeated (bench), default: 10e6..400e6')
+    parser.add_argument('-t', '--seconds', type=float, default = 5.0,
+                        help='Seconds to produce for, default: 5')
+    parser.add_argument('-w', '--window_size', type=int, default = 20000,
+                        help='Power averaging window of the consumer, default: 20000')
+    parser.add_argument('-o', '--format', type=str, default = None, choices = output_writer.FORMATS,
+                        help='consume: write the dB power in this format to <name>_power')
+    parser.add_argument('-i', '--idle_timeout', type=float, default = 5.0,
+                        help='consume: stop once no samples have arrived for this many seconds after the first, default: 5')
+    parser.add_argument('-s', '--samp_rate', type=float, default = 24e6,
+                        help='Sample rate used for output timestamps, default: 24e6')
+    args = parser.parse_args()
+
+    if args.mode == 'bench':
+        bench(args.rate or [10e6, 25e6, 50e6, 100e6, 200e6, 400e6], args.seconds, args.size, args.window_size)
+    elif args.mode == 'produce':
+        ring = RingBuffer(args.name, args.size, create=True)
+        rate = (args.rate or [args.samp_rate])[0]
+        offered, dropped = produce(ring, rate, args.seconds)
+        #leave the consumer time to drain before the ring goes away
+        while ring.available():
+            time.sleep(0.1)
+        print('%d samples offered, %d dropped' % (offered, dropped))
+        ring.close()
+    else:
+        ring = RingBuffer(args.name)
+        writer = None
+        if args.format:
+            writer = output_writer.openWriter(args.format, args.name + '_power', args.window_size, args.samp_rate)
+        read, windows, took = consume(ring, args.window_size, writer, idle_timeout=args.idle_timeout)
+        if writer is not None:
+            writer.close()
+        print('%d samples, %d windows in %.2f s: %.1f Msamples/s, %d dropped by the producer' % (
+            read, windows, took, read/max(took, 1e-9)/1e6, ring.dropped))
+        ring.close()
+
+if __name__ == "__main__":
+    main()
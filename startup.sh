@@ -60,6 +60,9 @@ sudo mv /local/repository/uhd_siggen_90sec /usr/bin/
 chmod +x /local/repository/cir_tx.py
 sudo mv /local/repository/cir_tx.py /usr/bin/
 
+chmod +x /local/repository/cir_rx.py
+sudo mv /local/repository/cir_rx.py /usr/bin/
+
 chmod +x /local/repository/cir_rx8d.py
 sudo mv /local/repository/cir_rx8d.py /usr/bin/
 
@@ -72,6 +75,38 @@ sudo mv /local/repository/cir_rx10d.py /usr/bin/
 chmod +x /local/repository/pdp_analysis.py
 sudo mv /local/repository/pdp_analysis.py /usr/bin
 
+chmod +x /local/repository/batch_process.py
+sudo mv /local/repository/batch_process.py /usr/bin
+
+chmod +x /local/repository/shm_ring.py
+sudo mv /local/repository/shm_ring.py /usr/bin
+
+chmod +x /local/repository/capture_archive.py
+sudo mv /local/repository/capture_archive.py /usr/bin
+
+chmod +x /local/repository/result_cache.py
+sudo mv /local/repository/result_cache.py /usr/bin
+
+chmod +x /local/repository/offline_correlator.py
+sudo mv /local/repository/offline_correlator.py /usr/bin
+
+chmod +x /local/repository/online_stats.py
+sudo mv /local/repository/online_stats.py /usr/bin
+
+sudo mv /local/repository/capture_reader.py /usr/bin/
+sudo mv /local/repository/output_writer.py /usr/bin/
+sudo mv /local/repository/window_avg.py /usr/bin/
+sudo mv /local/repository/correlator.py /usr/bin/
+sudo mv /local/repository/pn_taps.py /usr/bin/
+sudo mv /local/repository/rotating_sink.py /usr/bin/
+sudo mv /local/repository/pdp_window.py /usr/bin/
+sudo mv /local/repository/pdp_average.py /usr/bin/
+sudo mv /local/repository/ring_sink.py /usr/bin/
+sudo mv /local/repository/capture_meta.py /usr/bin/
+sudo mv /local/repository/time_probe.py /usr/bin/
+sudo mv /local/repository/cfar.py /usr/bin/
+sudo mv /local/repository/peak_interp.py /usr/bin/
+
 
 sudo ed /etc/sysctl.conf << "EDEND"
 a
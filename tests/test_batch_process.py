@@ -0,0 +1,62 @@
+import argparse
+import numpy as np
+import batch_process
+import capture_archive
+import capture_meta
+import capture_reader
+import iq_to_power
+import pdp_analysis
+import pn_taps
+from offline_correlator import OverlapSave
+
+def batchArgs(path, mode, window):
+    return argparse.Namespace(path=str(path), glob='*', mode=mode, workers=1, split=2**16, window_size=window,
+                              degree=None, samp_rate=None, sample_format=None, full_scale=None, format='csv',
+                              out_dir=None, stats=False, cache_dir=None, cache_size=0, cache_hash=False,
+                              cache=False)
+
+#Writes samples as sc16 with SC16_MAX standing for full_scale, and its sidecar
+def writeSC16(path, samples, full_scale, **fields):
+    raw = np.empty((len(samples), 2), dtype=np.int16)
+    raw[:, 0] = np.round(samples.real/full_scale*capture_reader.SC16_MAX)
+    raw[:, 1] = np.round(samples.imag/full_scale*capture_reader.SC16_MAX)
+    raw.tofile(str(path))
+    capture_meta.writeMeta(str(path), 'sc16', 24e6, full_scale=full_scale, **fields)
+
+def readCSV(name):
+    return np.loadtxt(name + '.csv', delimiter=',').ravel()
+
+def test_power_sc16_from_sidecar(tmp_path):
+    rng = np.random.RandomState(0)
+    samples = (0.1*(rng.randn(100000) + 1j*rng.randn(100000))).astype(np.complex64)
+    capture = tmp_path / 'raw'
+    writeSC16(capture, samples, 1.0)
+    capture_archive.pack(str(capture), str(tmp_path / 'packed.capz'), capture_reader.SC16)
+    batch_process.run(batch_process.findCaptures(str(tmp_path)), batchArgs(tmp_path, 'power', 2000))
+    expected = iq_to_power.powerWindows(capture_reader.iterChunks(capture_reader.openSamples(str(capture), 'sc16')), 2000)
+    for name in ('raw', 'packed.capz'):
+        db_power = readCSV(str(tmp_path / (name + '_power')))
+        assert len(db_power) == 50
+        assert np.allclose(db_power, expected, atol=1e-4)
+
+def test_pdp_sc16_from_sidecar(tmp_path):
+    rng = np.random.RandomState(1)
+    chips = np.tile(pn_taps.cached_sequence(8), 400).astype(np.complex64)
+    cir = OverlapSave(pn_taps.correlator_taps(8)).filter(chips + 0.1*rng.randn(len(chips)))
+    capture = tmp_path / 'cir'
+    writeSC16(capture, cir, 400.0, degree=8)
+    batch_process.run([str(capture)], batchArgs(tmp_path, 'pdp', 10))
+    data, _ = pdp_analysis.openCIR(str(capture), 8, 'sc16', 400.0)
+    expected = pdp_analysis.linearPowerToDecibel(pdp_analysis.avg_pdp(data, 10, 8).ravel())
+    assert np.allclose(readCSV(str(tmp_path / 'cir_pdp')), expected, atol=1e-4)
+
+def test_pdp_window_from_sidecar(tmp_path):
+    averaged = tmp_path / 'averaged'
+    plain = tmp_path / 'plain'
+    for path in (averaged, plain):
+        np.zeros(255*4, dtype=np.complex64).tofile(str(path))
+    capture_meta.writeMeta(str(averaged), 'fc32', 24e6, degree=8, taps=255, accumulated=True, window_size=1)
+    assert batch_process.captureSettings(str(averaged), batchArgs(tmp_path, 'pdp', None)).window_size == 1
+    assert batch_process.captureSettings(str(plain), batchArgs(tmp_path, 'pdp', None)).window_size == 100
+    assert batch_process.captureSettings(str(averaged), batchArgs(tmp_path, 'pdp', 10)).window_size == 10
+    assert batch_process.captureSettings(str(plain), batchArgs(tmp_path, 'power', None)).window_size == 20000
@@ -0,0 +1,34 @@
+import numpy as np
+import bin_avg
+import capture_archive
+
+def test_archive_read_block_by_block(tmp_path, monkeypatch):
+    rng = np.random.RandomState(0)
+    raw = tmp_path / 'power'
+    (rng.randn(100000) - 70).astype(np.float32).tofile(str(raw))
+    capture_archive.pack(str(raw), str(tmp_path / 'power.capz'), np.float32, block_samples=4096)
+    spans = []
+    read = capture_archive.CaptureArchive.read
+    def recordRead(self, start, stop):
+        spans.append(min(stop, self.length) - start)
+        return read(self, start, stop)
+    monkeypatch.setattr(capture_archive.CaptureArchive, 'read', recordRead)
+    archived = bin_avg.windowedAvg(bin_avg.readBin(str(tmp_path / 'power.capz')), 1000, skip=50, chunk_size=8192)
+    assert max(spans) <= 8192
+    assert np.array_equal(archived, bin_avg.windowedAvg(bin_avg.readBin(str(raw)), 1000, skip=50, chunk_size=8192))
+
+#Every float32 sample counts (the file is not read as complex pairs); warm-up samples and
+#clipped -inf dB values are dropped before windows are formed
+def test_skip_clip_and_linear_average(tmp_path):
+    db = np.full(10050, -60.0, dtype=np.float32)
+    db[:50] = 10.0
+    db[50:5050:2] = -70.0
+    db[7000:7100] = -np.inf
+    db.tofile(str(tmp_path / 'power'))
+    data = bin_avg.readBin(str(tmp_path / 'power'))
+    assert len(data) == 10050
+    averages = bin_avg.windowedAvg(data, 1000, chunk_size=777)
+    assert np.allclose(averages, [-65.0]*5 + [-60.0]*4)
+    linear = bin_avg.windowedAvg(data, 1000, linear=True, chunk_size=777)
+    assert np.allclose(linear[:5], 10*np.log10((1e-7 + 1e-6)/2))
+    assert np.allclose(linear[5:], -60.0)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import capture_archive
+import capture_meta
+import capture_reader
+
+def samples(dtype, n=100003, seed=0):
+    rng = np.random.RandomState(seed)
+    if np.dtype(dtype) == capture_reader.SC16:
+        return rng.randint(-32768, 32768, (n, 2)).astype(np.int16)
+    values = rng.randn(n) + 1j*rng.randn(n)
+    return values.astype(dtype) if np.dtype(dtype).kind == 'c' else values.real.astype(dtype)
+
+@pytest.mark.parametrize('dtype', [np.complex64, capture_reader.SC16, np.float32])
+@pytest.mark.parametrize('shuffled', [True, False])
+def test_pack_unpack_round_trip(tmp_path, dtype, shuffled):
+    raw = samples(dtype)
+    raw.tofile(str(tmp_path / 'raw'))
+    capture_meta.writeMeta(str(tmp_path / 'raw'), 'fc32', 24e6, degree=8)
+    capture_archive.pack(str(tmp_path / 'raw'), str(tmp_path / 'raw.capz'), dtype, shuffled=shuffled, block_samples=4096)
+    capture_archive.unpack(str(tmp_path / 'raw.capz'), str(tmp_path / 'unpacked'))
+    assert (tmp_path / 'unpacked').read_bytes() == (tmp_path / 'raw').read_bytes()
+    assert capture_meta.readMeta(str(tmp_path / 'unpacked')) == capture_meta.readMeta(str(tmp_path / 'raw'))
+
+@pytest.mark.parametrize('codec_name', capture_archive.CODECS)
+def test_codecs_round_trip(tmp_path, codec_name):
+    if codec_name == 'zstd':
+        pytest.importorskip('zstandard')
+    elif codec_name == 'lz4':
+        pytest.importorskip('lz4.frame')
+    raw = samples(np.complex64, 20000)
+    raw.tofile(str(tmp_path / 'raw'))
+    capture_archive.pack(str(tmp_path / 'raw'), str(tmp_path / 'raw.capz'), codec_name=codec_name, block_samples=4096)
+    capture_archive.unpack(str(tmp_path / 'raw.capz'), str(tmp_path / 'unpacked'))
+    assert (tmp_path / 'unpacked').read_bytes() == (tmp_path / 'raw').read_bytes()
+
+#Slices across block edges, with steps, single samples and index arrays read what the raw
+#capture holds
+def test_random_access_matches_raw(tmp_path):
+    raw = samples(np.complex64)
+    raw.tofile(str(tmp_path / 'raw'))
+    capture_archive.pack(str(tmp_path / 'raw'), str(tmp_path / 'raw.capz'), block_samples=4096)
+    archive = capture_archive.CaptureArchive(str(tmp_path / 'raw.capz'))
+    assert len(archive) == len(raw)
+    rng = np.random.RandomState(1)
+    for start, stop in rng.randint(0, len(raw), (20, 2)):
+        assert np.array_equal(archive[start:stop], raw[start:stop])
+    assert np.array_equal(archive[5:50000:7], raw[5:50000:7])
+    assert archive[-1] == raw[-1]
+    index = np.sort(rng.randint(0, len(raw), 10))
+    assert np.array_equal(archive[index], raw[index])
+    archive.close()
@@ -0,0 +1,49 @@
+import numpy as np
+import capture_reader
+
+def writeCapture(path, n=10001):
+    samples = (np.arange(n) + 1j*np.arange(n)[::-1]).astype(np.complex64)
+    samples.tofile(str(path))
+    return samples
+
+#Offset, length and stride select what slicing the samples in memory would
+def test_open_capture_views(tmp_path):
+    samples = writeCapture(tmp_path / 'raw')
+    path = str(tmp_path / 'raw')
+    assert np.array_equal(capture_reader.openCapture(path), samples)
+    assert np.array_equal(capture_reader.openCapture(path, offset=100, length=50), samples[100:150])
+    assert np.array_equal(capture_reader.openCapture(path, offset=10000, length=50), samples[10000:])
+    assert np.array_equal(capture_reader.openCapture(path, offset=3, stride=7), samples[3::7])
+    assert len(capture_reader.openCapture(path, offset=20000)) == 0
+    #a trailing partial sample is not counted
+    with open(path, 'ab') as f:
+        f.write(b'\0'*4)
+    assert capture_reader.captureLength(path) == len(samples)
+
+def test_iter_chunks(tmp_path):
+    samples = writeCapture(tmp_path / 'raw')
+    chunks = list(capture_reader.iterChunks(str(tmp_path / 'raw'), 1000, start=2500))
+    assert [len(c) for c in chunks] == [1000]*7 + [501]
+    assert np.array_equal(np.concatenate(chunks), samples[2500:])
+
+def test_split_ranges_cover_capture_aligned():
+    ranges = capture_reader.splitRanges(10001, 3000, 700)
+    assert ranges[0] == (0, 2800)
+    assert all(stop - start == 2800 for start, stop in ranges[:-1])
+    assert [r[0] for r in ranges[1:]] == [r[1] for r in ranges[:-1]]
+    assert ranges[-1][1] == 10001
+
+#sc16 pairs read as complex64 scaled so SC16_MAX is full_scale, slice by slice
+def test_sc16_scaling_and_slicing(tmp_path):
+    raw = np.array([[32767, -32767], [0, 16384], [-32768, 1], [100, -100]], dtype=np.int16)
+    raw.tofile(str(tmp_path / 'raw'))
+    samples = capture_reader.openSamples(str(tmp_path / 'raw'), 'sc16', full_scale=255.0)
+    expected = (raw[:, 0] + 1j*raw[:, 1])*(255.0/32767)
+    assert samples.dtype == np.complex64
+    assert len(samples) == 4
+    assert np.allclose(samples[:], expected, rtol=1e-6)
+    assert np.allclose(samples[1:4:2], expected[1:4:2], rtol=1e-6)
+    assert np.isclose(samples[2], expected[2], rtol=1e-6)
+    assert np.allclose(samples[np.array([3, 0])], expected[[3, 0]], rtol=1e-6)
+    #an fc32 reading of the same bytes sees half as many samples
+    assert len(capture_reader.openSamples(str(tmp_path / 'raw'), 'fc32')) == 2
@@ -0,0 +1,34 @@
+import numpy as np
+import cfar
+
+#Per-cell OS-CFAR noise estimate computed with plain loops
+def osNoiseLoop(pdps, guard, training, k):
+    half = guard + training
+    padded = np.pad(pdps, ((0, 0), (half, half)), mode='reflect')
+    noise = np.empty(pdps.shape)
+    for r in range(pdps.shape[0]):
+        for b in range(pdps.shape[1]):
+            window = padded[r, b:b + 2*half + 1]
+            cells = np.concatenate((window[:training], window[-training:]))
+            noise[r, b] = np.sort(cells)[k - 1]
+    return noise
+
+def test_os_threshold_matches_loop():
+    rng = np.random.RandomState(0)
+    pdps = rng.exponential(size=(3, 255))
+    pdps[:, 0] += 1000
+    noise, threshold = cfar.osThreshold(pdps, guard=2, training=16)
+    expected = osNoiseLoop(pdps, 2, 16, 24)
+    assert np.allclose(noise, expected)
+    assert np.allclose(threshold, expected*cfar.osFactor(32, 24))
+
+#numpy 1.19 (the version the nodes run) has no sliding_window_view
+def test_os_detect_without_sliding_window_view(monkeypatch):
+    monkeypatch.delattr(np.lib.stride_tricks, 'sliding_window_view', raising=False)
+    rng = np.random.RandomState(1)
+    pdps = rng.exponential(size=(4, 255))
+    pdps[:, 0] += 1e4
+    pdps[:, 5] += 1e3
+    paths = cfar.detect(pdps, 'os')[0]
+    assert paths[:, 0].all()
+    assert paths[:, 5].all()
@@ -0,0 +1,44 @@
+import threading
+import time
+import numpy as np
+import capture_reader
+import iq_to_power
+import output_writer
+
+#Appends samples to a capture in pieces, some of them ending mid-sample, as a receiver
+#flushing its buffers would
+def grow(path, samples, pieces=20, pause=0.02):
+    data = samples.tobytes()
+    cuts = np.linspace(0, len(data), pieces + 1).astype(int) + 3
+    cuts[0], cuts[-1] = 0, len(data)
+    with open(path, 'wb') as f:
+        for lo, hi in zip(cuts[:-1], cuts[1:]):
+            f.write(data[lo:hi])
+            f.flush()
+            time.sleep(pause)
+
+def capture(n=200000, seed=0):
+    rng = np.random.RandomState(seed)
+    return (rng.randn(n) + 1j*rng.randn(n)).astype(np.complex64)
+
+def test_follow_capture_reads_every_sample_once(tmp_path):
+    samples = capture()
+    path = str(tmp_path / 'raw')
+    thread = threading.Thread(target=grow, args=(path, samples))
+    thread.start()
+    chunks = [c.copy() for c in capture_reader.followCapture(path, chunk_size=7000, poll_interval=0.005, idle_timeout=0.3)]
+    thread.join()
+    assert max(len(c) for c in chunks) <= 7000
+    assert np.array_equal(np.concatenate(chunks), samples)
+
+#Windows written while following equal those of the finished capture
+def test_follow_matches_batch(tmp_path):
+    samples = capture()
+    path = str(tmp_path / 'raw')
+    thread = threading.Thread(target=grow, args=(path, samples))
+    thread.start()
+    with output_writer.openWriter('npy', str(tmp_path / 'power'), 2000) as writer:
+        iq_to_power.follow(path, 2000, writer, chunk_size=7000, idle_timeout=1.0)
+    thread.join()
+    expected = iq_to_power.powerWindows(capture_reader.iterChunks(path), 2000)
+    assert np.allclose(np.load(str(tmp_path / 'power.npy')), expected)
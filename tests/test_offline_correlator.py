@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import capture_meta
+import pn_taps
+import offline_correlator
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def runScript(script, *args, cwd=None):
+    return subprocess.run([sys.executable, os.path.join(REPO, script)] + list(args), cwd=cwd,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+#A RAW capture of 40 PN periods (two pdp rows of 20) is correlated offline and analysed
+#with only what the sidecar says
+def test_short_capture_pdp_end_to_end(tmp_path):
+    rng = np.random.RandomState(0)
+    chips = np.tile(pn_taps.cached_sequence(8), 40).astype(np.complex64)
+    raw = chips + 0.3*np.roll(chips, 5) + (0.1*rng.randn(len(chips))).astype(np.complex64)
+    raw.astype(np.complex64).tofile(str(tmp_path / 'RAW'))
+    capture_meta.writeMeta(str(tmp_path / 'RAW'), 'fc32', 24e6, degree=8)
+
+    result = runScript('offline_correlator.py', '-p', 'RAW', '-m', 'pdp', '-w', '20', '-j', '1', cwd=str(tmp_path))
+    assert result.returncode == 0, result.stderr
+    rows = np.fromfile(str(tmp_path / 'RAW.pdp'), dtype=np.float32).reshape(-1, 255)
+    assert len(rows) == 2
+    assert capture_meta.captureParams(str(tmp_path / 'RAW.pdp'))['window_size'] == 1
+
+    result = runScript('pdp_analysis.py', '-p', 'RAW.pdp', '-c', 'pdp', cwd=str(tmp_path))
+    assert result.returncode == 0, result.stderr
+    pdp = np.loadtxt(str(tmp_path / 'pdp.csv'), delimiter=',')
+    #every row as written, rotated to start at its strongest tap
+    assert pdp.size == rows.size
+    assert np.allclose(pdp.reshape(-1, 255)[:, 0], 10*np.log10(rows.max(axis=1)), atol=1e-3)
+
+#Correlating a worker range a few periods at a time gives the PDPs of a single pass
+def test_pdp_range_independent_of_chunking(tmp_path):
+    rng = np.random.RandomState(1)
+    chips = np.tile(pn_taps.cached_sequence(8), 300).astype(np.complex64)
+    raw = chips + (0.5*(rng.randn(len(chips)) + 1j*rng.randn(len(chips)))).astype(np.complex64)
+    raw.tofile(str(tmp_path / 'RAW'))
+    taps = pn_taps.correlator_taps(8)
+    block = 20*255
+    args = (str(tmp_path / 'RAW'), 'fc32', 1.0, taps, 8, 20, block, 12*block, len(raw), None)
+    whole = offline_correlator.pdpRange(*args, chunk_size=len(raw))[0]
+    assert whole.shape == (11, 255)
+    for chunk_size in (1000, 4001, block):
+        assert np.allclose(offline_correlator.pdpRange(*args, chunk_size=chunk_size)[0], whole, rtol=1e-5)
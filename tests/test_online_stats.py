@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import online_stats
+
+def powers(seed=0):
+    rng = np.random.RandomState(seed)
+    values = np.concatenate((rng.normal(-70, 3, 60000), rng.normal(-40, 1, 5000)))
+    values[rng.randint(0, len(values), 50)] = np.nan
+    return values
+
+#Statistics of parts updated in uneven chunks and merged equal those of all the data at once
+def test_merge_equals_combined_data():
+    values = powers()
+    whole = online_stats.OnlineStats()
+    whole.update(values)
+    parts = []
+    for part in np.split(values, [1000, 20000, 20001, 47000]):
+        stats = online_stats.OnlineStats()
+        for chunk in np.array_split(part, 3):
+            stats.update(chunk)
+        parts.append(stats)
+    merged = online_stats.mergeAll(parts)
+
+    finite = values[np.isfinite(values)]
+    assert merged.count == whole.count == len(finite)
+    assert merged.nan_count == 50
+    assert np.isclose(merged.mean, finite.mean())
+    assert np.isclose(merged.variance, finite.var())
+    assert (merged.min, merged.max) == (finite.min(), finite.max())
+    assert np.array_equal(merged.hist, whole.hist)
+    assert np.array_equal(merged.hist, np.histogram(finite, np.append(whole.edges(), whole.hist_hi))[0])
+    #the t-digest only approximates quantiles, within a small fraction of a dB
+    q = [0.01, 0.5, 0.95, 0.99]
+    assert np.allclose(merged.quantile(q), np.quantile(finite, q), atol=0.1)
+
+def test_save_load_round_trip(tmp_path):
+    stats = online_stats.OnlineStats()
+    stats.update(powers())
+    stats.save(str(tmp_path / 'stats.json'))
+    loaded = online_stats.OnlineStats.load(str(tmp_path / 'stats.json'))
+    assert loaded.toDict() == stats.toDict()
+    assert loaded.summary() == stats.summary()
+
+def test_merge_needs_same_bins():
+    with pytest.raises(ValueError):
+        online_stats.OnlineStats().merge(online_stats.OnlineStats(hist_step=0.5))
@@ -0,0 +1,80 @@
+import numpy as np
+from scipy.signal import find_peaks
+import pdp_analysis
+import pn_taps
+from offline_correlator import OverlapSave
+
+#Correlator output of a two-path channel (second path 7 samples later at -10 dB) received
+#with a frequency offset of cfo radians per sample
+def twoPathCIR(cfo, periods=3000, noise=0.5, seed=0):
+    rng = np.random.RandomState(seed)
+    chips = np.tile(pn_taps.cached_sequence(8), periods).astype(np.complex64)
+    rx = (chips + np.sqrt(0.1)*np.roll(chips, 7))*np.exp(1j*cfo*np.arange(len(chips)))
+    rx += noise*(rng.randn(len(chips)) + 1j*rng.randn(len(chips)))
+    return OverlapSave(pn_taps.correlator_taps(8)).filter(rx.astype(np.complex64))
+
+def test_coherent_average_removes_frequency_offset():
+    cfo = 2e-3
+    pdps, estimated = pdp_analysis.avg_pdp_coherent(twoPathCIR(cfo), 100, 8)
+    assert np.allclose(estimated, cfo, rtol=0.02)
+    #both paths add up in phase: the second comes out 10 dB below the first
+    assert np.allclose(10*np.log10(pdps[:, 7]/pdps[:, 0]), -10, atol=0.5)
+
+#Every group holds window consecutive periods, batched or not, and the magnitudes of the
+#capture are gathered at the peaks found chunk by chunk
+def test_avg_pdp_groups_consecutive_periods():
+    cir = twoPathCIR(0, periods=800)
+    peaks = pdp_analysis.find_pn_peaks(cir, 8, chunk_size=10000)
+    assert np.array_equal(peaks, find_peaks(pdp_analysis.complexToMagS(cir), distance=253)[0])
+    used = peaks[(peaks > 20000) & (peaks < len(cir) - 20000)]
+    power = np.abs(cir.astype(np.complex128))**2
+    expected = [np.mean([power[i:i+255] for i in used[g*50:(g+1)*50]], axis=0) for g in range(len(used)//50)]
+    for chunk_size in (255*50, 255*50*3, pdp_analysis.CHUNK_SIZE):
+        pdps = pdp_analysis.avg_pdp(cir, 50, 8, peaks, chunk_size)
+        assert pdps.shape == (len(used)//50, 255)
+        assert np.allclose(pdps, expected, rtol=1e-5)
+
+#Averaged pdps of three paths (0, 5 and 12 samples, 0, -3 and -7 dB) over a noise floor
+#40 dB down, as avg_pdp returns them after 100 periods
+def multipathPDPs(rows=20, seed=0):
+    rng = np.random.RandomState(seed)
+    pdps = 1e-4*rng.chisquare(200, (rows, 255))/200
+    pdps[:, [0, 5, 12]] += [1.0, 10**-0.3, 10**-0.7]
+    return pdps
+
+def test_delay_spread_of_known_profile():
+    samp_rate = 24e6
+    power = np.array([1.0, 10**-0.3, 10**-0.7])
+    delay = np.array([0, 5, 12])/samp_rate
+    expected_mean = power.dot(delay)/power.sum()
+    expected_rms = np.sqrt(power.dot(delay**2)/power.sum() - expected_mean**2)
+    #OS-CFAR finds the weaker paths next to the direct one, and nothing in the noise
+    mean_delay, rms_delay = pdp_analysis.delay_spread(multipathPDPs(), samp_rate, 195, 'os')
+    assert np.allclose(mean_delay, expected_mean, rtol=1e-3)
+    assert np.allclose(rms_delay, expected_rms, rtol=1e-3)
+    rows = np.repeat(np.arange(4), 3)
+    mean_delay, rms_delay = pdp_analysis.path_delay_spread(rows, np.tile(delay, 4), np.tile(power, 4), 4)
+    assert np.allclose(mean_delay, expected_mean)
+    assert np.allclose(rms_delay, expected_rms)
+
+#Peaks are found once per capture and averages once per window, whatever asks for them
+def test_analysis_reuses_peaks_and_averages(monkeypatch):
+    cir = twoPathCIR(0, periods=800)
+    calls = {'peaks': 0, 'average': 0}
+    find, average = pdp_analysis.find_pn_peaks, pdp_analysis.avg_pdp
+    def countedPeaks(*args, **kwargs):
+        calls['peaks'] += 1
+        return find(*args, **kwargs)
+    def countedAverage(*args, **kwargs):
+        calls['average'] += 1
+        return average(*args, **kwargs)
+    monkeypatch.setattr(pdp_analysis, 'find_pn_peaks', countedPeaks)
+    monkeypatch.setattr(pdp_analysis, 'avg_pdp', countedAverage)
+    analysis = pdp_analysis.PDPAnalysis(cir, 8, 24e6)
+    pdps = analysis.average(50)
+    analysis.delay_spread(50)
+    analysis.multipath(50)
+    analysis.noise(50)
+    analysis.average(20)
+    assert calls == {'peaks': 1, 'average': 2}
+    assert np.array_equal(pdps, average(cir, 50, 8))
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+import pn_taps
+from offline_correlator import OverlapSave
+
+pytest.importorskip('gnuradio')
+pdp_window = pytest.importorskip('pdp_window')
+
+#Correlator output of 80 PN periods whose direct path lands 0-2 samples early (within
+#the tracker's +-2), followed by zeros
+def jitteredCIR(rng):
+    chips = pn_taps.cached_sequence(8).astype(np.float32)
+    x = np.zeros(80*255 + 600, dtype=np.complex64)
+    for k, j in enumerate(rng.randint(0, 3, 80)):
+        x[300 + 255*k - j:300 + 255*k - j + 255] += chips
+    return OverlapSave(pn_taps.correlator_taps(8)).filter(x)
+
+@pytest.mark.parametrize('pre', [0, 5])
+def test_windows_independent_of_chunking(pre):
+    rng = np.random.RandomState(0)
+    for trial in range(20):
+        cir = jitteredCIR(rng)
+        whole = pdp_window.PeakWindow(255, 32, pre, 2).windows(cir)
+        tracker = pdp_window.PeakWindow(255, 32, pre, 2)
+        cuts = np.sort(rng.randint(0, len(cir), 30))
+        chunked = np.concatenate([tracker.windows(c) for c in np.split(cir, cuts)])
+        assert chunked.shape == whole.shape
+        #windows past the last period hold only correlator tail, where the peak is a tie
+        assert np.array_equal(chunked[:78], whole[:78])
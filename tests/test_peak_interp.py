@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+import peak_interp
+
+#Rows of 255 bins, each with one peak of the given shape at a random fractional bin
+def peaks(shape, n=50, seed=0):
+    mu = np.random.RandomState(seed).uniform(20, 230, n)
+    pdps = shape(np.arange(255)[None, :] - mu[:, None])
+    return pdps, np.arange(n), np.round(mu).astype(np.intp), mu
+
+def test_exact_for_the_shape_each_fit_assumes():
+    pdps, rows, bins, mu = peaks(lambda d: np.exp(-d**2/4.5))
+    assert np.allclose(peak_interp.interpolate(pdps, rows, bins, 'gaussian'), mu, atol=1e-9)
+    #parabolic fits the magnitude, the square root of the power
+    pdps, rows, bins, mu = peaks(lambda d: np.clip(1 - d**2/9, 0, None)**2)
+    assert np.allclose(peak_interp.interpolate(pdps, rows, bins, 'parabolic'), mu, atol=1e-9)
+
+@pytest.mark.parametrize('method', peak_interp.METHODS)
+def test_sub_sample_accuracy(method):
+    pdps, rows, bins, mu = peaks(lambda d: np.sinc(d/3)**2)
+    assert np.abs(peak_interp.interpolate(pdps, rows, bins, method) - mu).max() < 0.03
+
+#A direct path just before bin 0 takes its left neighbour from the end of the row
+def test_wraps_around_the_row():
+    mu = np.array([-0.3, 0.3])
+    d = (np.arange(255)[None, :] - mu[:, None] + 127) % 255 - 127
+    found = peak_interp.interpolate(np.exp(-d**2/4.5), [0, 1], [0, 0], 'gaussian')
+    assert np.allclose(found, mu)
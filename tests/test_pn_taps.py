@@ -0,0 +1,38 @@
+import numpy as np
+import pn_taps
+
+#First period of the literal taps cir_rx8d.py carried before they were generated
+BASELINE_D8 = [
+    -1, -1, 1, -1, 1, -1, -1, 1, -1, 1, -1, 1, -1, -1, 1, 1, 1, -1, 1, 1, 1, -1, 1, 1, -1, -1, 1, 1,
+    1, 1, -1, 1, 1, 1, 1, 1, 1, -1, 1, -1, -1, 1, 1, -1, -1, 1, 1, -1, 1, -1, 1, -1, -1, -1, 1, 1,
+    -1, -1, -1, -1, -1, 1, 1, 1, -1, 1, -1, 1, -1, 1, -1, 1, 1, 1, 1, 1, -1, -1, 1, -1, 1, -1, -1,
+    -1, -1, 1, -1, -1, 1, 1, 1, 1, 1, 1, 1, 1, -1, -1, -1, -1, 1, -1, 1, 1, 1, 1, -1, -1, -1, 1, 1,
+    -1, 1, -1, -1, -1, -1, -1, -1, -1, 1, -1, -1, -1, 1, 1, 1, -1, -1, -1, 1, -1, -1, 1, -1, 1, 1,
+    1, -1, -1, -1, -1, -1, -1, 1, 1, -1, -1, 1, -1, -1, 1, -1, -1, 1, 1, -1, 1, 1, 1, -1, -1, 1, -1,
+    -1, -1, -1, -1, 1, -1, 1, -1, 1, 1, -1, 1, 1, -1, 1, -1, 1, 1, -1, -1, 1, -1, 1, 1, -1, -1, -1,
+    -1, 1, 1, 1, 1, 1, -1, 1, 1, -1, 1, 1, 1, 1, -1, 1, -1, 1, 1, 1, -1, 1, -1, -1, -1, 1, -1, -1,
+    -1, -1, 1, 1, -1, 1, 1, -1, -1, -1, 1, 1, 1, 1, -1, -1, 1, 1, 1, -1, -1, 1, 1, -1, -1, -1, 1,
+    -1, 1, 1, -1, 1, -1, -1, 1, -1,
+]
+
+#The literal list starts at another phase of the sequence, which only moves the correlation
+#peak within the period
+def test_degree8_matches_baseline_literal(tmp_path):
+    taps = np.array(pn_taps.correlator_taps(8, cache_dir=str(tmp_path)))
+    baseline = np.array(BASELINE_D8)
+    assert any(np.array_equal(np.roll(taps, k), baseline) for k in range(len(taps)))
+
+#A maximal-length sequence's periodic autocorrelation is 2**degree-1 at lag 0 and -1 elsewhere
+def test_default_masks_are_maximal_length(tmp_path):
+    for degree in range(2, len(pn_taps.GLFSR_MASKS)):
+        chips = pn_taps.cached_sequence(degree, cache_dir=str(tmp_path)).astype(np.float64)
+        spectrum = np.fft.fft(chips)
+        autocorrelation = np.round(np.fft.ifft(spectrum*spectrum.conj()).real)
+        assert autocorrelation[0] == 2**degree - 1
+        assert np.all(autocorrelation[1:] == -1)
+
+def test_cached_sequence_round_trips(tmp_path):
+    first = pn_taps.cached_sequence(9, cache_dir=str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 1
+    assert np.array_equal(pn_taps.cached_sequence(9, cache_dir=str(tmp_path)), first)
+    assert np.array_equal(first, pn_taps.glfsr_sequence(9))
@@ -0,0 +1,20 @@
+import os
+import numpy as np
+import result_cache
+
+def test_damaged_entries_are_misses(tmp_path):
+    capture = tmp_path / 'capture'
+    np.zeros(16, dtype=np.complex64).tofile(str(capture))
+    cache = result_cache.ResultCache(str(tmp_path / 'cache'))
+    key = cache.key(str(capture), 'power', window=4)
+    cache.put(key, np.arange(10.0))
+    with open(cache.path(key), 'rb') as f:
+        data = f.read()
+    for damaged in (data[:len(data)//2], b'', b'not a zip file'):
+        with open(cache.path(key), 'wb') as f:
+            f.write(damaged)
+        assert cache.get(key) is None
+        assert not os.path.exists(cache.path(key))
+    value = cache.cached(str(capture), 'power', lambda: np.arange(10.0), window=4)
+    assert np.array_equal(value, np.arange(10.0))
+    assert np.array_equal(cache.get(key), np.arange(10.0))
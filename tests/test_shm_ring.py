@@ -0,0 +1,38 @@
+import threading
+import time
+import numpy as np
+import shm_ring
+
+#Copies everything iterRing yields; no view of the ring outlives the call, so it can be closed
+def drain(ring, chunk_size, idle_timeout):
+    return np.concatenate([chunk.copy() for chunk in shm_ring.iterRing(ring, chunk_size, idle_timeout=idle_timeout)])
+
+def test_every_sample_in_order():
+    ring = shm_ring.RingBuffer('test_shm_ring_order', 1000, np.float32, create=True)
+    data = np.arange(10000, dtype=np.float32)
+    def producer():
+        #waits for room instead of dropping
+        for block in np.split(data, 40):
+            while ring.capacity - ring.available() < len(block):
+                time.sleep(0.001)
+            ring.write(block)
+        ring.close_writer()
+    thread = threading.Thread(target=producer)
+    thread.start()
+    received = drain(ring, 300, 5.0)
+    thread.join()
+    assert ring.dropped == 0
+    assert np.array_equal(received, data)
+    ring.close()
+
+def test_waits_for_first_write():
+    ring = shm_ring.RingBuffer('test_shm_ring_wait', 1000, np.float32, create=True)
+    def producer():
+        time.sleep(0.5)
+        ring.write(np.ones(100, dtype=np.float32))
+    thread = threading.Thread(target=producer)
+    thread.start()
+    received = drain(ring, 1000, 0.1)
+    thread.join()
+    assert len(received) == 100
+    ring.close()
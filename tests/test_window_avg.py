@@ -0,0 +1,19 @@
+import numpy as np
+import window_avg
+
+#Windows straddling chunk boundaries are carried over, so any chunking gives the plain
+#reshape-and-mean of the whole stream, without the trailing partial window
+def test_independent_of_chunking():
+    rng = np.random.RandomState(0)
+    power = rng.exponential(1.0, 100037).astype(np.float32)
+    expected = power[:len(power)//1000*1000].reshape(-1, 1000).mean(axis=1, dtype=np.float64)
+    for trial in range(10):
+        cuts = np.sort(rng.randint(0, len(power), rng.randint(1, 200)))
+        averages = window_avg.windowedAvg(np.split(power, cuts), 1000)
+        assert len(averages) == 100
+        assert np.allclose(averages, expected, rtol=1e-12)
+
+def test_empty_and_short_streams():
+    assert len(window_avg.windowedAvg([], 10)) == 0
+    assert len(window_avg.windowedAvg([np.ones(4), np.ones(5)], 10)) == 0
+    assert np.array_equal(window_avg.windowedAvg([np.ones(4), np.ones(6), np.zeros(3)], 10), [1.0])
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+#Sink that watches a UHD source for its first rx_time tag and reports the hardware time of
+#sample 0 (the tag's time less its offset in samples), so the capture's metadata sidecar
+#can record it once the stream has started.
+
+import numpy as np
+import pmt
+from gnuradio import gr
+
+RX_TIME = pmt.intern('rx_time')
+
+class rx_time_probe(gr.sync_block):
+    """
+    Connected next to the file sink on the source's output. Calls callback(hw_time) once,
+    on the first rx_time tag, with the hardware seconds of the stream's first sample.
+    Sources with cpu_format sc16 give dtype=(np.int16, 2).
+    """
+    def __init__(self, callback, samp_rate=24e6, dtype=np.complex64):
+        gr.sync_block.__init__(self, name='rx_time_probe', in_sig=[dtype], out_sig=None)
+        self.callback = callback
+        self.samp_rate = samp_rate
+        self.done = False
+
+    def work(self, input_items, output_items):
+        n = len(input_items[0])
+        if not self.done:
+            tags = self.get_tags_in_window(0, 0, n, RX_TIME)
+            if tags:
+                tag = tags[0]
+                secs = pmt.to_uint64(pmt.tuple_ref(tag.value, 0)) + pmt.to_double(pmt.tuple_ref(tag.value, 1))
+                self.done = True
+                self.callback(secs - tag.offset / float(self.samp_rate))
+        return n
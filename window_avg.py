@@ -0,0 +1,34 @@
+#!/usr/bin/python3
+#Block-reduction engine for non-overlapping windowed averages, shared by iq_to_power.py
+#and bin_avg.py. Works on a stream of chunks so captures never have to fit in memory.
+
+import numpy as np
+
+#Takes in an iterable of power chunks and yields, per chunk, the averages of every
+#completed non-overlapping window of size N. A window that straddles a chunk boundary is
+#carried over to the next chunk, so the output does not depend on the chunk size. A trailing
+#partial window at the end of the data is dropped.
+def chunkedWindowedAvg(power_chunks, N):
+    carry = np.zeros(N, dtype=np.float64)
+    filled = 0
+    for chunk in power_chunks:
+        head = []
+        if filled:
+            take = min(N - filled, len(chunk))
+            carry[filled:filled+take] = chunk[:take]
+            filled += take
+            chunk = chunk[take:]
+            if filled < N:
+                continue
+            head = [carry.sum()/N]
+            filled = 0
+        n_windows = len(chunk) // N
+        body = chunk[:n_windows*N].reshape(n_windows, N).sum(axis=1, dtype=np.float64)/N
+        rest = len(chunk) - n_windows*N
+        carry[:rest] = chunk[n_windows*N:]
+        filled = rest
+        yield np.concatenate((head, body)) if head else body
+
+#Takes in an iterable of power chunks and returns all window averages as one float64 array
+def windowedAvg(power_chunks, N):
+    return np.concatenate([np.zeros(0)] + list(chunkedWindowedAvg(power_chunks, N)))